@@ -0,0 +1,47 @@
+"""add trgm search indexes
+
+Revision ID: 202602140000
+Revises: 202602130000
+Create Date: 2026-02-14 00:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "202602140000"
+down_revision: Union[str, Sequence[str], None] = "202602130000"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+TRGM_COLUMNS = ("title", "city", "country")
+
+
+def upgrade() -> None:
+    """
+    Включает pg_trgm и создает GIN-индексы для поиска экскурсий.
+
+    Индексы gin_trgm_ops обслуживают как ILIKE '%...%', так и операторы
+    сходства (%, %>), поэтому поиск больше не сканирует всю таблицу.
+    """
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+    for column in TRGM_COLUMNS:
+        op.create_index(
+            f"ix_excursions_{column}_trgm",
+            "excursions",
+            [column],
+            postgresql_using="gin",
+            postgresql_ops={column: "gin_trgm_ops"},
+        )
+
+
+def downgrade() -> None:
+    for column in TRGM_COLUMNS:
+        op.drop_index(f"ix_excursions_{column}_trgm", table_name="excursions")
+    # расширение не удаляем: им могут пользоваться другие объекты БД
@@ -0,0 +1,59 @@
+"""add excursion rating and catalog sort indexes
+
+Revision ID: 202602150000
+Revises: 202602140000
+Create Date: 2026-02-15 00:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "202602150000"
+down_revision: Union[str, Sequence[str], None] = "202602140000"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """
+    Добавляет денормализованный рейтинг экскурсии и индексы для keyset-пагинации
+    каталога по каждому варианту сортировки (новые, цена, рейтинг).
+    """
+    op.add_column(
+        "excursions",
+        sa.Column("rating", sa.Numeric(precision=3, scale=2), nullable=False, server_default="0"),
+    )
+
+    # заполняем рейтинг по существующим отзывам
+    op.execute(
+        """
+        UPDATE excursions e
+        SET rating = r.avg_rating
+        FROM (
+            SELECT excursion_id, ROUND(AVG(rating), 2) AS avg_rating
+            FROM reviews
+            GROUP BY excursion_id
+        ) r
+        WHERE r.excursion_id = e.excursion_id
+        """
+    )
+
+    op.create_index("ix_excursions_status_id", "excursions", ["status", "excursion_id"])
+    op.create_index(
+        "ix_excursions_status_price", "excursions", ["status", "price_per_person", "excursion_id"]
+    )
+    op.create_index(
+        "ix_excursions_status_rating", "excursions", ["status", "rating", "excursion_id"]
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_excursions_status_rating", table_name="excursions")
+    op.drop_index("ix_excursions_status_price", table_name="excursions")
+    op.drop_index("ix_excursions_status_id", table_name="excursions")
+    op.drop_column("excursions", "rating")
@@ -0,0 +1,87 @@
+"""add resolved photos to excursions
+
+Revision ID: 202602160000
+Revises: 202602150000
+Create Date: 2026-02-16 00:00:00.000000
+
+"""
+
+from pathlib import Path
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "202602160000"
+down_revision: Union[str, Sequence[str], None] = "202602150000"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Правила подстановки зафиксированы на момент миграции и не зависят от src.utils
+ASSETS_DIR = Path(__file__).parent.parent.parent / "assets" / "excursions"
+STATIC_URL_PREFIX = "/static/excursions"
+
+
+def is_uploaded_by_guide(photo_url: str) -> bool:
+    """Фотка загружена гидом: UUID-имя в /static/excursions/, внешний URL или base64."""
+    if not photo_url or not photo_url.strip():
+        return False
+    if photo_url.startswith(f"{STATIC_URL_PREFIX}/"):
+        filename = photo_url.split("/")[-1]
+        if len(filename) > 20 and ("-" in filename or filename.count(".") == 1):
+            return True
+    return photo_url.startswith("http") or photo_url.startswith("data:image")
+
+
+def resolve_photos(photos: str | None, title: str, asset_names: set[str]) -> str | None:
+    """
+    Итоговые фотки экскурсии: фотки гида не трогаются, пустые и dummy photo
+    заменяются файлом `title`.jpg из assets, если он есть.
+    """
+    if photos and photos.strip() and "dummyimage.com" not in photos.lower():
+        if any(is_uploaded_by_guide(photo.strip()) for photo in photos.split(",") if photo.strip()):
+            return photos
+    filename = f"{title}.jpg"
+    if filename in asset_names:
+        return f"{STATIC_URL_PREFIX}/{filename}"
+    return photos
+
+
+def upgrade() -> None:
+    """
+    Добавляет колонку resolved_photos и заполняет ее для всех экскурсий.
+
+    Обобщает 202602130000: подстановка фоток из assets выполняется для любого города
+    по правилам src.utils.enrich_excursion_photos на момент миграции (resolve_photos).
+    Для повторного пересчета используйте `python -m scripts.backfill_excursion_photos`.
+    """
+    op.add_column("excursions", sa.Column("resolved_photos", sa.Text(), nullable=True))
+
+    asset_names = {path.name for path in ASSETS_DIR.iterdir() if path.is_file()} if ASSETS_DIR.is_dir() else set()
+
+    conn = op.get_bind()
+    excursions = conn.execute(
+        sa.text("SELECT excursion_id, title, photos FROM excursions")
+    ).fetchall()
+
+    updates = [
+        {
+            "excursion_id": excursion_id,
+            "resolved_photos": resolve_photos(photos, title, asset_names),
+        }
+        for excursion_id, title, photos in excursions
+    ]
+    if updates:
+        conn.execute(
+            sa.text(
+                "UPDATE excursions SET resolved_photos = :resolved_photos WHERE excursion_id = :excursion_id"
+            ),
+            updates,
+        )
+
+
+def downgrade() -> None:
+    op.drop_column("excursions", "resolved_photos")
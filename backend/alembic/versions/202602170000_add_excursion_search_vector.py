@@ -0,0 +1,55 @@
+"""add excursion full-text search vector
+
+Revision ID: 202602170000
+Revises: 202602160000
+Create Date: 2026-02-17 00:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "202602170000"
+down_revision: Union[str, Sequence[str], None] = "202602160000"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Название важнее города, город важнее описания
+SEARCH_VECTOR_EXPRESSION = (
+    "setweight(to_tsvector('russian', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('russian', coalesce(city, '') || ' ' || coalesce(country, '')), 'B') || "
+    "setweight(to_tsvector('russian', coalesce(description, '')), 'C')"
+)
+
+
+def upgrade() -> None:
+    """
+    Добавляет вычисляемую колонку search_vector (tsvector, конфигурация russian)
+    и GIN-индекс по ней. PostgreSQL сам пересчитывает значение при каждой записи строки.
+    """
+    op.add_column(
+        "excursions",
+        sa.Column(
+            "search_vector",
+            postgresql.TSVECTOR(),
+            sa.Computed(SEARCH_VECTOR_EXPRESSION, persisted=True),
+            nullable=True,
+        ),
+    )
+    op.create_index(
+        "ix_excursions_search_vector",
+        "excursions",
+        ["search_vector"],
+        postgresql_using="gin",
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_excursions_search_vector", table_name="excursions")
+    op.drop_column("excursions", "search_vector")
@@ -0,0 +1,42 @@
+"""add updated_at to excursions
+
+Revision ID: 202602180000
+Revises: 202602170000
+Create Date: 2026-02-18 00:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "202602180000"
+down_revision: Union[str, Sequence[str], None] = "202602170000"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """
+    Добавляет excursions.updated_at - время последнего изменения строки
+    для условных GET-запросов (ETag/Last-Modified). Существующие строки
+    получают текущее время, индекс нужен для max(updated_at).
+    """
+    op.add_column(
+        "excursions",
+        sa.Column(
+            "updated_at",
+            sa.DateTime(),
+            nullable=False,
+            server_default=sa.text("(now() at time zone 'utc')"),
+        ),
+    )
+    op.create_index("ix_excursions_updated_at", "excursions", ["updated_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_excursions_updated_at", table_name="excursions")
+    op.drop_column("excursions", "updated_at")
@@ -0,0 +1,53 @@
+"""add excursion_slots inventory table
+
+Revision ID: 202602190000
+Revises: 202602180000
+Create Date: 2026-02-19 00:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "202602190000"
+down_revision: Union[str, Sequence[str], None] = "202602180000"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """
+    Создает таблицу excursion_slots (экскурсия, час начала, вместимость, занято)
+    и заполняет ее по действующим бронированиям.
+    """
+    op.create_table(
+        "excursion_slots",
+        sa.Column("slot_id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("excursion_id", sa.Integer(), nullable=False),
+        sa.Column("starts_at", sa.DateTime(), nullable=False),
+        sa.Column("capacity", sa.Integer(), nullable=True),
+        sa.Column("booked", sa.Integer(), server_default="0", nullable=False),
+        sa.ForeignKeyConstraint(["excursion_id"], ["excursions.excursion_id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("slot_id"),
+        sa.UniqueConstraint("excursion_id", "starts_at", name="uq_excursion_slots_excursion_starts_at"),
+    )
+
+    # Бронирования считаются по часу начала, как и в create_booking
+    op.execute(
+        """
+        INSERT INTO excursion_slots (excursion_id, starts_at, capacity, booked)
+        SELECT b.excursion_id, date_trunc('hour', b.date), e.available_slots, sum(b.number_of_people)
+        FROM bookings b
+        JOIN excursions e ON e.excursion_id = b.excursion_id
+        WHERE b.status IN ('confirmed', 'pending')
+        GROUP BY b.excursion_id, date_trunc('hour', b.date), e.available_slots
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("excursion_slots")
@@ -0,0 +1,67 @@
+"""add composite and partial booking indexes
+
+Revision ID: 202602200000
+Revises: 202602190000
+Create Date: 2026-02-20 00:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "202602200000"
+down_revision: Union[str, Sequence[str], None] = "202602190000"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+ACTIVE_BOOKING_PREDICATE = sa.text("status IN ('confirmed', 'pending')")
+
+
+def upgrade() -> None:
+    """
+    Индексы под запросы бронирований по диапазону времени:
+    - действующие бронирования экскурсии по времени (частичный, календарь гида);
+    - бронирования клиента по времени;
+    - экскурсии гида;
+    - слоты всех экскурсий за день (поиск по дате).
+
+    Индексы строятся CONCURRENTLY, чтобы не блокировать запись в bookings.
+    """
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_bookings_active_excursion_date",
+            "bookings",
+            ["excursion_id", "date"],
+            postgresql_where=ACTIVE_BOOKING_PREDICATE,
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            "ix_bookings_client_date",
+            "bookings",
+            ["client_id", "date"],
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            "ix_excursions_guide_id",
+            "excursions",
+            ["guide_id"],
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            "ix_excursion_slots_starts_at",
+            "excursion_slots",
+            ["starts_at"],
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_excursion_slots_starts_at", table_name="excursion_slots")
+    op.drop_index("ix_excursions_guide_id", table_name="excursions")
+    op.drop_index("ix_bookings_client_date", table_name="bookings")
+    op.drop_index("ix_bookings_active_excursion_date", table_name="bookings")
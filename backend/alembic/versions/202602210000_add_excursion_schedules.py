@@ -0,0 +1,67 @@
+"""add excursion schedules
+
+Revision ID: 202602210000
+Revises: 202602200000
+Create Date: 2026-02-21 00:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "202602210000"
+down_revision: Union[str, Sequence[str], None] = "202602200000"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """
+    Расписания экскурсий: еженедельные правила, исключения на даты
+    и горизонт записи. Экскурсии без правил по-прежнему проводятся
+    ежедневно в 09:00, 12:00, 15:00 и 18:00.
+    """
+    op.add_column("excursions", sa.Column("schedule_horizon_days", sa.Integer(), nullable=True))
+
+    op.create_table(
+        "excursion_schedule_rules",
+        sa.Column("rule_id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("excursion_id", sa.Integer(), nullable=False),
+        sa.Column("weekday", sa.Integer(), nullable=False),
+        sa.Column("start_time", sa.Time(), nullable=False),
+        sa.Column("valid_from", sa.Date(), nullable=True),
+        sa.Column("valid_until", sa.Date(), nullable=True),
+        sa.ForeignKeyConstraint(["excursion_id"], ["excursions.excursion_id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("rule_id"),
+    )
+    op.create_index(
+        "ix_excursion_schedule_rules_excursion_id", "excursion_schedule_rules", ["excursion_id"]
+    )
+
+    op.create_table(
+        "excursion_schedule_exceptions",
+        sa.Column("exception_id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("excursion_id", sa.Integer(), nullable=False),
+        sa.Column("date", sa.Date(), nullable=False),
+        sa.Column("kind", sa.String(length=20), nullable=False),
+        sa.Column("start_time", sa.Time(), nullable=True),
+        sa.ForeignKeyConstraint(["excursion_id"], ["excursions.excursion_id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("exception_id"),
+    )
+    op.create_index(
+        "ix_excursion_schedule_exceptions_excursion_date",
+        "excursion_schedule_exceptions",
+        ["excursion_id", "date"],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_excursion_schedule_exceptions_excursion_date", table_name="excursion_schedule_exceptions")
+    op.drop_table("excursion_schedule_exceptions")
+    op.drop_index("ix_excursion_schedule_rules_excursion_id", table_name="excursion_schedule_rules")
+    op.drop_table("excursion_schedule_rules")
+    op.drop_column("excursions", "schedule_horizon_days")
@@ -0,0 +1,41 @@
+"""add booking holds
+
+Revision ID: 202602220000
+Revises: 202602210000
+Create Date: 2026-02-22 00:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "202602220000"
+down_revision: Union[str, Sequence[str], None] = "202602210000"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+HOLD_PREDICATE = sa.text("status = 'pending' AND hold_expires_at IS NOT NULL")
+
+
+def upgrade() -> None:
+    """
+    Добавляет bookings.hold_expires_at - срок временной брони - и частичный
+    индекс по нему для фонового снятия просроченных броней.
+    """
+    op.add_column("bookings", sa.Column("hold_expires_at", sa.DateTime(), nullable=True))
+    op.create_index(
+        "ix_bookings_hold_expires_at",
+        "bookings",
+        ["hold_expires_at"],
+        postgresql_where=HOLD_PREDICATE,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_bookings_hold_expires_at", table_name="bookings")
+    op.drop_column("bookings", "hold_expires_at")
@@ -0,0 +1,58 @@
+"""add waitlist entries
+
+Revision ID: 202602240000
+Revises: 202602230000
+Create Date: 2026-02-24 00:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "202602240000"
+down_revision: Union[str, Sequence[str], None] = "202602230000"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+WAITING_PREDICATE = sa.text("status = 'waiting'")
+
+
+def upgrade() -> None:
+    """
+    Создает таблицу waitlist_entries - лист ожидания слотов экскурсий -
+    с частичным индексом по голове очереди каждого слота.
+    """
+    op.create_table(
+        "waitlist_entries",
+        sa.Column("entry_id", sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column(
+            "excursion_id",
+            sa.Integer(),
+            sa.ForeignKey("excursions.excursion_id", ondelete="CASCADE"),
+            nullable=False,
+        ),
+        sa.Column("starts_at", sa.DateTime(), nullable=False),
+        sa.Column("client_id", sa.Integer(), sa.ForeignKey("clients.client_id"), nullable=False),
+        sa.Column("number_of_people", sa.Integer(), nullable=False),
+        sa.Column("status", sa.String(length=20), nullable=False, server_default="waiting"),
+        sa.Column("created_at", sa.DateTime(), nullable=False, server_default=sa.func.now()),
+        sa.Column("booking_id", sa.Integer(), sa.ForeignKey("bookings.booking_id"), nullable=True),
+    )
+    op.create_index(
+        "ix_waitlist_entries_slot_queue",
+        "waitlist_entries",
+        ["excursion_id", "starts_at", "entry_id"],
+        postgresql_where=WAITING_PREDICATE,
+    )
+    op.create_index("ix_waitlist_entries_client_id", "waitlist_entries", ["client_id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_waitlist_entries_client_id", table_name="waitlist_entries")
+    op.drop_index("ix_waitlist_entries_slot_queue", table_name="waitlist_entries")
+    op.drop_table("waitlist_entries")
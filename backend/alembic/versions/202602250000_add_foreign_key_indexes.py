@@ -0,0 +1,74 @@
+"""add foreign key and catalog filter indexes
+
+Revision ID: 202602250000
+Revises: 202602240000
+Create Date: 2026-02-25 00:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "202602250000"
+down_revision: Union[str, Sequence[str], None] = "202602240000"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+APPROVED_EXCURSION_PREDICATE = sa.text("status = 'approved'")
+
+# (имя, таблица, колонки) полных индексов по внешним ключам
+FOREIGN_KEY_INDEXES = [
+    ("ix_excursions_moderator_id", "excursions", ["moderator_id"]),
+    ("ix_bookings_excursion_id", "bookings", ["excursion_id"]),
+    ("ix_bookings_payment_id", "bookings", ["payment_id"]),
+    ("ix_waitlist_entries_excursion_id", "waitlist_entries", ["excursion_id"]),
+    ("ix_waitlist_entries_booking_id", "waitlist_entries", ["booking_id"]),
+    ("ix_notifications_booking_id", "notifications", ["booking_id"]),
+    ("ix_notifications_client_id", "notifications", ["client_id"]),
+    ("ix_reviews_excursion_id", "reviews", ["excursion_id"]),
+    ("ix_reviews_client_id", "reviews", ["client_id"]),
+]
+
+
+def upgrade() -> None:
+    """
+    Индексы, которых не хватало по итогам проверки tests/test_index_coverage.py:
+    - внешние ключи без полного индекса (частичный индекс не годится для проверки
+      FK при удалении родительской строки);
+    - опубликованные экскурсии по городу и стране (частичные, фасеты каталога).
+
+    guides.user_id, clients.user_id и moderators.user_id уже покрыты ограничениями
+    уникальности, excursions.guide_id, excursions.status и bookings.client_id -
+    индексами из 202602150000 и 202602200000.
+
+    Индексы строятся CONCURRENTLY, чтобы не блокировать запись в таблицы.
+    """
+    with op.get_context().autocommit_block():
+        for name, table, columns in FOREIGN_KEY_INDEXES:
+            op.create_index(name, table, columns, postgresql_concurrently=True)
+        op.create_index(
+            "ix_excursions_approved_city",
+            "excursions",
+            ["city"],
+            postgresql_where=APPROVED_EXCURSION_PREDICATE,
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            "ix_excursions_approved_country",
+            "excursions",
+            ["country"],
+            postgresql_where=APPROVED_EXCURSION_PREDICATE,
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_excursions_approved_country", table_name="excursions")
+    op.drop_index("ix_excursions_approved_city", table_name="excursions")
+    for name, table, _ in reversed(FOREIGN_KEY_INDEXES):
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,155 @@
+"""partition bookings by month
+
+Revision ID: 202602260000
+Revises: 202602250000
+Create Date: 2026-02-26 00:00:00.000000
+
+"""
+
+from datetime import date, datetime, timezone
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "202602260000"
+down_revision: Union[str, Sequence[str], None] = "202602250000"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+ACTIVE_BOOKING_PREDICATE = sa.text("status IN ('confirmed', 'pending')")
+HOLD_PREDICATE = sa.text("status = 'pending' AND hold_expires_at IS NOT NULL")
+
+# столько месяцев вперед создается сразу, дальше секции создает src.partitions
+MONTHS_AHEAD = 6
+
+COLUMNS = (
+    "booking_id, date, number_of_people, status, payment_status, "
+    "excursion_id, client_id, payment_id, hold_expires_at"
+)
+
+# ссылки на bookings.booking_id, которые невозможны при секционировании
+# (уникальный ключ секционированной таблицы обязан включать date);
+# ссылки на удаленные бронирования обнуляет src.partitions.clear_orphan_booking_references
+BOOKING_REFERENCES = [
+    ("notifications_booking_id_fkey", "notifications"),
+    ("waitlist_entries_booking_id_fkey", "waitlist_entries"),
+]
+
+
+def add_months(month: date, count: int) -> date:
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def create_indexes() -> None:
+    op.create_index(
+        "ix_bookings_active_excursion_date",
+        "bookings",
+        ["excursion_id", "date"],
+        postgresql_where=ACTIVE_BOOKING_PREDICATE,
+    )
+    op.create_index("ix_bookings_excursion_id", "bookings", ["excursion_id"])
+    op.create_index("ix_bookings_client_date", "bookings", ["client_id", "date"])
+    op.create_index("ix_bookings_payment_id", "bookings", ["payment_id"])
+    op.create_index(
+        "ix_bookings_hold_expires_at",
+        "bookings",
+        ["hold_expires_at"],
+        postgresql_where=HOLD_PREDICATE,
+    )
+
+
+def drop_indexes(table: str) -> None:
+    for name in (
+        "ix_bookings_hold_expires_at",
+        "ix_bookings_payment_id",
+        "ix_bookings_client_date",
+        "ix_bookings_excursion_id",
+        "ix_bookings_active_excursion_date",
+    ):
+        op.drop_index(name, table_name=table)
+
+
+def upgrade() -> None:
+    """
+    Пересоздает bookings как таблицу, секционированную по месяцам `date`:
+    секции bookings_pYYYY_MM от месяца первого бронирования до MONTHS_AHEAD
+    месяцев вперед и страховочная bookings_default. Первичный ключ становится
+    (booking_id, date), последовательность booking_id сохраняется.
+
+    Данные копируются в одной транзакции, на время миграции запись
+    в bookings блокируется.
+    """
+    for name, table in BOOKING_REFERENCES:
+        op.drop_constraint(name, table, type_="foreignkey")
+
+    op.execute("ALTER TABLE bookings RENAME TO bookings_unpartitioned")
+    op.execute("ALTER TABLE bookings_unpartitioned RENAME CONSTRAINT bookings_pkey TO bookings_unpartitioned_pkey")
+    drop_indexes("bookings_unpartitioned")
+
+    op.execute("""
+        CREATE TABLE bookings (
+            booking_id INTEGER NOT NULL DEFAULT nextval('bookings_booking_id_seq'),
+            date TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            number_of_people INTEGER NOT NULL,
+            status VARCHAR(20) NOT NULL,
+            payment_status VARCHAR(20) NOT NULL,
+            excursion_id INTEGER NOT NULL REFERENCES excursions (excursion_id),
+            client_id INTEGER NOT NULL REFERENCES clients (client_id),
+            payment_id INTEGER NOT NULL REFERENCES payments (id),
+            hold_expires_at TIMESTAMP WITHOUT TIME ZONE,
+            PRIMARY KEY (booking_id, date)
+        ) PARTITION BY RANGE (date)
+    """)
+    op.execute("ALTER SEQUENCE bookings_booking_id_seq OWNED BY bookings.booking_id")
+
+    current = datetime.now(timezone.utc).date().replace(day=1)
+    first = op.get_bind().scalar(sa.text("SELECT min(date) FROM bookings_unpartitioned"))
+    month = min(first.date().replace(day=1), current) if first is not None else current
+    while month <= add_months(current, MONTHS_AHEAD):
+        upper = add_months(month, 1)
+        op.execute(
+            f"CREATE TABLE bookings_p{month:%Y_%m} PARTITION OF bookings "
+            f"FOR VALUES FROM ('{month}') TO ('{upper}')"
+        )
+        month = upper
+    op.execute("CREATE TABLE bookings_default PARTITION OF bookings DEFAULT")
+
+    op.execute(f"INSERT INTO bookings ({COLUMNS}) SELECT {COLUMNS} FROM bookings_unpartitioned")
+    op.drop_table("bookings_unpartitioned")
+    create_indexes()
+
+
+def downgrade() -> None:
+    """
+    Возвращает обычную таблицу bookings со всеми данными секций и ограничения FOREIGN KEY на нее.
+    """
+    op.execute("ALTER TABLE bookings RENAME TO bookings_partitioned")
+    op.execute("ALTER TABLE bookings_partitioned RENAME CONSTRAINT bookings_pkey TO bookings_partitioned_pkey")
+    drop_indexes("bookings_partitioned")
+
+    op.execute("""
+        CREATE TABLE bookings (
+            booking_id INTEGER NOT NULL DEFAULT nextval('bookings_booking_id_seq') PRIMARY KEY,
+            date TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            number_of_people INTEGER NOT NULL,
+            status VARCHAR(20) NOT NULL,
+            payment_status VARCHAR(20) NOT NULL,
+            excursion_id INTEGER NOT NULL REFERENCES excursions (excursion_id),
+            client_id INTEGER NOT NULL REFERENCES clients (client_id),
+            payment_id INTEGER NOT NULL REFERENCES payments (id),
+            hold_expires_at TIMESTAMP WITHOUT TIME ZONE
+        )
+    """)
+    op.execute("ALTER SEQUENCE bookings_booking_id_seq OWNED BY bookings.booking_id")
+    op.execute(f"INSERT INTO bookings ({COLUMNS}) SELECT {COLUMNS} FROM bookings_partitioned")
+    # секции удаляются вместе с родительской таблицей
+    op.drop_table("bookings_partitioned")
+    create_indexes()
+
+    for name, table in BOOKING_REFERENCES:
+        op.create_foreign_key(name, table, "bookings", ["booking_id"], ["booking_id"])
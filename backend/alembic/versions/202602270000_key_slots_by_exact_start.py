@@ -0,0 +1,60 @@
+"""key excursion slots by exact start time
+
+Revision ID: 202602270000
+Revises: 202602260000
+Create Date: 2026-02-27 00:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "202602270000"
+down_revision: Union[str, Sequence[str], None] = "202602260000"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def rebuild_future_slots(precision: str) -> None:
+    """Пересчитать будущие слоты по действующим бронированиям с ключом date_trunc(precision, date)."""
+    op.execute(
+        f"""
+        INSERT INTO excursion_slots (excursion_id, starts_at, capacity, booked)
+        SELECT b.excursion_id, date_trunc('{precision}', b.date), e.available_slots, 0
+        FROM bookings b
+        JOIN excursions e ON e.excursion_id = b.excursion_id
+        WHERE b.status IN ('confirmed', 'pending') AND b.date >= now()
+        GROUP BY b.excursion_id, date_trunc('{precision}', b.date), e.available_slots
+        ON CONFLICT (excursion_id, starts_at) DO NOTHING
+        """
+    )
+    op.execute(
+        f"""
+        UPDATE excursion_slots s
+        SET booked = coalesce((
+            SELECT sum(b.number_of_people)
+            FROM bookings b
+            WHERE b.excursion_id = s.excursion_id
+              AND b.date >= s.starts_at
+              AND b.date < s.starts_at + interval '1 {precision}'
+              AND b.status IN ('confirmed', 'pending')
+        ), 0)
+        WHERE s.starts_at >= date_trunc('hour', now())
+        """
+    )
+
+
+def upgrade() -> None:
+    """
+    Слоты считаются по точному времени начала (с точностью до минуты), а не по часу:
+    бронирования на 09:30 раньше занимали слот 09:00, а календарь читал слот 09:30.
+    Будущие слоты пересчитываются по действующим бронированиям.
+    """
+    rebuild_future_slots("minute")
+
+
+def downgrade() -> None:
+    rebuild_future_slots("hour")
@@ -0,0 +1,143 @@
+"""
+Нагрузочный тест бронирования одного популярного слота.
+
+Одновременно отправляет сотни POST /api/bookings на один и тот же слот
+экскурсии с ограниченным количеством мест и проверяет, что:
+    - сумма мест в успешных бронированиях не превышает вместимость;
+    - счетчик excursion_slots.booked совпадает с суммой мест в бронированиях БД;
+    - отказы приходят только как 400 «нет свободных мест», без 500.
+
+Выводит пропускную способность (запросов в секунду), p50/p99 задержки
+и время ожидания соединения из пула (см. DB_POOL_* в src/config.py).
+Запускается против PostgreSQL из настроек приложения (pg.env); созданные
+тестовые данные удаляются в конце.
+
+Использование:
+    python -m benchmarks.booking_contention [запросов] [вместимость] [макс_группа]
+"""
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+
+# Добавляем путь к корню проекта
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import delete, func, select
+
+from src.database import async_engine, async_session_factory, pool_stats
+from src.main import app
+from src.models import Booking, Client, Excursion, ExcursionSlot, Guide, Payment, User
+from src.routers import excursions_router
+
+
+async def setup(capacity: int):
+    async with async_session_factory(expire_on_commit=False) as session:
+        user = User(
+            email=f"contention-{uuid.uuid4().hex[:8]}@example.com",
+            name="Нагрузочный тест",
+            hashed_password="x",
+            is_active=True,
+        )
+        session.add(user)
+        await session.flush()
+        guide = Guide(user_id=user.id)
+        session.add(guide)
+        await session.flush()
+        excursion = Excursion(
+            title="Нагрузочный тест бронирования",
+            country="Россия",
+            city="Москва",
+            difficulty="easy",
+            price_per_person=1000,
+            status="approved",
+            available_slots=capacity,
+            guide_id=guide.guide_id,
+        )
+        session.add(excursion)
+        await session.commit()
+        return user, excursion
+
+
+async def cleanup(user: User, excursion: Excursion) -> None:
+    async with async_session_factory() as session:
+        payment_ids = select(Booking.payment_id).where(Booking.excursion_id == excursion.excursion_id)
+        payment_ids = list(await session.scalars(payment_ids))
+        await session.execute(delete(Booking).where(Booking.excursion_id == excursion.excursion_id))
+        await session.execute(delete(Payment).where(Payment.id.in_(payment_ids)))
+        await session.execute(delete(ExcursionSlot).where(ExcursionSlot.excursion_id == excursion.excursion_id))
+        await session.execute(delete(Excursion).where(Excursion.excursion_id == excursion.excursion_id))
+        await session.execute(delete(Guide).where(Guide.user_id == user.id))
+        await session.execute(delete(Client).where(Client.user_id == user.id))
+        await session.execute(delete(User).where(User.id == user.id))
+        await session.commit()
+
+
+async def run(requests: int = 300, capacity: int = 50, max_group: int = 3) -> None:
+    user, excursion = await setup(capacity)
+    app.dependency_overrides[excursions_router.current_active_user] = lambda: user
+
+    starts_at = datetime.combine(datetime.now().date() + timedelta(days=7), datetime.min.time()).replace(hour=12)
+    groups = [random.randint(1, max_group) for _ in range(requests)]
+    statuses: dict[int, int] = {}
+    sold = 0
+    latencies = []
+
+    async def book(client: AsyncClient, people: int) -> None:
+        nonlocal sold
+        started = time.perf_counter()
+        response = await client.post(
+            "/api/bookings",
+            json={"excursion_id": excursion.excursion_id, "date": starts_at.isoformat(), "number_of_people": people},
+        )
+        latencies.append(time.perf_counter() - started)
+        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+        if response.status_code == 201:
+            sold += people
+
+    try:
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://bench", timeout=120) as client:
+            started = time.perf_counter()
+            await asyncio.gather(*(book(client, people) for people in groups))
+            elapsed = time.perf_counter() - started
+
+        async with async_session_factory() as session:
+            booked = await session.scalar(
+                select(ExcursionSlot.booked).where(ExcursionSlot.excursion_id == excursion.excursion_id)
+            )
+            in_bookings = await session.scalar(
+                select(func.coalesce(func.sum(Booking.number_of_people), 0))
+                .where(Booking.excursion_id == excursion.excursion_id)
+            )
+
+        latencies.sort()
+        print(f"Запросов: {requests}, вместимость слота: {capacity}, группа: 1..{max_group}")
+        print(f"Ответы: {dict(sorted(statuses.items()))}")
+        print(f"Продано мест: {sold}, booked в слоте: {booked}, мест в бронированиях: {in_bookings}")
+        print(f"Пропускная способность: {requests / elapsed:.1f} запросов/с за {elapsed:.2f} с")
+        print(f"Задержка p50: {statistics.median(latencies) * 1000:.1f} мс, "
+              f"p99: {latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000:.1f} мс")
+        wait = pool_stats(async_engine)["wait"]
+        print(f"Ожидание соединения из пула: {wait['count']} выдач, макс. {wait['max_ms']:.1f} мс, "
+              f"таймаутов {wait['timeouts']}, гистограмма (мс): {wait['buckets_le_ms']}")
+
+        assert sold <= capacity, "перепродажа: продано больше мест, чем вмещает слот"
+        assert sold == booked == in_bookings, "счетчик слота расходится с бронированиями"
+        assert set(statuses) <= {201, 400}, "есть ответы с ошибкой сервера"
+        print("OK: перепродаж нет")
+    finally:
+        app.dependency_overrides.pop(excursions_router.current_active_user, None)
+        await cleanup(user, excursion)
+        await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    capacity = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    max_group = int(sys.argv[3]) if len(sys.argv) > 3 else 3
+    asyncio.run(run(requests, capacity, max_group))
@@ -0,0 +1,166 @@
+"""
+Нагрузочный бенчмарк отдачи больших JSON-списков.
+
+Поднимает приложение на SQLite в памяти с каталогом из N экскурсий и сравнивает
+прежний путь (ORM-объекты -> валидация ExcursionRead -> jsonable_encoder)
+с сериализацией строк напрямую (src.responses) на эндпоинтах:
+    GET /api/admin/excursions      - весь каталог одним ответом
+    GET /api/excursions?limit=100  - страница поиска (кэш каталога сбрасывается
+                                     перед каждым запросом, меряется сам запрос)
+
+Для каждого варианта выводятся запросы в секунду, p50/p99 задержки и размер
+ответа с gzip и без.
+
+Использование:
+    python -m benchmarks.json_responses [количество_экскурсий] [запросов] [параллельность]
+"""
+import asyncio
+import os
+import statistics
+import sys
+import time
+from typing import List
+
+# Добавляем путь к корню проекта
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import Depends
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from src.cache import catalog_cache
+from src.database import get_session
+from src.main import app
+from src.models import Base, Excursion, Guide, User
+from src.routers import admin_router
+from src.routers.excursions_router import _catalog_version
+from src.schemas.excursion import ExcursionRead
+
+
+async def legacy_list_all_excursions(session: AsyncSession = Depends(get_session)) -> List[ExcursionRead]:
+    """Прежняя реализация: ORM-объекты и сериализация через response_model."""
+    result = await session.execute(select(Excursion).order_by(Excursion.excursion_id.desc()))
+    return result.scalars().all()
+
+
+async def legacy_search_excursions(session: AsyncSession = Depends(get_session)) -> List[ExcursionRead]:
+    """
+    Прежняя реализация страницы поиска: ORM-объекты и сериализация через response_model.
+    Запрос версии каталога для ETag выполняется, как и в текущем эндпоинте.
+    """
+    await _catalog_version(session)
+    result = await session.execute(
+        select(Excursion)
+        .where(Excursion.status == "approved")
+        .order_by(Excursion.excursion_id.desc())
+        .limit(100)
+    )
+    return result.scalars().all()
+
+
+async def seed(session_factory, count: int) -> None:
+    async with session_factory() as session:
+        user = User(email="guide@example.com", name="Гид", hashed_password="x", is_active=True)
+        session.add(user)
+        await session.flush()
+        guide = Guide(user_id=user.id)
+        session.add(guide)
+        await session.flush()
+        await session.execute(insert(Excursion), [
+            {
+                "title": f"Экскурсия {i}",
+                "country": "Россия",
+                "city": ("Москва", "Санкт-Петербург", "Казань")[i % 3],
+                "difficulty": "easy",
+                "description": "Прогулка по историческому центру города с посещением музеев. " * 3,
+                "photos": f"/static/excursions/{i}.jpg",
+                "resolved_photos": f"/static/excursions/{i}.jpg",
+                "price_per_person": 500 + i % 50 * 100,
+                "status": "approved",
+                "available_slots": 10,
+                "guide_id": guide.guide_id,
+            }
+            for i in range(count)
+        ])
+        await session.commit()
+
+
+async def measure(client: AsyncClient, url: str, requests: int, concurrency: int, headers=None, before=None) -> dict:
+    latencies = []
+    queue = list(range(requests))
+
+    async def worker():
+        while queue:
+            queue.pop()
+            if before is not None:
+                before()
+            started = time.perf_counter()
+            response = await client.get(url, headers=headers)
+            latencies.append(time.perf_counter() - started)
+            assert response.status_code == 200, response.text
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "rps": requests / elapsed,
+        "p50": statistics.median(latencies) * 1000,
+        "p99": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000,
+    }
+
+
+async def response_size(client: AsyncClient, url: str, encoding: str) -> int:
+    response = await client.get(url, headers={"Accept-Encoding": encoding})
+    return int(response.headers.get("content-length") or len(response.content))
+
+
+async def run(count: int = 10_000, requests: int = 50, concurrency: int = 4) -> None:
+    engine = create_async_engine(
+        "sqlite+aiosqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    session_factory = async_sessionmaker(engine, expire_on_commit=False)
+    await seed(session_factory, count)
+
+    async def override_get_session():
+        async with session_factory() as session:
+            yield session
+
+    app.dependency_overrides[get_session] = override_get_session
+    app.dependency_overrides[admin_router.current_active_superuser] = lambda: None
+    app.add_api_route("/legacy/admin/excursions", legacy_list_all_excursions, response_model=List[ExcursionRead])
+    app.add_api_route("/legacy/excursions", legacy_search_excursions, response_model=List[ExcursionRead])
+
+    cases = [
+        ("admin, прежний путь", "/legacy/admin/excursions", None),
+        ("admin, строки -> JSON", "/api/admin/excursions", None),
+        ("поиск, прежний путь", "/legacy/excursions", None),
+        ("поиск, строки -> JSON", "/api/excursions?limit=100", catalog_cache.clear),
+    ]
+
+    print(f"Экскурсий: {count}, запросов: {requests}, параллельно: {concurrency}")
+    print(f"{'вариант':<24}{'req/s':>10}{'p50, мс':>10}{'p99, мс':>10}{'identity':>12}{'gzip':>10}")
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://bench") as client:
+        for name, url, before in cases:
+            # прогрев
+            await client.get(url)
+            stats = await measure(client, url, requests, concurrency, headers={"Accept-Encoding": "gzip"}, before=before)
+            plain = await response_size(client, url, "identity")
+            gzipped = await response_size(client, url, "gzip")
+            print(f"{name:<24}{stats['rps']:>10.1f}{stats['p50']:>10.1f}{stats['p99']:>10.1f}{plain:>12}{gzipped:>10}")
+
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    requests = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    concurrency = int(sys.argv[3]) if len(sys.argv) > 3 else 4
+    asyncio.run(run(count, requests, concurrency))
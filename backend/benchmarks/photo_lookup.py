@@ -0,0 +1,60 @@
+"""
+Микробенчмарк подстановки фотографий экскурсий.
+
+Сравнивает прежний способ (Path.exists() на каждую экскурсию) с поиском
+по индексу AssetManifest на выдаче из N экскурсий.
+
+Использование:
+    python -m benchmarks.photo_lookup [количество_экскурсий] [повторов]
+"""
+import os
+import sys
+import timeit
+
+# Добавляем путь к корню проекта
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.utils import ASSETS_DIR, STATIC_URL_PREFIX, asset_manifest, get_excursion_photo_path
+
+
+def legacy_photo_path(title: str) -> str | None:
+    """Прежняя реализация get_excursion_photo_path: stat на каждый вызов."""
+    filename = f"{title}.jpg"
+    if (ASSETS_DIR / filename).exists():
+        return f"{STATIC_URL_PREFIX}/{filename}"
+    return None
+
+
+def make_titles(count: int) -> list[str]:
+    """Названия экскурсий: часть с фотографией в assets, часть без."""
+    existing = sorted(p.stem for p in ASSETS_DIR.glob("*.jpg"))
+    titles = []
+    for i in range(count):
+        if existing and i % 2 == 0:
+            titles.append(existing[i % len(existing)])
+        else:
+            titles.append(f"Экскурсия без фото {i}")
+    return titles
+
+
+def run(count: int = 500, repeat: int = 200) -> None:
+    titles = make_titles(count)
+    asset_manifest.refresh()
+
+    legacy = [legacy_photo_path(t) for t in titles]
+    indexed = [get_excursion_photo_path(t, "") for t in titles]
+    assert legacy == indexed, "результаты реализаций расходятся"
+
+    legacy_time = min(timeit.repeat(lambda: [legacy_photo_path(t) for t in titles], number=1, repeat=repeat))
+    indexed_time = min(timeit.repeat(lambda: [get_excursion_photo_path(t, "") for t in titles], number=1, repeat=repeat))
+
+    print(f"Экскурсий в выдаче: {count}, файлов в assets: {len(asset_manifest)}")
+    print(f"Path.exists():   {legacy_time * 1000:8.3f} мс на выдачу")
+    print(f"AssetManifest:   {indexed_time * 1000:8.3f} мс на выдачу")
+    print(f"Ускорение:       {legacy_time / indexed_time:8.1f}x")
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    run(count, repeat)
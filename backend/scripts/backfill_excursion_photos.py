@@ -0,0 +1,52 @@
+"""
+Скрипт для пересчета итоговых фоток экскурсий (колонка resolved_photos).
+Запускать после ручного добавления или удаления файлов в assets/excursions.
+Использование:
+    python -m scripts.backfill_excursion_photos [название экскурсии ...]
+"""
+import asyncio
+import sys
+import os
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+# Добавляем путь к корню проекта
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.config import settings
+from src.cache import invalidate_catalog
+from src.utils import refresh_resolved_photos
+
+
+async def backfill_excursion_photos(titles: set[str] | None = None):
+    """Пересчитывает resolved_photos у всех экскурсий или только у указанных."""
+    # Создаем движок и сессию для скрипта
+    engine = create_async_engine(
+        settings.DATABASE_URL_asyncpg,
+        echo=False,
+    )
+    
+    async_session = async_sessionmaker(engine, expire_on_commit=False)
+    
+    try:
+        async with async_session() as session:
+            changed = await refresh_resolved_photos(session, titles)
+            if changed:
+                # сбрасываем кэш каталога в запущенных воркерах
+                await invalidate_catalog(session)
+            await session.commit()
+            
+            print(f"✅ Обновлены фотки у {changed} экскурсий")
+            return True
+            
+    except Exception as e:
+        print(f"❌ Ошибка: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    titles = set(sys.argv[1:]) or None
+    asyncio.run(backfill_excursion_photos(titles))
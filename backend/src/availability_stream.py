@@ -0,0 +1,129 @@
+"""
+Поток изменений свободных мест экскурсий (Server-Sent Events).
+
+Каждое изменение счетчика слота (src.inventory, src.waitlist) публикуется
+в канал SEATS_CHANNEL в транзакции, которая его сделала. После commit событие
+получают подписчики текущего процесса, а через NOTIFY - остальные воркеры
+(src.pubsub). Клиенты страницы экскурсии держат открытым
+GET /api/excursions/{id}/availability/stream и применяют изменения к календарю
+вместо периодического опроса available-dates.
+
+Событие `seats` содержит время слота, изменение и новое значение `booked`
+и вместимость: абсолютные значения позволяют применять события повторно
+и в любом порядке относительно загрузки календаря. Событие `resync` просит
+клиента перезагрузить календарь (изменилась вместимость или подписчик
+не успевал читать события).
+"""
+import asyncio
+import json
+import logging
+from collections import defaultdict
+from datetime import datetime
+from typing import AsyncIterator, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.config import settings
+from src.pubsub import pg_listener, publish
+
+log = logging.getLogger(__name__)
+
+# Канал NOTIFY изменений мест в слотах
+SEATS_CHANNEL = "seats_changed"
+
+RESYNC_EVENT = "resync"
+SEATS_EVENT = "seats"
+
+
+class AvailabilityHub:
+    """Подписчики потока мест в текущем процессе: очередь событий на каждое соединение."""
+
+    def __init__(self, queue_size: int) -> None:
+        self.queue_size = queue_size
+        self._subscribers: dict[int, set[asyncio.Queue]] = defaultdict(set)
+
+    def subscribe(self, excursion_id: int) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers[excursion_id].add(queue)
+        return queue
+
+    def unsubscribe(self, excursion_id: int, queue: asyncio.Queue) -> None:
+        subscribers = self._subscribers.get(excursion_id)
+        if subscribers is None:
+            return
+        subscribers.discard(queue)
+        if not subscribers:
+            del self._subscribers[excursion_id]
+
+    def subscribers(self, excursion_id: int) -> int:
+        return len(self._subscribers.get(excursion_id, ()))
+
+    def resync_all(self) -> None:
+        """Попросить всех подписчиков перезагрузить календарь (события могли быть пропущены)."""
+        for excursion_id, queues in self._subscribers.items():
+            for queue in queues:
+                self._put(queue, excursion_id, RESYNC_EVENT, json.dumps({"event": RESYNC_EVENT, "excursion_id": excursion_id}))
+
+    def _put(self, queue: asyncio.Queue, excursion_id: int, event: str, payload: str) -> None:
+        try:
+            queue.put_nowait((event, payload))
+        except asyncio.QueueFull:
+            # подписчик не успевает читать: накопленное заменяется одной просьбой перезагрузить календарь
+            while not queue.empty():
+                queue.get_nowait()
+            queue.put_nowait((RESYNC_EVENT, json.dumps({"excursion_id": excursion_id})))
+
+    def dispatch(self, payload: str) -> None:
+        """Разослать событие канала SEATS_CHANNEL подписчикам его экскурсии."""
+        try:
+            data = json.loads(payload)
+        except ValueError:
+            log.warning("Некорректное событие мест: %r", payload)
+            return
+        for queue in self._subscribers.get(data.get("excursion_id"), ()):
+            self._put(queue, data.get("excursion_id"), data.get("event", SEATS_EVENT), payload)
+
+
+availability_hub = AvailabilityHub(queue_size=settings.SSE_QUEUE_SIZE)
+pg_listener.subscribe(SEATS_CHANNEL, availability_hub.dispatch)
+pg_listener.on_resync(availability_hub.resync_all)
+
+
+async def publish_seats(
+    session: AsyncSession,
+    excursion_id: int,
+    starts_at: datetime,
+    delta: int,
+    booked: int,
+    capacity: Optional[int],
+) -> None:
+    """Опубликовать изменение мест слота (доставляется после commit)."""
+    await publish(session, SEATS_CHANNEL, json.dumps({
+        "excursion_id": excursion_id,
+        "starts_at": starts_at.isoformat(),
+        "delta": delta,
+        "booked": booked,
+        "capacity": capacity,
+    }))
+
+
+async def publish_resync(session: AsyncSession, excursion_id: int) -> None:
+    """Попросить подписчиков экскурсии перезагрузить календарь (доставляется после commit)."""
+    await publish(session, SEATS_CHANNEL, json.dumps({"event": RESYNC_EVENT, "excursion_id": excursion_id}))
+
+
+async def sse_events(queue: asyncio.Queue) -> AsyncIterator[str]:
+    """
+    События очереди подписчика в формате text/event-stream.
+
+    Если событий нет SSE_KEEPALIVE_SECONDS, отправляется комментарий,
+    чтобы прокси не закрывали простаивающее соединение.
+    """
+    yield f"retry: {settings.SSE_RETRY_MILLISECONDS}\n\n"
+    while True:
+        try:
+            event, payload = await asyncio.wait_for(queue.get(), timeout=settings.SSE_KEEPALIVE_SECONDS)
+        except asyncio.TimeoutError:
+            yield ": keepalive\n\n"
+            continue
+        yield f"event: {event}\ndata: {payload}\n\n"
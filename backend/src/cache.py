@@ -0,0 +1,96 @@
+"""
+Кэш каталога экскурсий в памяти процесса.
+
+Хранит уже сериализованные JSON-ответы публичных эндпоинтов каталога.
+Записи живут не дольше TTL, при переполнении вытесняются давно неиспользуемые (LRU).
+Любое изменение каталога сбрасывает кэш во всех воркерах через `src.pubsub`.
+"""
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Hashable
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.config import settings
+from src.pubsub import pg_listener, publish
+
+# Канал NOTIFY для сброса кэша каталога
+CATALOG_CHANNEL = "catalog_changed"
+
+
+class TTLCache:
+    """LRU-кэш с ограничением времени жизни записей и счетчиками для подбора размера."""
+
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key: Hashable) -> Any | None:
+        """Получить значение или None, если записи нет или она устарела."""
+        item = self._data.get(key)
+        if item is None:
+            self.misses += 1
+            return None
+
+        expires_at, value = item
+        if expires_at < time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return None
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        self._data.clear()
+        self.invalidations += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+
+catalog_cache = TTLCache(
+    maxsize=settings.CATALOG_CACHE_MAX_ENTRIES,
+    ttl=settings.CATALOG_CACHE_TTL_SECONDS,
+)
+
+pg_listener.subscribe(CATALOG_CHANNEL, lambda payload: catalog_cache.clear())
+pg_listener.on_resync(catalog_cache.clear)
+
+
+async def invalidate_catalog(session: AsyncSession, facets_delta: dict | None = None) -> None:
+    """
+    Сбросить кэш каталога после фиксации текущей транзакции.
+
+    Вызывается перед commit в эндпоинтах, меняющих опубликованные экскурсии.
+
+    Args:
+        session: Сессия с изменениями
+        facets_delta: Изменение счетчиков фасетов (см. src.facets.facet_delta)
+    """
+    payload = json.dumps({"facets": facets_delta}, ensure_ascii=False) if facets_delta else ""
+    await publish(session, CATALOG_CHANNEL, payload)
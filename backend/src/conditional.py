@@ -0,0 +1,74 @@
+"""
+Условные GET-запросы (ETag / Last-Modified).
+
+Эндпоинт вычисляет валидаторы дешевым запросом (без загрузки ORM-объектов
+и сериализации), и если копия клиента актуальна, сразу отвечает 304 Not Modified.
+"""
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional
+
+from fastapi import Request, Response, status
+
+# Ответы каталога клиент должен перепроверять, но может хранить у себя
+CACHE_CONTROL = "no-cache"
+
+
+def make_etag(*parts) -> str:
+    """Слабый ETag из произвольного набора значений."""
+    digest = hashlib.sha1("|".join(str(part) for part in parts).encode()).hexdigest()[:20]
+    return f'W/"{digest}"'
+
+
+def _strip_weak(tag: str) -> str:
+    tag = tag.strip()
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def is_not_modified(request: Request, etag: str, last_modified: Optional[datetime]) -> bool:
+    """
+    Проверить заголовки If-None-Match / If-Modified-Since запроса.
+
+    If-None-Match имеет приоритет; сравнение ETag слабое (RFC 9110, 13.1.2).
+
+    Args:
+        request: Входящий запрос
+        etag: Текущий ETag ресурса
+        last_modified: Время последнего изменения ресурса (UTC, без tzinfo)
+
+    Returns:
+        True, если можно ответить 304
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+        current = _strip_weak(etag)
+        return any(_strip_weak(tag) == current for tag in if_none_match.split(","))
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        # в HTTP-дате нет долей секунды
+        return last_modified.replace(tzinfo=timezone.utc, microsecond=0) <= since
+
+    return False
+
+
+def validator_headers(etag: str, last_modified: Optional[datetime]) -> dict:
+    """Заголовки ETag, Last-Modified и Cache-Control для ответа."""
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(last_modified.replace(tzinfo=timezone.utc), usegmt=True)
+    return headers
+
+
+def not_modified(etag: str, last_modified: Optional[datetime]) -> Response:
+    """Ответ 304 Not Modified с валидаторами."""
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=validator_headers(etag, last_modified))
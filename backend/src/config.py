@@ -1,3 +1,5 @@
+from typing import Literal, Optional
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -8,14 +10,87 @@ class Settings(BaseSettings):
     DB_PASS: str
     DB_NAME: str
 
+    # пул соединений: на каждый воркер приходится до DB_POOL_SIZE + DB_MAX_OVERFLOW соединений
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT_SECONDS: float = 30
+    DB_POOL_RECYCLE_SECONDS: int = 1800
+    DB_POOL_PRE_PING: bool = False
+    # кэш подготовленных выражений asyncpg (0 - выключен) и кэш компиляции запросов SQLAlchemy
+    DB_STATEMENT_CACHE_SIZE: int = 100
+    DB_QUERY_CACHE_SIZE: int = 500
+    # журнал SQL: off - выключен, sql - запросы, debug - запросы, строки результатов и события пула
+    DB_ECHO: Literal["off", "sql", "debug"] = "off"
+
+    # реплика для чтения каталога (src.replica); без DB_REPLICA_HOST все запросы идут в основную БД
+    DB_REPLICA_HOST: Optional[str] = None
+    DB_REPLICA_PORT: Optional[int] = None
+    # при большем отставании чтение возвращается в основную БД
+    DB_REPLICA_MAX_LAG_SECONDS: float = 5.0
+    DB_REPLICA_LAG_CHECK_SECONDS: float = 2.0
+    # запас к отставанию для read-your-writes после изменений
+    DB_REPLICA_LAG_MARGIN_SECONDS: float = 1.0
+
     RESET_PASSWORD_TOKEN_SECRET: str
     VERIFICATION_TOKEN_SECRET: str
     SECRET: str
 
+    CATALOG_CACHE_TTL_SECONDS: int = 60
+    CATALOG_CACHE_MAX_ENTRIES: int = 1024
+    FACETS_REBUILD_SECONDS: int = 300
+
+    ASSETS_WATCH_ENABLED: bool = True
+
+    # временные брони: срок жизни и фоновое снятие просроченных
+    BOOKING_HOLD_TTL_SECONDS: int = 900
+    HOLD_SWEEP_INTERVAL_SECONDS: int = 30
+    HOLD_SWEEP_BATCH_SIZE: int = 500
+    HOLD_SWEEPER_ENABLED: bool = True
+
+    # срок, за который клиент из листа ожидания должен подтвердить бронь
+    WAITLIST_OFFER_TTL_SECONDS: int = 3600
+    # сколько заявок продвигается за раз в слотах без ограничения мест
+    WAITLIST_PROMOTE_BATCH_SIZE: int = 500
+
+    # поток свободных мест (SSE): keepalive, пауза переподключения и очередь подписчика
+    SSE_KEEPALIVE_SECONDS: int = 15
+    SSE_RETRY_MILLISECONDS: int = 3000
+    SSE_QUEUE_SIZE: int = 100
+
+    # соединение LISTEN (src.pubsub): проверка живости и наибольшая пауза между переподключениями
+    PUBSUB_HEALTHCHECK_SECONDS: int = 30
+    PUBSUB_RECONNECT_MAX_SECONDS: int = 30
+
+    # ключи идемпотентности POST /api/bookings
+    IDEMPOTENCY_KEY_TTL_SECONDS: int = 86400
+    IDEMPOTENCY_CACHE_MAX_ENTRIES: int = 10000
+    IDEMPOTENCY_SWEEP_INTERVAL_SECONDS: int = 3600
+
+    # помесячные секции bookings (PostgreSQL): запас секций вперед, архивация месяцев старше BOOKING_ARCHIVE_AFTER_DAYS
+    BOOKING_PARTITIONS_MONTHS_AHEAD: int = 6
+    BOOKING_ARCHIVE_AFTER_DAYS: int = 90
+    BOOKING_PARTITIONS_INTERVAL_SECONDS: int = 86400
+    BOOKING_PARTITIONS_LOCK_TIMEOUT_MS: int = 5000
+
+    # ответы больше порога (в байтах) сжимаются gzip, 0 - сжатие выключено
+    GZIP_MINIMUM_SIZE: int = 1024
+    GZIP_COMPRESS_LEVEL: int = 5
+
     @property
     def DATABASE_URL_asyncpg(self):
         return f"postgresql+asyncpg://{self.DB_USER}:{self.DB_PASS}@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}"
 
+    @property
+    def DATABASE_URL_replica_asyncpg(self):
+        if not self.DB_REPLICA_HOST:
+            return None
+        port = self.DB_REPLICA_PORT or self.DB_PORT
+        return f"postgresql+asyncpg://{self.DB_USER}:{self.DB_PASS}@{self.DB_REPLICA_HOST}:{port}/{self.DB_NAME}"
+
+    @property
+    def DATABASE_DSN(self):
+        return f"postgresql://{self.DB_USER}:{self.DB_PASS}@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}"
+
     @property
     def DATABASE_URL_psycopg2(self):
         return f"postgresql+psycopg2://{self.DB_USER}:{self.DB_PASS}@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}"
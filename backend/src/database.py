@@ -1,23 +1,190 @@
-from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
-from src.config import settings
+import bisect
+import time
+
+from sqlalchemy import exc
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
-from fastapi import Depends
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from fastapi import Depends, Request
+from fastapi.routing import APIRoute
 from fastapi_users_db_sqlalchemy import SQLAlchemyUserDatabase
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from src.config import settings
 from src.models import User
 
 
-async_engine = create_async_engine(
-    url=settings.DATABASE_URL_asyncpg,
-    echo=True,
-    
-)
+# Границы корзин гистограммы ожидания соединения, мс
+POOL_WAIT_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+# DB_ECHO -> параметры echo/echo_pool движка
+ECHO_MODES = {
+    "off": (False, False),
+    "sql": (True, False),
+    "debug": ("debug", "debug"),
+}
+
+
+class PoolMetrics:
+    """Время получения соединения из пула: гистограмма, сумма и число таймаутов."""
+
+    def __init__(self) -> None:
+        self.counts = [0] * (len(POOL_WAIT_BUCKETS_MS) + 1)
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.timeouts = 0
+
+    def observe(self, seconds: float) -> None:
+        ms = seconds * 1000
+        self.counts[bisect.bisect_left(POOL_WAIT_BUCKETS_MS, ms)] += 1
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+
+    def stats(self) -> dict:
+        """Гистограмма в формате Prometheus: число ожиданий не дольше `le` мс (накопительно)."""
+        buckets = {}
+        cumulative = 0
+        for bound, count in zip((*POOL_WAIT_BUCKETS_MS, "+Inf"), self.counts):
+            cumulative += count
+            buckets[str(bound)] = cumulative
+        return {
+            "count": cumulative,
+            "sum_ms": round(self.total_ms, 3),
+            "max_ms": round(self.max_ms, 3),
+            "timeouts": self.timeouts,
+            "buckets_le_ms": buckets,
+        }
+
+
+class MeteredQueuePool(AsyncAdaptedQueuePool):
+    """
+    Пул соединений, который замеряет время выдачи соединения.
+
+    В замер входит ожидание свободного соединения, когда пул и overflow
+    исчерпаны, и открытие нового соединения.
+    """
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolMetrics()
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            return super().connect()
+        except exc.TimeoutError:
+            self.metrics.timeouts += 1
+            raise
+        finally:
+            self.metrics.observe(time.perf_counter() - started)
+
+
+def pool_stats(engine) -> dict:
+    """Текущее состояние пула движка и метрики ожидания соединения."""
+    pool = engine.pool
+    stats = {
+        "pool_class": type(pool).__name__,
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+        "max_overflow": getattr(pool, "_max_overflow", None),
+        "timeout": pool.timeout(),
+    }
+    metrics = getattr(pool, "metrics", None)
+    if metrics is not None:
+        stats["wait"] = metrics.stats()
+    return stats
+
+
+def create_engine_from_settings(url: str):
+    """Движок с настройками пула, кэшей и журнала SQL из Settings."""
+    echo, echo_pool = ECHO_MODES[settings.DB_ECHO]
+    return create_async_engine(
+        url=url,
+        echo=echo,
+        echo_pool=echo_pool,
+        poolclass=MeteredQueuePool,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT_SECONDS,
+        pool_recycle=settings.DB_POOL_RECYCLE_SECONDS,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+        # кэш скомпилированных SQLAlchemy запросов
+        query_cache_size=settings.DB_QUERY_CACHE_SIZE,
+        # кэш подготовленных выражений asyncpg на соединение; 0 - для pgbouncer в режиме transaction
+        connect_args={"prepared_statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE},
+    )
+
+
+async_engine = create_engine_from_settings(settings.DATABASE_URL_asyncpg)
+
+# реплика только для чтения (src.replica); None - реплика не настроена
+replica_engine = None
+replica_session_factory = None
+if settings.DATABASE_URL_replica_asyncpg:
+    replica_engine = create_engine_from_settings(settings.DATABASE_URL_replica_asyncpg)
+    replica_session_factory = async_sessionmaker(replica_engine)
 
 
 async_session_factory = async_sessionmaker(async_engine)
 
-async def get_session():
+def is_postgres(session: AsyncSession) -> bool:
+    """Проверить, что сессия работает с PostgreSQL."""
+    return session.get_bind().dialect.name == "postgresql"
+
+
+def dialect_insert(session: AsyncSession):
+    """insert() диалекта сессии - с поддержкой ON CONFLICT (PostgreSQL и SQLite в тестах)."""
+    return pg_insert if is_postgres(session) else sqlite_insert
+
+
+# атрибуты request.state с сессиями запроса, которые закрывает SessionReleasingRoute
+REQUEST_SESSION_ATTRS = ("session", "read_session")
+
+
+async def get_session(request: Request):
+    """
+    Сессия основной БД на запрос.
+
+    FastAPI кэширует зависимость в рамках запроса, поэтому одну сессию делят
+    эндпоинт и зависимости авторизации и профиля (get_user_db, get_current_guide).
+    Соединение из пула берется при первом запросе к БД, а возвращается
+    сразу после обработчика (SessionReleasingRoute).
+    """
     async with async_session_factory() as session:
+        request.state.session = session
         yield session
 
+
+async def close_request_sessions(request: Request) -> None:
+    """Закрыть сессии запроса и вернуть их соединения в пул."""
+    for attr in REQUEST_SESSION_ATTRS:
+        session = getattr(request.state, attr, None)
+        if session is not None:
+            await session.close()
+
+
+class SessionReleasingRoute(APIRoute):
+    """
+    Маршрут, который закрывает сессии запроса, как только ответ сформирован.
+
+    Зависимости с yield закрываются только после отправки ответа, и без этого
+    соединение оставалось бы занятым, пока ответ передается медленному клиенту
+    или пока идет поток SSE. Закрытие после сериализации безопасно для
+    ORM-объектов в ответе; если обработчик не обращался к БД, оно ничего не стоит.
+    """
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def release_after_handler(request: Request):
+            try:
+                return await handler(request)
+            finally:
+                await close_request_sessions(request)
+
+        return release_after_handler
+
+
 async def get_user_db(session: AsyncSession = Depends(get_session)):
-    yield SQLAlchemyUserDatabase(session, User)
\ No newline at end of file
+    yield SQLAlchemyUserDatabase(session, User)
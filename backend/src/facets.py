@@ -0,0 +1,202 @@
+"""
+Счетчики фасетов каталога: сколько одобренных экскурсий в каждой стране, городе,
+по уровню сложности и ценовому диапазону.
+
+Счетчики строятся одним GROUP BY-запросом и дальше обновляются инкрементально:
+при изменении экскурсии эндпоинт передает разницу (delta) в `invalidate_catalog`,
+и каждый воркер применяет ее к своей копии. Для защиты от расхождений
+счетчики периодически пересчитываются полностью.
+
+Дельта, пришедшая во время пересчета, может не попасть в результат запроса,
+а к старым счетчикам ее применять бесполезно: их заменит пересчет. Поэтому
+каждое изменение увеличивает поколение счетчиков, и если оно сменилось, пока
+шел запрос, пересчет повторяется.
+"""
+import json
+import time
+from collections import Counter
+from typing import Optional
+
+from sqlalchemy import String, case, cast, func, literal, select, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.cache import CATALOG_CHANNEL
+from src.config import settings
+from src.models import Excursion
+from src.pubsub import pg_listener
+
+FACET_NAMES = ("country", "city", "difficulty", "price")
+
+# Нижние границы ценовых диапазонов (последний диапазон не ограничен сверху)
+PRICE_BUCKETS = [0, 1000, 2000, 5000, 10000]
+
+# Сколько раз повторять пересчет, если во время запроса приходят изменения
+REBUILD_ATTEMPTS = 3
+
+
+def price_bucket(price: float) -> int:
+    """Номер ценового диапазона для цены."""
+    bucket = 0
+    for index, lower in enumerate(PRICE_BUCKETS):
+        if price >= lower:
+            bucket = index
+    return bucket
+
+
+def facet_values(excursion: Excursion) -> Optional[dict]:
+    """
+    Значения фасетов экскурсии или None, если она не участвует в каталоге.
+
+    Args:
+        excursion: Объект модели Excursion
+
+    Returns:
+        Словарь {фасет: значение} для одобренной экскурсии, иначе None
+    """
+    if excursion.status != "approved":
+        return None
+    return {
+        "country": excursion.country,
+        "city": excursion.city,
+        "difficulty": excursion.difficulty,
+        "price": str(price_bucket(float(excursion.price_per_person))),
+    }
+
+
+def facet_delta(before: Optional[dict], after: Optional[dict]) -> Optional[dict]:
+    """
+    Разница счетчиков между состоянием экскурсии до и после изменения.
+
+    Returns:
+        {фасет: {значение: +1/-1}} или None, если счетчики не меняются
+    """
+    if before == after:
+        return None
+
+    delta: dict[str, dict[str, int]] = {}
+    for values, sign in ((before, -1), (after, 1)):
+        if values is None:
+            continue
+        for name, value in values.items():
+            bucket = delta.setdefault(name, {})
+            bucket[value] = bucket.get(value, 0) + sign
+    return delta
+
+
+def _price_bucket_column():
+    """SQL-выражение номера ценового диапазона (как в price_bucket)."""
+    whens = [
+        (Excursion.price_per_person >= lower, index)
+        for index, lower in enumerate(PRICE_BUCKETS)
+    ]
+    return cast(case(*reversed(whens), else_=0), String)
+
+
+class FacetIndex:
+    """Счетчики фасетов в памяти процесса."""
+
+    def __init__(self, max_age: float) -> None:
+        self.max_age = max_age
+        self._counts: dict[str, Counter] | None = None
+        self._built_at = 0.0
+        # растет с каждой дельтой и сбросом: пересчет, за время которого оно сменилось, устарел
+        self._generation = 0
+
+    @property
+    def stale(self) -> bool:
+        return self._counts is None or time.monotonic() - self._built_at > self.max_age
+
+    async def rebuild(self, session: AsyncSession) -> None:
+        """
+        Полный пересчет одним запросом (UNION ALL нескольких GROUP BY).
+
+        Если во время запроса пришли изменения, запрос повторяется до REBUILD_ATTEMPTS раз;
+        если изменения идут и дальше, последний результат используется до следующего запроса.
+        """
+        approved = Excursion.status == "approved"
+        price = _price_bucket_column()
+        query = union_all(
+            select(literal("country"), Excursion.country, func.count())
+            .where(approved).group_by(Excursion.country),
+            select(literal("city"), Excursion.city, func.count())
+            .where(approved).group_by(Excursion.city),
+            select(literal("difficulty"), Excursion.difficulty, func.count())
+            .where(approved).group_by(Excursion.difficulty),
+            select(literal("price"), price, func.count())
+            .where(approved).group_by(price),
+        )
+        for _ in range(REBUILD_ATTEMPTS):
+            generation = self._generation
+            result = await session.execute(query)
+
+            counts = {name: Counter() for name in FACET_NAMES}
+            for name, value, count in result.all():
+                counts[name][str(value)] = count
+            self._counts = counts
+            if self._generation == generation:
+                self._built_at = time.monotonic()
+                return
+        # счетчики считаются устаревшими и пересчитываются при следующем запросе
+        self._built_at = float("-inf")
+
+    def apply(self, delta: dict) -> None:
+        """Применить инкрементальное изменение счетчиков."""
+        self._generation += 1
+        if self._counts is None:
+            return
+        for name, changes in delta.items():
+            counter = self._counts.setdefault(name, Counter())
+            for value, change in changes.items():
+                counter[value] += change
+                if counter[value] <= 0:
+                    del counter[value]
+
+    def reset(self) -> None:
+        self._generation += 1
+        self._counts = None
+
+    async def get(self, session: AsyncSession) -> dict[str, Counter]:
+        if self.stale:
+            await self.rebuild(session)
+        return self._counts
+
+
+facet_index = FacetIndex(max_age=settings.FACETS_REBUILD_SECONDS)
+
+
+def _on_catalog_changed(payload: str) -> None:
+    if not payload:
+        return
+    delta = json.loads(payload).get("facets")
+    if delta:
+        facet_index.apply(delta)
+
+
+pg_listener.subscribe(CATALOG_CHANNEL, _on_catalog_changed)
+# пропущенные изменения не восстановить, счетчики пересчитываются при следующем запросе
+pg_listener.on_resync(facet_index.reset)
+
+
+def facets_response(counts: dict[str, Counter]) -> dict:
+    """Преобразовать счетчики в ответ эндпоинта фасетов (по убыванию количества)."""
+    def ranked(name: str) -> list[dict]:
+        return [
+            {"value": value, "count": count}
+            for value, count in sorted(counts[name].items(), key=lambda item: (-item[1], item[0]))
+        ]
+
+    price_buckets = []
+    for index, lower in enumerate(PRICE_BUCKETS):
+        upper = PRICE_BUCKETS[index + 1] if index + 1 < len(PRICE_BUCKETS) else None
+        price_buckets.append({
+            "min_price": lower,
+            "max_price": upper,
+            "count": counts["price"].get(str(index), 0),
+        })
+
+    return {
+        "countries": ranked("country"),
+        "cities": ranked("city"),
+        "difficulties": ranked("difficulty"),
+        "price_buckets": price_buckets,
+    }
@@ -0,0 +1,99 @@
+"""
+Временные брони мест (hold) и фоновое снятие просроченных.
+
+Бронирование с `hold=true` создается в статусе pending со сроком `hold_expires_at`
+и занимает места в слоте так же, как обычное, поэтому доступность учитывает
+действующие холды без дополнительных запросов. Если бронь не подтверждена
+до истечения срока, фоновая задача переводит ее в expired и возвращает места,
+которые сразу получает лист ожидания слота (src.waitlist).
+"""
+import asyncio
+import logging
+from collections import defaultdict
+from datetime import timedelta
+
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from src.config import settings
+from src.inventory import release_seats, slot_start
+from src.models import Booking, utcnow
+from src.waitlist import promote_waitlist
+
+log = logging.getLogger(__name__)
+
+HOLD_STATUS = "pending"
+EXPIRED_STATUS = "expired"
+
+
+def hold_deadline():
+    """Срок действия новой временной брони."""
+    return utcnow() + timedelta(seconds=settings.BOOKING_HOLD_TTL_SECONDS)
+
+
+async def expire_holds(session: AsyncSession, batch_size: int) -> int:
+    """
+    Снять одну пачку просроченных временных броней и зафиксировать транзакцию.
+
+    Строки выбираются с FOR UPDATE SKIP LOCKED: несколько воркеров делят
+    просроченные брони между собой, а бронь, которую в этот момент подтверждают,
+    пропускается. Пачка переводится в expired одним UPDATE, места возвращаются
+    одним UPDATE на слот.
+
+    Returns:
+        Количество снятых броней
+    """
+    result = await session.execute(
+        select(Booking.booking_id, Booking.excursion_id, Booking.date, Booking.number_of_people)
+        .where(
+            Booking.status == HOLD_STATUS,
+            Booking.hold_expires_at < utcnow(),
+        )
+        .order_by(Booking.hold_expires_at)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )
+    expired = result.all()
+    if not expired:
+        return 0
+
+    # места возвращаются одним UPDATE на слот, а не на каждую бронь
+    released = defaultdict(int)
+    for booking in expired:
+        released[(booking.excursion_id, slot_start(booking.date))] += booking.number_of_people
+    await session.execute(
+        update(Booking)
+        .where(Booking.booking_id.in_([booking.booking_id for booking in expired]))
+        .values(status=EXPIRED_STATUS, hold_expires_at=None)
+    )
+    # слоты блокируются в одном порядке, чтобы параллельные воркеры не ждали друг друга по кругу
+    slots = sorted(released)
+    for excursion_id, starts_at in slots:
+        await release_seats(session, excursion_id, starts_at, released[(excursion_id, starts_at)])
+    for excursion_id, starts_at in slots:
+        await promote_waitlist(session, excursion_id, starts_at)
+    await session.commit()
+    return len(expired)
+
+
+async def sweep_expired_holds(session_factory: async_sessionmaker) -> int:
+    """Снять все просроченные брони пачками по HOLD_SWEEP_BATCH_SIZE."""
+    total = 0
+    while True:
+        async with session_factory() as session:
+            expired = await expire_holds(session, settings.HOLD_SWEEP_BATCH_SIZE)
+        total += expired
+        if expired < settings.HOLD_SWEEP_BATCH_SIZE:
+            return total
+
+
+async def run_hold_sweeper(session_factory: async_sessionmaker) -> None:
+    """Фоновая задача: раз в HOLD_SWEEP_INTERVAL_SECONDS снимать просроченные брони."""
+    while True:
+        try:
+            expired = await sweep_expired_holds(session_factory)
+            if expired:
+                log.info("Снято просроченных временных броней: %d", expired)
+        except Exception:
+            log.exception("Ошибка при снятии просроченных временных броней")
+        await asyncio.sleep(settings.HOLD_SWEEP_INTERVAL_SECONDS)
@@ -0,0 +1,143 @@
+"""
+Ключи идемпотентности (заголовок Idempotency-Key) для создания бронирований.
+
+Ответ на запрос с ключом сохраняется в таблице idempotency_keys в той же
+транзакции, что и само бронирование, и повтор получает сохраненный ответ.
+Одновременные дубли упорядочивает уникальный ключ таблицы: INSERT второго
+запроса ждет завершения транзакции первого. Готовые ответы дополнительно
+держатся в памяти процесса, а запросы без ключа не делают лишних обращений к БД.
+"""
+import asyncio
+import hashlib
+import logging
+from datetime import datetime, timedelta
+from typing import Optional
+
+from fastapi import HTTPException, Response
+from pydantic import BaseModel
+from sqlalchemy import delete
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from src.cache import TTLCache
+from src.config import settings
+from src.database import dialect_insert
+from src.models import IdempotencyKey, utcnow
+
+log = logging.getLogger(__name__)
+
+# Заголовок ответа, отданного из сохраненного
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+# (user_id, ключ) -> (хэш запроса, код ответа, тело ответа, срок действия ключа)
+idempotency_cache = TTLCache(
+    maxsize=settings.IDEMPOTENCY_CACHE_MAX_ENTRIES,
+    ttl=settings.IDEMPOTENCY_KEY_TTL_SECONDS,
+)
+
+
+def request_fingerprint(data: BaseModel) -> str:
+    """Хэш тела запроса."""
+    return hashlib.sha256(data.model_dump_json().encode()).hexdigest()
+
+
+def _replay(stored: tuple[str, int, str, datetime], request_hash: str) -> Response:
+    stored_hash, status_code, body, _ = stored
+    if stored_hash != request_hash:
+        raise HTTPException(
+            status_code=422,
+            detail="Idempotency-Key уже использован с другими параметрами запроса",
+        )
+    return Response(
+        content=body,
+        status_code=status_code,
+        media_type="application/json",
+        headers={REPLAYED_HEADER: "true"},
+    )
+
+
+async def claim_key(session: AsyncSession, user_id: int, key: str, request_hash: str) -> Optional[Response]:
+    """
+    Закрепить ключ за текущим запросом или вернуть сохраненный ответ.
+
+    Вызывается в начале транзакции эндпоинта. Если такой же запрос выполняется
+    параллельно, INSERT ждет его commit или rollback. Просроченный ключ,
+    который еще не удалил purge_expired_keys, не повторяется: строка
+    перезаписывается, и запрос выполняется заново.
+
+    Returns:
+        None, если запрос надо выполнить, иначе ответ для повтора
+    """
+    now = utcnow()
+    cached = idempotency_cache.get((user_id, key))
+    if cached is not None and cached[3] >= now:
+        return _replay(cached, request_hash)
+
+    expires_at = now + timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL_SECONDS)
+    claimed = await session.scalar(
+        dialect_insert(session)(IdempotencyKey)
+        .values(user_id=user_id, key=key, request_hash=request_hash, expires_at=expires_at)
+        .on_conflict_do_update(
+            index_elements=["user_id", "key"],
+            set_={"request_hash": request_hash, "expires_at": expires_at, "status_code": None, "response_body": None},
+            where=IdempotencyKey.expires_at < now,
+        )
+        .returning(IdempotencyKey.key)
+    )
+    if claimed is not None:
+        return None
+
+    stored = await session.get(IdempotencyKey, (user_id, key), populate_existing=True)
+    value = (stored.request_hash, stored.status_code, stored.response_body, stored.expires_at)
+    idempotency_cache.set((user_id, key), value)
+    return _replay(value, request_hash)
+
+
+async def save_response(
+    session: AsyncSession,
+    user_id: int,
+    key: str,
+    status_code: int,
+    body: str,
+) -> datetime:
+    """
+    Сохранить ответ в строку ключа (до commit транзакции эндпоинта).
+
+    Returns:
+        Срок действия ключа
+    """
+    stored = await session.get(IdempotencyKey, (user_id, key), populate_existing=True)
+    stored.status_code = status_code
+    stored.response_body = body
+    return stored.expires_at
+
+
+def remember_response(
+    user_id: int,
+    key: str,
+    request_hash: str,
+    status_code: int,
+    body: str,
+    expires_at: datetime,
+) -> None:
+    """Положить зафиксированный ответ в кэш процесса (после commit)."""
+    idempotency_cache.set((user_id, key), (request_hash, status_code, body, expires_at))
+
+
+async def purge_expired_keys(session_factory: async_sessionmaker) -> int:
+    """Удалить просроченные ключи."""
+    async with session_factory() as session:
+        result = await session.execute(delete(IdempotencyKey).where(IdempotencyKey.expires_at < utcnow()))
+        await session.commit()
+    return result.rowcount
+
+
+async def run_idempotency_sweeper(session_factory: async_sessionmaker) -> None:
+    """Фоновая задача: раз в IDEMPOTENCY_SWEEP_INTERVAL_SECONDS удалять просроченные ключи."""
+    while True:
+        try:
+            purged = await purge_expired_keys(session_factory)
+            if purged:
+                log.info("Удалено просроченных ключей идемпотентности: %d", purged)
+        except Exception:
+            log.exception("Ошибка при удалении просроченных ключей идемпотентности")
+        await asyncio.sleep(settings.IDEMPOTENCY_SWEEP_INTERVAL_SECONDS)
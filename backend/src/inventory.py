@@ -0,0 +1,180 @@
+"""
+Учет свободных мест по слотам экскурсий (таблица excursion_slots).
+
+Вместо пересчета бронирований на каждый запрос счетчик `booked` слота
+меняется одним условным UPDATE:
+
+    UPDATE excursion_slots SET booked = booked + n
+    WHERE ... AND (capacity IS NULL OR booked + n <= capacity)
+    RETURNING booked
+
+Проверка и изменение выполняются одной командой, поэтому два одновременных
+бронирования последних мест не могут оба пройти. Каждое изменение счетчика
+публикуется в поток свободных мест (src.availability_stream).
+"""
+from datetime import date, datetime, time, timedelta
+from typing import Optional
+
+from sqlalchemy import bindparam, case, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.availability_stream import publish_resync, publish_seats
+from src.database import dialect_insert
+from src.models import ACTIVE_BOOKING_STATUSES, Booking, Excursion, ExcursionSlot, utcnow
+
+
+def booking_date_range(date_from: Optional[date], date_to: Optional[date]) -> list:
+    """
+    Условия «дата бронирования в [date_from, date_to]» (границы включительно, None - без границы).
+
+    Сравнение с границами дня, а не func.date(...), чтобы PostgreSQL отбрасывал
+    лишние секции bookings и мог использовать индексы по date.
+    """
+    conditions = []
+    if date_from is not None:
+        conditions.append(Booking.date >= datetime.combine(date_from, time.min))
+    if date_to is not None:
+        conditions.append(Booking.date < datetime.combine(date_to + timedelta(days=1), time.min))
+    return conditions
+
+
+def booking_is_active():
+    """
+    Условие «бронирование занимает места».
+
+    Статусы подставляются в SQL литералами: с параметрами планировщик
+    не может доказать условие частичного индекса ix_bookings_active_excursion_date.
+    """
+    return Booking.status.in_(
+        bindparam("active_statuses", list(ACTIVE_BOOKING_STATUSES), expanding=True, literal_execute=True)
+    )
+
+
+def slot_start(moment: datetime) -> datetime:
+    """
+    Ключ слота для времени начала: время с точностью до минуты.
+
+    Та же нормализация, что в Schedule.allows, поэтому бронирование на время
+    из расписания (в том числе не ровный час, например 09:30) и календарь
+    доступности читают и пишут одну и ту же строку excursion_slots.
+    """
+    return moment.replace(second=0, microsecond=0)
+
+
+async def ensure_slot(session: AsyncSession, excursion: Excursion, starts_at: datetime) -> None:
+    """Создать строку слота, если ее еще нет (INSERT ... ON CONFLICT DO NOTHING)."""
+    await session.execute(
+        dialect_insert(session)(ExcursionSlot)
+        .values(
+            excursion_id=excursion.excursion_id,
+            starts_at=starts_at,
+            capacity=excursion.available_slots,
+            booked=0,
+        )
+        .on_conflict_do_nothing(index_elements=["excursion_id", "starts_at"])
+    )
+
+
+async def reserve_seats(
+    session: AsyncSession,
+    excursion: Excursion,
+    starts_at: datetime,
+    people: int,
+) -> Optional[int]:
+    """
+    Занять места в слоте.
+
+    Args:
+        session: Сессия текущей транзакции
+        excursion: Экскурсия
+        starts_at: Время начала слота (см. slot_start)
+        people: Количество мест
+
+    Returns:
+        Новое значение booked или None, если мест не хватает
+    """
+    await ensure_slot(session, excursion, starts_at)
+    result = await session.execute(
+        update(ExcursionSlot)
+        .where(
+            ExcursionSlot.excursion_id == excursion.excursion_id,
+            ExcursionSlot.starts_at == starts_at,
+            or_(
+                ExcursionSlot.capacity.is_(None),
+                ExcursionSlot.booked + people <= ExcursionSlot.capacity,
+            ),
+        )
+        .values(booked=ExcursionSlot.booked + people)
+        .returning(ExcursionSlot.booked, ExcursionSlot.capacity)
+    )
+    row = result.one_or_none()
+    if row is None:
+        return None
+    await publish_seats(session, excursion.excursion_id, starts_at, people, row.booked, row.capacity)
+    return row.booked
+
+
+async def release_seats(session: AsyncSession, excursion_id: int, starts_at: datetime, people: int) -> None:
+    """Вернуть места в слот (отмена бронирования)."""
+    result = await session.execute(
+        update(ExcursionSlot)
+        .where(
+            ExcursionSlot.excursion_id == excursion_id,
+            ExcursionSlot.starts_at == starts_at,
+        )
+        .values(booked=case((ExcursionSlot.booked > people, ExcursionSlot.booked - people), else_=0))
+        .returning(ExcursionSlot.booked, ExcursionSlot.capacity)
+    )
+    row = result.one_or_none()
+    if row is not None:
+        await publish_seats(session, excursion_id, starts_at, -people, row.booked, row.capacity)
+
+
+async def sync_slot_capacity(session: AsyncSession, excursion: Excursion) -> None:
+    """Перенести новое количество мест экскурсии в ее будущие слоты."""
+    await session.execute(
+        update(ExcursionSlot)
+        .where(
+            ExcursionSlot.excursion_id == excursion.excursion_id,
+            ExcursionSlot.starts_at >= slot_start(utcnow()),
+        )
+        .values(capacity=excursion.available_slots)
+    )
+    await publish_resync(session, excursion.excursion_id)
+
+
+async def load_slots(
+    session: AsyncSession,
+    excursion_id: int,
+    start: datetime,
+    end: datetime,
+) -> dict[datetime, tuple[Optional[int], int]]:
+    """
+    Слоты экскурсии в полуинтервале [start, end) одним чтением по индексу.
+
+    Returns:
+        {начало слота (slot_start): (capacity, booked)}
+    """
+    result = await session.execute(
+        select(ExcursionSlot.starts_at, ExcursionSlot.capacity, ExcursionSlot.booked)
+        .where(
+            ExcursionSlot.excursion_id == excursion_id,
+            ExcursionSlot.starts_at >= start,
+            ExcursionSlot.starts_at < end,
+        )
+    )
+    return {starts_at: (capacity, booked) for starts_at, capacity, booked in result.all()}
+
+
+def slot_seats(
+    slots: dict[datetime, tuple[Optional[int], int]],
+    excursion: Excursion,
+    starts_at: datetime,
+) -> tuple[Optional[int], int]:
+    """
+    Вместимость и занятые места слота из результата load_slots.
+
+    Строка слота создается при первом бронировании, поэтому ее отсутствие
+    означает «мест еще не занимали» - вместимость берется из экскурсии.
+    """
+    return slots.get(slot_start(starts_at), (excursion.available_slots, 0))
@@ -1,16 +1,84 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+
 import uvicorn
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.staticfiles import StaticFiles
 from pathlib import Path
 
+from src.cache import invalidate_catalog
+from src.config import settings
+from src.database import async_engine, async_session_factory, replica_engine
+from src.holds import run_hold_sweeper
+from src.idempotency import REPLAYED_HEADER, run_idempotency_sweeper
+from src.pagination import NEXT_CURSOR_HEADER
+from src.partitions import run_partition_maintenance
+from src.pubsub import pg_listener
+from src.replica import run_replica_monitor
 from src.routers.auth_router import router as auth_router
 from src.routers.excursions_router import router as excursions_router
 from src.routers.guides_router import router as guides_router
 from src.routers.admin_router import router as admin_router
 from src.routers.uploads_router import router as uploads_router
+from src.utils import asset_manifest, refresh_resolved_photos, watch_assets
+
+log = logging.getLogger(__name__)
+
+
+async def on_assets_changed(filenames: set[str]) -> None:
+    """Пересчитать фотки экскурсий, чьи автоматические фотографии изменились."""
+    titles = {Path(name).stem for name in filenames if name.endswith(".jpg")}
+    async with async_session_factory() as session:
+        if await refresh_resolved_photos(session, titles):
+            await invalidate_catalog(session)
+            await session.commit()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Строим индекс фотографий заранее, чтобы первый запрос не читал папку
+    asset_manifest.refresh()
+    watcher = None
+    if settings.ASSETS_WATCH_ENABLED:
+        watcher = asyncio.create_task(watch_assets(on_change=on_assets_changed))
 
-app = FastAPI()
+    # Слушаем NOTIFY других воркеров (сброс кэша каталога и т.п.)
+    if async_engine.dialect.name == "postgresql":
+        await pg_listener.start(settings.DATABASE_DSN)
+
+    # Снимаем просроченные временные брони
+    sweeper = None
+    if settings.HOLD_SWEEPER_ENABLED:
+        sweeper = asyncio.create_task(run_hold_sweeper(async_session_factory))
+    # Удаляем просроченные ключи идемпотентности
+    idempotency_sweeper = asyncio.create_task(run_idempotency_sweeper(async_session_factory))
+
+    # Создаем секции bookings заранее и архивируем прошедшие месяцы
+    partition_maintenance = None
+    if async_engine.dialect.name == "postgresql":
+        partition_maintenance = asyncio.create_task(run_partition_maintenance(async_session_factory))
+
+    # Следим за отставанием реплики для чтения каталога
+    replica_monitor = None
+    if replica_engine is not None:
+        replica_monitor = asyncio.create_task(run_replica_monitor())
+    yield
+    await pg_listener.stop()
+    if watcher is not None:
+        watcher.cancel()
+    if sweeper is not None:
+        sweeper.cancel()
+    idempotency_sweeper.cancel()
+    if partition_maintenance is not None:
+        partition_maintenance.cancel()
+    if replica_monitor is not None:
+        replica_monitor.cancel()
+
+
+app = FastAPI(lifespan=lifespan)
 
 # CORS для взаимодействия с фронтендом
 # Разрешаем запросы с любого origin, так как авторизация идет через Bearer-токен
@@ -20,8 +88,17 @@ app.add_middleware(
     allow_credentials=False,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, "ETag", "Last-Modified", REPLAYED_HEADER],
 )
 
+# Сжатие больших ответов (списки каталога и бронирований)
+if settings.GZIP_MINIMUM_SIZE > 0:
+    app.add_middleware(
+        GZipMiddleware,
+        minimum_size=settings.GZIP_MINIMUM_SIZE,
+        compresslevel=settings.GZIP_COMPRESS_LEVEL,
+    )
+
 # Настройка статических файлов для фотографий экскурсий
 assets_dir = Path(__file__).parent.parent / "assets" / "excursions"
 assets_dir.mkdir(parents=True, exist_ok=True)
@@ -1,12 +1,35 @@
-from datetime import datetime, timezone
+from datetime import date, datetime, time, timezone
 
 from fastapi_users_db_sqlalchemy import SQLAlchemyBaseUserTable
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
-from sqlalchemy import DateTime, ForeignKey, Integer, Numeric, String, Text, Boolean
+from sqlalchemy import Date, DateTime, FetchedValue, ForeignKey, Index, Integer, Numeric, String, Text, Time, Boolean, UniqueConstraint, text
+from sqlalchemy.dialects.postgresql import TSVECTOR
 
 class Base(DeclarativeBase):
     pass
 
+
+# Статусы бронирований, которые занимают места
+ACTIVE_BOOKING_STATUSES = ("confirmed", "pending")
+
+# Условие частичных индексов по действующим бронированиям
+ACTIVE_BOOKING_PREDICATE = text("status IN ('confirmed', 'pending')")
+
+# Условие частичного индекса по временным броням
+HOLD_PREDICATE = text("status = 'pending' AND hold_expires_at IS NOT NULL")
+
+# Условие частичного индекса очереди ожидания
+WAITING_PREDICATE = text("status = 'waiting'")
+
+# Условие частичных индексов по опубликованным экскурсиям (каталог и фасеты)
+APPROVED_EXCURSION_PREDICATE = text("status = 'approved'")
+
+
+def utcnow() -> datetime:
+    """Текущее время UTC без tzinfo (колонки DateTime хранятся без часового пояса)."""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
 class Excursion(Base):
     __tablename__ = "excursions"
     
@@ -17,10 +40,26 @@ class Excursion(Base):
     difficulty: Mapped[str] = mapped_column(String(20),nullable=False)
     description: Mapped[str | None] = mapped_column(Text, nullable=True)
     photos: Mapped[str | None] = mapped_column(Text, nullable=True)
+    # photos с подставленными фотками из assets, вычисляется при записи (src.utils.resolve_excursion_photos)
+    resolved_photos: Mapped[str | None] = mapped_column(Text, nullable=True)
     price_per_person: Mapped[float] = mapped_column(Numeric(10, 2), nullable=False)
     accepted_payment_methods: Mapped[str] = mapped_column(String(50), default="online,cash")
     status: Mapped[str] = mapped_column(String(20), default="draft",nullable=False)
     available_slots: Mapped[int | None] = mapped_column(Integer, nullable=True, default=None)
+    # tsvector по названию, городу и описанию; в PostgreSQL - вычисляемая колонка (см. миграцию 202602170000)
+    search_vector: Mapped[str | None] = mapped_column(
+        Text().with_variant(TSVECTOR(), "postgresql"),
+        nullable=True,
+        server_default=FetchedValue(),
+        server_onupdate=FetchedValue(),
+        deferred=True,
+    )
+    # средняя оценка по отзывам, хранится в строке для сортировки по индексу
+    rating: Mapped[float] = mapped_column(Numeric(3, 2), nullable=False, default=0, server_default="0")
+    # время последнего изменения строки, по нему строятся ETag/Last-Modified каталога (src.conditional)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=utcnow, onupdate=utcnow)
+    # на сколько дней вперед открыта запись; None - без ограничения
+    schedule_horizon_days: Mapped[int | None] = mapped_column(Integer, nullable=True)
     
     
       
@@ -30,8 +69,48 @@ class Excursion(Base):
     moderator_id: Mapped[int | None] = mapped_column(ForeignKey("moderators.moderator_id"),nullable=True)
     moderator: Mapped["Moderator"] = relationship(back_populates="moderated_excursions")
     reviews: Mapped[list["Review"]] = relationship(back_populates="excursion")
+    schedule_rules: Mapped[list["ScheduleRule"]] = relationship(cascade="all, delete-orphan")
+    schedule_exceptions: Mapped[list["ScheduleException"]] = relationship(cascade="all, delete-orphan")
+
+    __table_args__ = (
+        # trgm-индексы для поиска по подстроке и нечеткого поиска (только PostgreSQL)
+        Index("ix_excursions_title_trgm", "title", postgresql_using="gin", postgresql_ops={"title": "gin_trgm_ops"}),
+        Index("ix_excursions_city_trgm", "city", postgresql_using="gin", postgresql_ops={"city": "gin_trgm_ops"}),
+        Index("ix_excursions_country_trgm", "country", postgresql_using="gin", postgresql_ops={"country": "gin_trgm_ops"}),
+        Index("ix_excursions_search_vector", "search_vector", postgresql_using="gin"),
+        # индексы для keyset-пагинации каталога по каждому варианту сортировки
+        Index("ix_excursions_status_id", "status", "excursion_id"),
+        Index("ix_excursions_status_price", "status", "price_per_person", "excursion_id"),
+        Index("ix_excursions_status_rating", "status", "rating", "excursion_id"),
+        # max(updated_at) для валидатора списка каталога
+        Index("ix_excursions_updated_at", "updated_at"),
+        # экскурсии гида (кабинет и календарь бронирований)
+        Index("ix_excursions_guide_id", "guide_id"),
+        Index("ix_excursions_moderator_id", "moderator_id"),
+        # опубликованные экскурсии по городу и стране (фасеты и точный фильтр)
+        Index(
+            "ix_excursions_approved_city", "city",
+            postgresql_where=APPROVED_EXCURSION_PREDICATE,
+            sqlite_where=APPROVED_EXCURSION_PREDICATE,
+        ),
+        Index(
+            "ix_excursions_approved_country", "country",
+            postgresql_where=APPROVED_EXCURSION_PREDICATE,
+            sqlite_where=APPROVED_EXCURSION_PREDICATE,
+        ),
+    )
     
 class Booking(Base):
+    """
+    Бронирование экскурсии.
+
+    В PostgreSQL таблица секционирована по месяцам `date` (src.partitions),
+    первичный ключ там - (booking_id, date). Ограничения уникальности на один
+    booking_id нет: значения выдает общая последовательность, и в ORM ключом
+    остается booking_id. notifications.booking_id и waitlist_entries.booking_id
+    ссылаются на бронирование без ограничения FOREIGN KEY, ссылки на удаленные
+    бронирования обнуляет обслуживание секций (clear_orphan_booking_references).
+    """
     __tablename__ = "bookings"
     
     booking_id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
@@ -42,14 +121,141 @@ class Booking(Base):
     excursion_id: Mapped[int] = mapped_column(Integer, ForeignKey("excursions.excursion_id"), nullable=False)
     client_id: Mapped[int] = mapped_column(Integer, ForeignKey("clients.client_id"), nullable=False)
     payment_id: Mapped[int] = mapped_column(ForeignKey("payments.id"), nullable=False)
+    # срок временной брони (hold); после него бронь снимается фоновой задачей (src.holds)
+    hold_expires_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
     
    
     excursion: Mapped["Excursion"] = relationship(back_populates="bookings")
     client: Mapped["Client"] = relationship(back_populates="bookings") 
-    notifications: Mapped[list["Notification"]] = relationship(back_populates="booking")
+    notifications: Mapped[list["Notification"]] = relationship(
+        back_populates="booking",
+        primaryjoin="Booking.booking_id == foreign(Notification.booking_id)",
+    )
     payment: Mapped["Payment"] = relationship(back_populates="booking")
-    
-    
+
+    __table_args__ = (
+        # календарь гида: действующие бронирования экскурсий по времени
+        Index(
+            "ix_bookings_active_excursion_date", "excursion_id", "date",
+            postgresql_where=ACTIVE_BOOKING_PREDICATE,
+            sqlite_where=ACTIVE_BOOKING_PREDICATE,
+        ),
+        # все бронирования экскурсии, в том числе отмененные: проверка FK при удалении экскурсии
+        Index("ix_bookings_excursion_id", "excursion_id"),
+        # «мои бронирования» клиента по времени
+        Index("ix_bookings_client_date", "client_id", "date"),
+        Index("ix_bookings_payment_id", "payment_id"),
+        # поиск просроченных временных броней
+        Index(
+            "ix_bookings_hold_expires_at", "hold_expires_at",
+            postgresql_where=HOLD_PREDICATE,
+            sqlite_where=HOLD_PREDICATE,
+        ),
+    )
+    
+    
+class ExcursionSlot(Base):
+    """
+    Учет мест в слоте экскурсии (экскурсия + час начала).
+
+    `booked` меняется только атомарными UPDATE при бронировании и отмене (src.inventory).
+    """
+    __tablename__ = "excursion_slots"
+
+    slot_id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    excursion_id: Mapped[int] = mapped_column(Integer, ForeignKey("excursions.excursion_id", ondelete="CASCADE"), nullable=False)
+    starts_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    # None - количество мест не ограничено
+    capacity: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    booked: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+
+    __table_args__ = (
+        # слот однозначно определяется экскурсией и временем; индекс обслуживает чтение по диапазону дат
+        UniqueConstraint("excursion_id", "starts_at", name="uq_excursion_slots_excursion_starts_at"),
+        # заполненные слоты всех экскурсий за день (поиск по дате)
+        Index("ix_excursion_slots_starts_at", "starts_at"),
+    )
+
+
+class ScheduleRule(Base):
+    """Еженедельное правило расписания: день недели и время начала (src.schedule)."""
+    __tablename__ = "excursion_schedule_rules"
+
+    rule_id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    excursion_id: Mapped[int] = mapped_column(Integer, ForeignKey("excursions.excursion_id", ondelete="CASCADE"), nullable=False, index=True)
+    # 0 - понедельник, 6 - воскресенье
+    weekday: Mapped[int] = mapped_column(Integer, nullable=False)
+    start_time: Mapped[time] = mapped_column(Time, nullable=False)
+    valid_from: Mapped[date | None] = mapped_column(Date, nullable=True)
+    valid_until: Mapped[date | None] = mapped_column(Date, nullable=True)
+
+
+class ScheduleException(Base):
+    """
+    Исключение из расписания на дату:
+    blackout - день закрыт целиком, cancel - отменено одно время, extra - добавлено время.
+    """
+    __tablename__ = "excursion_schedule_exceptions"
+
+    exception_id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    excursion_id: Mapped[int] = mapped_column(Integer, ForeignKey("excursions.excursion_id", ondelete="CASCADE"), nullable=False)
+    date: Mapped[date] = mapped_column(Date, nullable=False)
+    kind: Mapped[str] = mapped_column(String(20), nullable=False)
+    start_time: Mapped[time | None] = mapped_column(Time, nullable=True)
+
+    __table_args__ = (
+        Index("ix_excursion_schedule_exceptions_excursion_date", "excursion_id", "date"),
+    )
+
+
+class WaitlistEntry(Base):
+    """
+    Заявка в листе ожидания слота экскурсии (src.waitlist).
+
+    Очередь упорядочена по entry_id: освободившиеся места получают
+    заявки с наименьшим entry_id.
+    """
+    __tablename__ = "waitlist_entries"
+
+    entry_id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    excursion_id: Mapped[int] = mapped_column(Integer, ForeignKey("excursions.excursion_id", ondelete="CASCADE"), nullable=False)
+    starts_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    client_id: Mapped[int] = mapped_column(Integer, ForeignKey("clients.client_id"), nullable=False)
+    number_of_people: Mapped[int] = mapped_column(Integer, nullable=False)
+    # waiting - в очереди, promoted - получил бронирование, cancelled - вышел из очереди
+    status: Mapped[str] = mapped_column(String(20), nullable=False, default="waiting")
+    created_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=utcnow)
+    # бронирование, созданное при продвижении (без FOREIGN KEY, см. Booking)
+    booking_id: Mapped[int | None] = mapped_column(Integer, nullable=True)
+
+    __table_args__ = (
+        # голова очереди слота: ждущие заявки по порядку
+        Index(
+            "ix_waitlist_entries_slot_queue", "excursion_id", "starts_at", "entry_id",
+            postgresql_where=WAITING_PREDICATE,
+            sqlite_where=WAITING_PREDICATE,
+        ),
+        # все заявки экскурсии: каскадное удаление вместе с экскурсией
+        Index("ix_waitlist_entries_excursion_id", "excursion_id"),
+        # заявки клиента
+        Index("ix_waitlist_entries_client_id", "client_id"),
+        Index("ix_waitlist_entries_booking_id", "booking_id"),
+    )
+
+
+class IdempotencyKey(Base):
+    """Сохраненный ответ на запрос с заголовком Idempotency-Key (src.idempotency)."""
+    __tablename__ = "idempotency_keys"
+
+    user_id: Mapped[int] = mapped_column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    key: Mapped[str] = mapped_column(String(100), primary_key=True)
+    # хэш тела запроса: повтор с тем же ключом, но другими параметрами отклоняется
+    request_hash: Mapped[str] = mapped_column(String(64), nullable=False)
+    status_code: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    response_body: Mapped[str | None] = mapped_column(Text, nullable=True)
+    expires_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, index=True)
+
+
 class Moderator(Base):
     
     __tablename__ = "moderators"
@@ -140,15 +346,24 @@ class Notification(Base):
     __tablename__ = "notifications"
     
     notification_id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
-    booking_id: Mapped[int | None] = mapped_column(ForeignKey("bookings.booking_id"), nullable=True)
+    # без FOREIGN KEY, см. Booking
+    booking_id: Mapped[int | None] = mapped_column(Integer, nullable=True)
     receiver: Mapped[str] = mapped_column(String(255), nullable=False)
     message: Mapped[str] = mapped_column(Text, nullable=False)
     date: Mapped[datetime] = mapped_column(DateTime, nullable=False)
     type: Mapped[str] = mapped_column(String(50), nullable=False)
     client_id: Mapped[int | None] = mapped_column(ForeignKey("clients.client_id"), nullable=True)
     
-    booking: Mapped["Booking"] = relationship(back_populates="notifications")
+    booking: Mapped["Booking"] = relationship(
+        back_populates="notifications",
+        primaryjoin="Booking.booking_id == foreign(Notification.booking_id)",
+    )
     client: Mapped["Client"] = relationship(back_populates="notifications")
+
+    __table_args__ = (
+        Index("ix_notifications_booking_id", "booking_id"),
+        Index("ix_notifications_client_id", "client_id"),
+    )
     
     
 class Review(Base):
@@ -164,4 +379,10 @@ class Review(Base):
     
 
     client: Mapped["Client"] = relationship(back_populates="reviews")
-    excursion: Mapped["Excursion"] = relationship(back_populates="reviews")
\ No newline at end of file
+    excursion: Mapped["Excursion"] = relationship(back_populates="reviews")
+
+    __table_args__ = (
+        # отзывы экскурсии (пересчет рейтинга) и отзывы клиента
+        Index("ix_reviews_excursion_id", "excursion_id"),
+        Index("ix_reviews_client_id", "client_id"),
+    )
\ No newline at end of file
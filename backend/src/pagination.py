@@ -0,0 +1,86 @@
+"""
+Keyset-пагинация (постраничная выдача по курсору).
+
+Курсор - непрозрачная для клиента строка (base64 от JSON), в которой хранятся
+вариант сортировки и значения ключа сортировки последней отданной записи.
+Следующая страница выбирается условием `(ключ, id) > (значения из курсора)`,
+которое обслуживается индексом, в отличие от OFFSET.
+"""
+import base64
+import binascii
+import json
+from decimal import Decimal
+
+from fastapi import HTTPException, status
+from sqlalchemy import tuple_
+from sqlalchemy.sql.elements import ColumnElement
+
+# Заголовок ответа с курсором следующей страницы
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(sort: str, values: list) -> str:
+    """
+    Упаковать значения ключа сортировки в курсор.
+
+    Args:
+        sort: Вариант сортировки, для которого выдан курсор
+        values: Значения выражений сортировки у последней записи страницы
+
+    Returns:
+        Строка курсора
+    """
+    payload = json.dumps(
+        {"s": sort, "v": [str(v) if isinstance(v, Decimal) else v for v in values]},
+        separators=(",", ":"),
+        ensure_ascii=False,
+    )
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str, order_by: list[ColumnElement]) -> list:
+    """
+    Распаковать курсор и привести значения к типам выражений сортировки.
+
+    Args:
+        cursor: Строка курсора от клиента
+        sort: Текущий вариант сортировки
+        order_by: Выражения сортировки (определяют количество и типы значений)
+
+    Returns:
+        Значения ключа сортировки
+
+    Raises:
+        HTTPException: 400, если курсор поврежден или выдан для другой сортировки
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if payload["s"] != sort or len(payload["v"]) != len(order_by):
+            raise ValueError("cursor does not match sort")
+        return [
+            expr.type.python_type(value)
+            for expr, value in zip(order_by, payload["v"])
+        ]
+    except (ValueError, TypeError, KeyError, binascii.Error, ArithmeticError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Некорректный курсор пагинации",
+        )
+
+
+def keyset_condition(order_by: list[ColumnElement], values: list, descending: bool) -> ColumnElement[bool]:
+    """
+    Условие «строго после курсора» для набора выражений с одним направлением сортировки.
+
+    Args:
+        order_by: Выражения сортировки (последнее - уникальный id)
+        values: Значения из курсора
+        descending: Сортировка по убыванию
+
+    Returns:
+        SQL-условие для WHERE
+    """
+    left = tuple_(*order_by) if len(order_by) > 1 else order_by[0]
+    right = tuple_(*values) if len(values) > 1 else values[0]
+    return left < right if descending else left > right
@@ -0,0 +1,225 @@
+"""
+Помесячные секции таблицы bookings и архивация прошедших месяцев (только PostgreSQL).
+
+С миграции 202602260000 bookings секционирована по диапазону `date`:
+- bookings_pYYYY_MM - секции по месяцам, в них идут текущие бронирования;
+- bookings_aYYYY_MM - архивная секция месяца: та же секция, переписанная плотно
+  (fillfactor 100, строки упорядочены по экскурсии и времени);
+- bookings_default - страховочная секция для дат, под которые секции еще нет.
+
+Фоновая задача раз в BOOKING_PARTITIONS_INTERVAL_SECONDS создает секции
+на BOOKING_PARTITIONS_MONTHS_AHEAD месяцев вперед и архивирует месяцы,
+которые закончились больше BOOKING_ARCHIVE_AFTER_DAYS дней назад и в которых
+не осталось неподтвержденных броней. Архивируется каждый месяц отдельно, поэтому
+горячих (не архивных) секций всегда не больше BOOKING_ARCHIVE_AFTER_DAYS дней
+плюс BOOKING_PARTITIONS_MONTHS_AHEAD месяцев, в какой бы момент года ни шла работа.
+Запросы с условием по `date` (доступность, календарь гида, списки бронирований
+с date_from) читают только секции нужных месяцев, а архив не мешает горячим данным.
+
+Новые секции сначала создаются отдельной таблицей и подключаются ATTACH PARTITION:
+так bookings не блокируется целиком, а строки, успевшие попасть в bookings_default,
+переносятся в ту же транзакцию. Ожидание блокировок ограничено
+BOOKING_PARTITIONS_LOCK_TIMEOUT_MS, неудавшийся шаг повторяется при следующем запуске.
+
+На секционированную bookings нет ограничений FOREIGN KEY из notifications
+и waitlist_entries: ссылка на секционированную таблицу требует (booking_id, date),
+а строки, на которые она ссылается, не дали бы отключать секции при архивации
+и переносить строки из bookings_default. Целостность ссылок поддерживает
+тот же запуск: booking_id несуществующих бронирований обнуляется
+(clear_orphan_booking_references).
+"""
+import asyncio
+import logging
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import exists, select, text, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from src.config import settings
+from src.holds import HOLD_STATUS
+from src.models import Booking, Notification, WaitlistEntry, utcnow
+
+log = logging.getLogger(__name__)
+
+PARENT_TABLE = "bookings"
+DEFAULT_PARTITION = "bookings_default"
+MONTH_PREFIX = "bookings_p"
+ARCHIVE_PREFIX = "bookings_a"
+
+# воркеры обслуживают секции по очереди
+MAINTENANCE_LOCK = text("SELECT pg_advisory_xact_lock(hashtext('bookings_partitions'))")
+
+PARTITIONS_QUERY = text(
+    "SELECT child.relname FROM pg_inherits "
+    "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+    "WHERE pg_inherits.inhparent = 'bookings'::regclass"
+)
+
+
+def add_months(month: date, count: int) -> date:
+    """Первое число месяца через `count` месяцев после `month`."""
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def month_partition(month: date) -> str:
+    return f"{MONTH_PREFIX}{month:%Y_%m}"
+
+
+def archive_partition(month: date) -> str:
+    return f"{ARCHIVE_PREFIX}{month:%Y_%m}"
+
+
+async def partition_names(session: AsyncSession) -> set[str]:
+    """Имена секций bookings."""
+    return set((await session.scalars(PARTITIONS_QUERY)).all())
+
+
+async def attach_partition(session: AsyncSession, name: str, lower: date, upper: date) -> None:
+    """
+    Перенести строки диапазона из bookings_default в таблицу `name` и подключить ее секцией.
+
+    CHECK-ограничение с границами секции позволяет ATTACH PARTITION не сканировать таблицу.
+    """
+    bounds = f"date >= '{lower}' AND date < '{upper}'"
+    await session.execute(text(f"ALTER TABLE {name} ADD CONSTRAINT {name}_bounds CHECK ({bounds})"))
+    await session.execute(text(
+        f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} WHERE {bounds} RETURNING *) "
+        f"INSERT INTO {name} SELECT * FROM moved"
+    ))
+    await session.execute(text(
+        f"ALTER TABLE {PARENT_TABLE} ATTACH PARTITION {name} FOR VALUES FROM ('{lower}') TO ('{upper}')"
+    ))
+    await session.execute(text(f"ALTER TABLE {name} DROP CONSTRAINT {name}_bounds"))
+
+
+async def create_month_partition(session: AsyncSession, month: date) -> bool:
+    """
+    Создать секцию месяца (в транзакции сессии).
+
+    Returns:
+        False, если секцию уже создал другой воркер
+    """
+    name = month_partition(month)
+    if name in await partition_names(session):
+        return False
+    await session.execute(text(f"CREATE TABLE {name} (LIKE {PARENT_TABLE} INCLUDING DEFAULTS)"))
+    await attach_partition(session, name, month, add_months(month, 1))
+    return True
+
+
+async def archive_month(session: AsyncSession, month: date) -> bool:
+    """
+    Переписать секцию месяца в плотную архивную секцию (в транзакции сессии).
+
+    Returns:
+        False, если в месяце остались неподтвержденные брони и архивировать рано
+        или месяц уже заархивировал другой воркер
+    """
+    hot = month_partition(month)
+    if hot not in await partition_names(session):
+        return False
+    lower, upper = month, add_months(month, 1)
+    pending = await session.scalar(select(exists().where(
+        Booking.date >= lower,
+        Booking.date < upper,
+        Booking.status == HOLD_STATUS,
+    )))
+    if pending:
+        return False
+
+    name = archive_partition(month)
+    # запись в архивируемый месяц ждет конца транзакции, чтение идет как обычно
+    await session.execute(text(f"LOCK TABLE {hot} IN SHARE MODE"))
+    await session.execute(text(
+        f"CREATE TABLE {name} (LIKE {PARENT_TABLE} INCLUDING DEFAULTS) WITH (fillfactor = 100)"
+    ))
+    await session.execute(text(f"INSERT INTO {name} SELECT * FROM {hot} ORDER BY excursion_id, date"))
+    # короткая исключительная блокировка bookings только на отключение и удаление месяца
+    await session.execute(text(f"ALTER TABLE {PARENT_TABLE} DETACH PARTITION {hot}"))
+    await session.execute(text(f"DROP TABLE {hot}"))
+    await attach_partition(session, name, lower, upper)
+    return True
+
+
+async def clear_orphan_booking_references(session: AsyncSession) -> int:
+    """
+    Обнулить ссылки notifications и waitlist_entries на несуществующие бронирования
+    (в транзакции сессии). Такие ссылки остаются, если бронирование удалено.
+
+    Returns:
+        Количество исправленных строк
+    """
+    cleared = 0
+    for model in (Notification, WaitlistEntry):
+        result = await session.execute(
+            update(model)
+            .where(
+                model.booking_id.is_not(None),
+                ~exists().where(Booking.booking_id == model.booking_id),
+            )
+            .values(booking_id=None)
+            .execution_options(synchronize_session=False)
+        )
+        cleared += result.rowcount
+    return cleared
+
+
+async def maintain_booking_partitions(session_factory: async_sessionmaker) -> tuple[list[str], list[str], int]:
+    """
+    Создать недостающие секции на BOOKING_PARTITIONS_MONTHS_AHEAD месяцев вперед,
+    заархивировать месяцы старше BOOKING_ARCHIVE_AFTER_DAYS и обнулить ссылки
+    на удаленные бронирования. Каждый шаг - отдельная транзакция.
+
+    Returns:
+        Созданные секции месяцев, архивные секции и количество обнуленных ссылок
+    """
+    today = utcnow().date()
+    async with session_factory() as session:
+        existing = await partition_names(session)
+
+    async def step(action, *args):
+        async with session_factory() as session:
+            await session.execute(text(f"SET LOCAL lock_timeout = {settings.BOOKING_PARTITIONS_LOCK_TIMEOUT_MS}"))
+            await session.execute(MAINTENANCE_LOCK)
+            done = await action(session, *args)
+            await session.commit()
+        return done
+
+    created = []
+    current = today.replace(day=1)
+    for offset in range(settings.BOOKING_PARTITIONS_MONTHS_AHEAD + 1):
+        month = add_months(current, offset)
+        if month_partition(month) in existing or archive_partition(month) in existing:
+            continue
+        if await step(create_month_partition, month):
+            created.append(month_partition(month))
+
+    archived = []
+    archive_before = today - timedelta(days=settings.BOOKING_ARCHIVE_AFTER_DAYS)
+    months = sorted(
+        datetime.strptime(name[len(MONTH_PREFIX):], "%Y_%m").date()
+        for name in existing if name.startswith(MONTH_PREFIX)
+    )
+    for month in months:
+        if add_months(month, 1) > archive_before:
+            break
+        if await step(archive_month, month):
+            archived.append(archive_partition(month))
+
+    cleared = await step(clear_orphan_booking_references)
+    return created, archived, cleared
+
+
+async def run_partition_maintenance(session_factory: async_sessionmaker) -> None:
+    """Фоновая задача: раз в BOOKING_PARTITIONS_INTERVAL_SECONDS обслуживать секции bookings."""
+    while True:
+        try:
+            created, archived, cleared = await maintain_booking_partitions(session_factory)
+            if created or archived:
+                log.info("Секции bookings: созданы %s, заархивированы %s", created, archived)
+            if cleared:
+                log.warning("Обнулены ссылки на удаленные бронирования: %d", cleared)
+        except Exception:
+            log.exception("Ошибка при обслуживании секций bookings")
+        await asyncio.sleep(settings.BOOKING_PARTITIONS_INTERVAL_SECONDS)
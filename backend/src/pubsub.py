@@ -0,0 +1,191 @@
+"""
+Межпроцессные события через PostgreSQL LISTEN/NOTIFY.
+
+Событие публикуется внутри транзакции сессии и доставляется только после commit:
+- в текущем процессе - обработчикам, подписанным через `pg_listener.subscribe`;
+- в остальных воркерах - через NOTIFY, который принимает `PgListener`.
+
+Если СУБД не PostgreSQL (SQLite в тестах), события доставляются только локально.
+
+Соединение LISTEN держит фоновая задача: при обрыве (перезапуск PostgreSQL,
+переключение на реплику, таймаут простоя) или если соединение не ответило на
+проверку раз в PUBSUB_HEALTHCHECK_SECONDS, она переподключается и заново
+подписывается на каналы. Уведомления, отправленные без соединения, потеряны,
+поэтому после переподключения вызываются обработчики `pg_listener.on_resync`:
+локальные кэши сбрасываются и перестраиваются из БД.
+"""
+import asyncio
+import json
+import logging
+import uuid
+from collections import defaultdict
+from typing import Callable, Optional
+
+import asyncpg
+from sqlalchemy import event, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from src.config import settings
+from src.database import is_postgres
+
+log = logging.getLogger(__name__)
+
+# Идентификатор текущего воркера: свои уведомления из NOTIFY пропускаем,
+# они уже доставлены локально после commit
+WORKER_ID = uuid.uuid4().hex
+
+# Ключ в session.info со списком событий, ожидающих commit
+PENDING_EVENTS_KEY = "pending_events"
+
+# Первая пауза перед повторным подключением LISTEN, дальше удваивается до PUBSUB_RECONNECT_MAX_SECONDS
+RECONNECT_MIN_SECONDS = 1
+
+
+class PgListener:
+    """Подписка на каналы NOTIFY и локальная рассылка событий обработчикам."""
+
+    def __init__(self) -> None:
+        self._handlers: dict[str, list[Callable[[str], None]]] = defaultdict(list)
+        self._resync_handlers: list[Callable[[], None]] = []
+        self._connection: asyncpg.Connection | None = None
+        self._lost = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def active(self) -> bool:
+        return self._connection is not None and not self._connection.is_closed()
+
+    def subscribe(self, channel: str, handler: Callable[[str], None]) -> None:
+        """Подписать обработчик на канал. Обработчик получает строку payload."""
+        self._handlers[channel].append(handler)
+
+    def on_resync(self, handler: Callable[[], None]) -> None:
+        """Подписать обработчик, который вызывается, когда события могли быть пропущены."""
+        self._resync_handlers.append(handler)
+
+    def resync(self) -> None:
+        """Сообщить обработчикам on_resync, что события могли быть пропущены."""
+        for handler in self._resync_handlers:
+            try:
+                handler()
+            except Exception:
+                log.exception("Ошибка обработчика пересинхронизации")
+
+    def dispatch(self, channel: str, payload: str) -> None:
+        """Передать событие локальным обработчикам канала."""
+        for handler in self._handlers.get(channel, []):
+            try:
+                handler(payload)
+            except Exception:
+                log.exception("Ошибка обработчика события канала %s", channel)
+
+    def _on_notify(self, connection, pid, channel: str, message: str) -> None:
+        try:
+            data = json.loads(message)
+        except ValueError:
+            log.warning("Некорректное уведомление в канале %s: %r", channel, message)
+            return
+        if data.get("origin") == WORKER_ID:
+            return
+        self.dispatch(channel, data.get("payload", ""))
+
+    def _on_terminated(self, connection) -> None:
+        self._lost.set()
+
+    async def _connect(self, dsn: str) -> None:
+        """Открыть отдельное соединение и подписаться на все каналы."""
+        self._lost.clear()
+        connection = await asyncpg.connect(dsn)
+        connection.add_termination_listener(self._on_terminated)
+        self._connection = connection
+        for channel in self._handlers:
+            await connection.add_listener(channel, self._on_notify)
+
+    async def _close(self) -> None:
+        connection, self._connection = self._connection, None
+        if connection is not None and not connection.is_closed():
+            try:
+                await asyncio.wait_for(connection.close(), timeout=settings.PUBSUB_HEALTHCHECK_SECONDS)
+            except Exception:
+                connection.terminate()
+
+    async def _watch(self) -> None:
+        """Ждать обрыва соединения, периодически проверяя, что оно отвечает."""
+        while True:
+            try:
+                await asyncio.wait_for(self._lost.wait(), timeout=settings.PUBSUB_HEALTHCHECK_SECONDS)
+                log.warning("Соединение LISTEN закрыто")
+                return
+            except asyncio.TimeoutError:
+                pass
+            try:
+                await asyncio.wait_for(self._connection.fetchval("SELECT 1"), timeout=settings.PUBSUB_HEALTHCHECK_SECONDS)
+            except Exception:
+                log.warning("Соединение LISTEN не отвечает", exc_info=True)
+                return
+
+    async def _run(self, dsn: str) -> None:
+        """Держать соединение LISTEN открытым, переподключаясь после обрывов."""
+        delay = RECONNECT_MIN_SECONDS
+        # были ли периоды без соединения, когда уведомления могли потеряться
+        missed = False
+        while True:
+            try:
+                await self._connect(dsn)
+            except Exception:
+                log.warning("Не удалось подключить LISTEN, повтор через %d с", delay, exc_info=True)
+                await self._close()
+                missed = True
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, settings.PUBSUB_RECONNECT_MAX_SECONDS)
+                continue
+            delay = RECONNECT_MIN_SECONDS
+            if missed:
+                log.info("LISTEN переподключен, локальные кэши сброшены")
+                self.resync()
+            await self._watch()
+            await self._close()
+            missed = True
+
+    async def start(self, dsn: str) -> None:
+        """Запустить фоновую задачу, которая слушает все подписанные каналы."""
+        self._task = asyncio.create_task(self._run(dsn))
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self._close()
+
+
+pg_listener = PgListener()
+
+
+async def publish(session: AsyncSession, channel: str, payload: str = "") -> None:
+    """
+    Опубликовать событие в рамках текущей транзакции сессии.
+
+    Вызывается до commit. Для PostgreSQL в транзакцию добавляется pg_notify,
+    поэтому другие воркеры получат событие только если транзакция зафиксирована.
+
+    Args:
+        session: Сессия, в транзакции которой произошло изменение
+        channel: Имя канала
+        payload: Строка с данными события
+    """
+    if is_postgres(session):
+        message = json.dumps({"origin": WORKER_ID, "payload": payload})
+        await session.execute(select(func.pg_notify(channel, message)))
+    session.sync_session.info.setdefault(PENDING_EVENTS_KEY, []).append((channel, payload))
+
+
+@event.listens_for(Session, "after_commit")
+def _dispatch_pending_events(session: Session) -> None:
+    for channel, payload in session.info.pop(PENDING_EVENTS_KEY, []):
+        pg_listener.dispatch(channel, payload)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_pending_events(session: Session) -> None:
+    session.info.pop(PENDING_EVENTS_KEY, None)
@@ -0,0 +1,182 @@
+"""
+Чтение каталога с реплики PostgreSQL.
+
+Безопасные GET-эндпоинты каталога получают сессию через `get_read_session`.
+Сессия открывается на реплике, если она настроена (DB_REPLICA_HOST), успевает
+за основной БД (отставание не больше DB_REPLICA_MAX_LAG_SECONDS) и данные,
+которые читает запрос, не менялись только что. Иначе используется обычная
+сессия основной БД.
+
+Read-your-writes: изменения каталога (CATALOG_CHANNEL) и мест в слотах
+(SEATS_CHANNEL) уже рассылаются всем воркерам после commit (src.pubsub).
+Время последнего изменения запоминается для каталога в целом и для каждой
+экскурсии; пока с него прошло меньше текущего отставания реплики плюс
+DB_REPLICA_LAG_MARGIN_SECONDS, чтение идет в основную БД. Так клиент сразу
+после своего бронирования видит занятые места, а в остальное время чтение
+каталога не нагружает основную БД.
+
+Запросы, которые читают счетчики мест произвольных экскурсий (поиск по дате,
+пакетная доступность), зависят от общего ключа SEATS_KEY: он отмечается
+при любом изменении мест, и такие запросы идут в основную БД, пока последнее
+изменение может еще не дойти до реплики.
+"""
+import asyncio
+import json
+import logging
+import time
+from typing import Hashable, Iterable, Optional
+
+from fastapi import Depends, Request
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.availability_stream import SEATS_CHANNEL
+from src.cache import CATALOG_CHANNEL
+from src.config import settings
+from src.database import get_session, replica_engine, replica_session_factory
+from src.pubsub import pg_listener
+
+log = logging.getLogger(__name__)
+
+# Ключ последних изменений каталога в целом
+CATALOG_KEY = "catalog"
+# Ключ последних изменений мест в любом слоте
+SEATS_KEY = "seats"
+
+# Параметры поиска каталога, с которыми он читает счетчики мест в слотах
+SEAT_QUERY_PARAMS = ("date",)
+
+# Отставание реплики в секундах: 0, если все полученные WAL уже применены
+REPLICA_LAG_QUERY = text(
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+)
+
+
+def excursion_key(excursion_id: int) -> tuple:
+    return ("excursion", excursion_id)
+
+
+class ReplicaRouter:
+    """Решает, можно ли читать с реплики: ее отставание и время последних изменений."""
+
+    def __init__(self) -> None:
+        # None - отставание неизвестно (реплика недоступна или еще не проверена)
+        self.lag: Optional[float] = None
+        self.checked_at: Optional[float] = None
+        self._writes: dict[Hashable, float] = {}
+        self.replica_reads = 0
+        self.primary_reads = 0
+
+    @property
+    def healthy(self) -> bool:
+        return self.lag is not None and self.lag <= settings.DB_REPLICA_MAX_LAG_SECONDS
+
+    def mark_write(self, key: Hashable) -> None:
+        """Запомнить, что данные ключа только что изменились."""
+        self._writes[key] = time.monotonic()
+
+    def allows(self, keys: Iterable[Hashable]) -> bool:
+        """Можно ли прочитать данные ключей с реплики."""
+        if not self.healthy:
+            return False
+        window = self.lag + settings.DB_REPLICA_LAG_MARGIN_SECONDS
+        now = time.monotonic()
+        for key in keys:
+            written_at = self._writes.get(key)
+            if written_at is not None:
+                if now - written_at < window:
+                    return False
+                # изменение уже на реплике, запоминать его больше не нужно
+                del self._writes[key]
+        return True
+
+    def _on_catalog_changed(self, payload: str) -> None:
+        self.mark_write(CATALOG_KEY)
+
+    def _on_seats_changed(self, payload: str) -> None:
+        try:
+            excursion_id = json.loads(payload)["excursion_id"]
+        except (ValueError, KeyError):
+            return
+        self.mark_write(excursion_key(excursion_id))
+        self.mark_write(SEATS_KEY)
+
+    def stats(self) -> dict:
+        return {
+            "configured": replica_engine is not None,
+            "lag_seconds": self.lag,
+            "healthy": self.healthy,
+            "replica_reads": self.replica_reads,
+            "primary_reads": self.primary_reads,
+        }
+
+
+replica_router = ReplicaRouter()
+pg_listener.subscribe(CATALOG_CHANNEL, replica_router._on_catalog_changed)
+pg_listener.subscribe(SEATS_CHANNEL, replica_router._on_seats_changed)
+# пропущенные изменения неизвестны: все ключи зависят от CATALOG_KEY, чтение временно уходит в основную БД
+pg_listener.on_resync(lambda: replica_router.mark_write(CATALOG_KEY))
+
+
+async def check_replica_lag() -> None:
+    """Обновить отставание реплики (None, если реплика не ответила)."""
+    try:
+        async with replica_engine.connect() as conn:
+            lag = await conn.scalar(REPLICA_LAG_QUERY)
+        replica_router.lag = float(lag) if lag is not None else None
+    except Exception:
+        log.warning("Реплика недоступна, чтение каталога идет из основной БД", exc_info=True)
+        replica_router.lag = None
+    replica_router.checked_at = time.monotonic()
+
+
+async def run_replica_monitor() -> None:
+    """Фоновая задача: раз в DB_REPLICA_LAG_CHECK_SECONDS проверять отставание реплики."""
+    while True:
+        await check_replica_lag()
+        await asyncio.sleep(settings.DB_REPLICA_LAG_CHECK_SECONDS)
+
+
+def read_keys(request: Request, seats: bool = False) -> list[Hashable]:
+    """
+    Ключи изменений, от которых зависит ответ: каталог, экскурсия из пути запроса
+    и места во всех слотах, если запрос их читает (`seats` или параметры SEAT_QUERY_PARAMS).
+    """
+    keys: list[Hashable] = [CATALOG_KEY]
+    excursion_id = request.path_params.get("excursion_id")
+    if excursion_id is not None:
+        keys.append(excursion_key(int(excursion_id)))
+    if seats or any(request.query_params.get(name) for name in SEAT_QUERY_PARAMS):
+        keys.append(SEATS_KEY)
+    return keys
+
+
+async def get_read_session(request: Request, session: AsyncSession = Depends(get_session)):
+    """
+    Сессия только для чтения: реплика, если ей можно доверять, иначе основная БД.
+
+    Сессия основной БД не занимает соединение, пока к ней нет запросов,
+    поэтому при чтении с реплики она ничего не стоит.
+    """
+    async for read_session in open_read_session(request, session, read_keys(request)):
+        yield read_session
+
+
+async def get_seats_read_session(request: Request, session: AsyncSession = Depends(get_session)):
+    """get_read_session для запросов, читающих места в слотах произвольных экскурсий."""
+    async for read_session in open_read_session(request, session, read_keys(request, seats=True)):
+        yield read_session
+
+
+async def open_read_session(request: Request, session: AsyncSession, keys: list[Hashable]):
+    """Реплика, если данные ключей `keys` на ней уже актуальны, иначе сессия основной БД."""
+    if replica_session_factory is None or not replica_router.allows(keys):
+        replica_router.primary_reads += 1
+        yield session
+        return
+    replica_router.replica_reads += 1
+    async with replica_session_factory() as replica_session:
+        # закрывается вместе с основной сессией (SessionReleasingRoute)
+        request.state.read_session = replica_session
+        yield replica_session
@@ -0,0 +1,70 @@
+"""
+Быстрая отдача больших JSON-списков.
+
+Вместо загрузки ORM-объектов, валидации каждого элемента Pydantic-моделью
+и jsonable_encoder эндпоинт выбирает только нужные колонки и сериализует строки
+результата напрямую через pydantic_core (Rust). Формат ответа совпадает
+с соответствующей схемой из src.schemas.
+
+Эндпоинт подключается явно: `response_class=FastJSONResponse`
+и возврат `rows_json(...)` или готовых байтов.
+"""
+from typing import Any, Iterable, Sequence
+
+from fastapi import Response
+from pydantic_core import to_json
+from sqlalchemy import Float, cast
+
+from src.models import Excursion
+
+
+class FastJSONResponse(Response):
+    """JSON-ответ, сериализуемый pydantic_core; уже готовые байты отдаются как есть."""
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return to_json(content)
+
+
+def excursion_read_columns() -> list:
+    """
+    Колонки Excursion в порядке полей ExcursionRead.
+
+    Числовые колонки приводятся к float в SQL, чтобы в JSON попадали числа, а не строки Decimal.
+    """
+    return [
+        Excursion.title,
+        Excursion.country,
+        Excursion.city,
+        Excursion.difficulty,
+        Excursion.description,
+        Excursion.resolved_photos.label("photos"),
+        cast(Excursion.price_per_person, Float).label("price_per_person"),
+        Excursion.accepted_payment_methods,
+        Excursion.available_slots,
+        Excursion.excursion_id,
+        Excursion.status,
+        cast(Excursion.rating, Float).label("rating"),
+    ]
+
+
+EXCURSION_READ_FIELDS = [column.key for column in excursion_read_columns()]
+
+
+def rows_json(rows: Iterable[Sequence], fields: Sequence[str], **extra: Any) -> bytes:
+    """
+    Сериализовать строки результата в JSON-массив объектов.
+
+    Args:
+        rows: Строки запроса; берутся первые len(fields) колонок
+        fields: Имена полей в порядке колонок
+        **extra: Поля с одинаковым значением для всех элементов (например, snippet=None)
+
+    Returns:
+        Байты JSON
+    """
+    count = len(fields)
+    return to_json([{**dict(zip(fields, row[:count])), **extra} for row in rows])
@@ -1,13 +1,18 @@
 from typing import List, Optional
-from datetime import datetime
+from datetime import date, datetime
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy import select
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import Float, cast, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.auth.auth import fastapi_users
-from src.database import get_session
+from src.cache import catalog_cache, invalidate_catalog
+from src.database import async_engine, get_session, pool_stats, replica_engine, SessionReleasingRoute
+from src.facets import facet_delta, facet_values
+from src.inventory import booking_date_range, sync_slot_capacity
 from src.models import User, Guide, Excursion, Booking, Client
+from src.replica import get_read_session, replica_router
+from src.responses import EXCURSION_READ_FIELDS, FastJSONResponse, excursion_read_columns, rows_json
 from src.schemas.admin import (
     AdminUserRead,
     AdminUserUpdate,
@@ -17,11 +22,15 @@ from src.schemas.admin import (
 )
 from src.schemas.excursion import ExcursionRead, ExcursionCreate
 from src.schemas.guide import GuideRead
+from src.utils import resolve_excursion_photos
 
-router = APIRouter(prefix="/api/admin", tags=["admin"])
+router = APIRouter(prefix="/api/admin", tags=["admin"], route_class=SessionReleasingRoute)
 
 current_active_superuser = fastapi_users.current_user(active=True, superuser=True)
 
+# Поля AdminBookingRead в порядке колонок запроса list_all_bookings
+ADMIN_BOOKING_FIELDS = list(AdminBookingRead.model_fields)
+
 
 # ========== USERS ==========
 
@@ -219,21 +228,20 @@ async def get_guide(
 
 # ========== EXCURSIONS ==========
 
-@router.get("/excursions", response_model=List[ExcursionRead])
+@router.get("/excursions", response_model=List[ExcursionRead], response_class=FastJSONResponse)
 async def list_all_excursions(
     admin_user: User = Depends(current_active_superuser),
-    session: AsyncSession = Depends(get_session),
+    session: AsyncSession = Depends(get_read_session),
     status_filter: Optional[str] = None,
 ) -> List[ExcursionRead]:
     """Получить список всех экскурсий (включая pending_review)"""
-    query = select(Excursion).order_by(Excursion.excursion_id.desc())
+    query = select(*excursion_read_columns()).order_by(Excursion.excursion_id.desc())
     
     if status_filter:
         query = query.where(Excursion.status == status_filter)
     
     result = await session.execute(query)
-    excursions = result.scalars().all()
-    return excursions
+    return FastJSONResponse(rows_json(result, EXCURSION_READ_FIELDS, snippet=None))
 
 
 @router.get("/excursions/{excursion_id}", response_model=ExcursionRead)
@@ -261,11 +269,16 @@ async def update_excursion(
     if excursion is None:
         raise HTTPException(status_code=404, detail="Экскурсия не найдена")
     
+    facets_before = facet_values(excursion)
+    
     # Обновляем поля
     update_data = data.model_dump(exclude_unset=True)
     for field, value in update_data.items():
         setattr(excursion, field, value)
+    resolve_excursion_photos(excursion)
+    await sync_slot_capacity(session, excursion)
     
+    await invalidate_catalog(session, facet_delta(facets_before, facet_values(excursion)))
     await session.commit()
     await session.refresh(excursion)
     return excursion
@@ -283,45 +296,64 @@ async def delete_excursion(
         raise HTTPException(status_code=404, detail="Экскурсия не найдена")
     
     await session.delete(excursion)
+    await invalidate_catalog(session, facet_delta(facet_values(excursion), None))
     await session.commit()
     return None
 
 
+# ========== METRICS ==========
+
+@router.get("/metrics/catalog-cache")
+async def get_catalog_cache_stats(
+    admin_user: User = Depends(current_active_superuser),
+) -> dict:
+    """Статистика кэша каталога: попадания, промахи, вытеснения"""
+    return catalog_cache.stats()
+
+
+@router.get("/metrics/db-pool")
+async def get_db_pool_stats(
+    admin_user: User = Depends(current_active_superuser),
+) -> dict:
+    """Пул соединений с БД: занятые соединения, overflow, гистограмма ожидания соединения"""
+    stats = pool_stats(async_engine)
+    stats["replica"] = replica_router.stats()
+    if replica_engine is not None:
+        stats["replica"]["pool"] = pool_stats(replica_engine)
+    return stats
+
+
 # ========== BOOKINGS ==========
 
-@router.get("/bookings", response_model=List[AdminBookingRead])
+@router.get("/bookings", response_model=List[AdminBookingRead], response_class=FastJSONResponse)
 async def list_all_bookings(
+    date_from: Optional[date] = Query(default=None),
+    date_to: Optional[date] = Query(default=None),
     admin_user: User = Depends(current_active_superuser),
-    session: AsyncSession = Depends(get_session),
+    session: AsyncSession = Depends(get_read_session),
 ) -> List[AdminBookingRead]:
-    """Получить список всех бронирований"""
+    """Получить список всех бронирований (с date_from/date_to - только за эти даты)"""
     result = await session.execute(
-        select(Booking, Excursion, Client, User)
+        select(
+            Booking.booking_id,
+            Booking.date,
+            Booking.number_of_people,
+            Booking.status,
+            Booking.payment_status,
+            Booking.excursion_id,
+            Excursion.title,
+            Client.client_id,
+            User.name,
+            User.email,
+            cast(Excursion.price_per_person * Booking.number_of_people, Float),
+        )
         .join(Excursion, Booking.excursion_id == Excursion.excursion_id)
         .join(Client, Booking.client_id == Client.client_id)
         .join(User, Client.user_id == User.id)
+        .where(*booking_date_range(date_from, date_to))
         .order_by(Booking.date.desc())
     )
-    bookings_data = result.all()
-    
-    bookings_list = []
-    for booking, excursion, client, client_user in bookings_data:
-        total_amount = float(excursion.price_per_person) * booking.number_of_people
-        bookings_list.append(AdminBookingRead(
-            booking_id=booking.booking_id,
-            date=booking.date,
-            number_of_people=booking.number_of_people,
-            status=booking.status,
-            payment_status=booking.payment_status,
-            excursion_id=booking.excursion_id,
-            excursion_title=excursion.title,
-            client_id=client.client_id,
-            client_name=client_user.name,
-            client_email=client_user.email,
-            total_amount=total_amount,
-        ))
-    
-    return bookings_list
+    return FastJSONResponse(rows_json(result, ADMIN_BOOKING_FIELDS))
 
 
 @router.get("/bookings/{booking_id}", response_model=AdminBookingRead)
@@ -5,14 +5,14 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.auth.auth import auth_backend, fastapi_users
 from src.schemas.user import UserRead, UserCreate, UserUpdate
-from src.database import get_session
+from src.database import get_session, SessionReleasingRoute
 from src.models import Guide, Client
 from src.auth.manager import get_user_manager
 from fastapi_users import BaseUserManager
 
 http_bearer = HTTPBearer(auto_error=False)
 
-router = APIRouter(dependencies=[Depends(http_bearer)])
+router = APIRouter(dependencies=[Depends(http_bearer)], route_class=SessionReleasingRoute)
 
 # /login /logout
 router.include_router(
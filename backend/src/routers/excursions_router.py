@@ -1,49 +1,197 @@
-from datetime import datetime, timedelta, date, timezone
-from typing import List, Optional
+from datetime import date as date_cls, datetime, time, timedelta, timezone
+from typing import List, Literal, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
-from sqlalchemy import select, func
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import and_, false, func, insert, or_, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.auth.auth import fastapi_users
-from src.database import get_session
-from src.models import Booking, Client, Excursion, Guide, Payment
+from src.availability_stream import availability_hub, sse_events
+from src.cache import catalog_cache, invalidate_catalog
+from src.conditional import is_not_modified, make_etag, not_modified, validator_headers
+from src.database import dialect_insert, get_session, is_postgres, SessionReleasingRoute
+from src.facets import facet_delta, facet_index, facet_values, facets_response
+from src.holds import EXPIRED_STATUS, HOLD_STATUS, hold_deadline
+from src.idempotency import claim_key, remember_response, request_fingerprint, save_response
+from src.inventory import (
+    booking_date_range,
+    ensure_slot,
+    load_slots,
+    release_seats,
+    reserve_seats,
+    slot_seats,
+    slot_start,
+)
+from src.models import (
+    ACTIVE_BOOKING_STATUSES,
+    Booking,
+    Client,
+    Excursion,
+    ExcursionSlot,
+    Guide,
+    Payment,
+    ScheduleException,
+    ScheduleRule,
+    WaitlistEntry,
+    utcnow,
+)
+from src.pagination import NEXT_CURSOR_HEADER, decode_cursor, encode_cursor, keyset_condition
+from src.replica import get_read_session, get_seats_read_session
+from src.responses import EXCURSION_READ_FIELDS, excursion_read_columns, rows_json
+from src.schedule import get_schedule, get_schedules, slots_on_day_expression
 from src.schemas.excursion import (
+    AvailabilityRequest,
+    AvailabilityResponse,
     AvailableDatesResponse,
     AvailableTimeSlot,
+    BookingBatchCreate,
+    BookingBatchResponse,
     BookingCreate,
     BookingResponse,
     BookingWithExcursion,
+    ExcursionAvailability,
     ExcursionCreate,
+    ExcursionFacets,
     ExcursionRead,
+    ExcursionSchedule,
+    WaitlistCreate,
+    WaitlistEntryRead,
+)
+from src.search import (
+    fulltext_match,
+    fulltext_rank,
+    fulltext_snippet,
+    similarity_score,
+    text_match,
 )
+from src.utils import resolve_excursion_photos
+from src.waitlist import LEFT_STATUS, WAITING_STATUS, promote_waitlist, queue_position
 
 
-router = APIRouter(prefix="/api", tags=["excursions"])
+router = APIRouter(prefix="/api", tags=["excursions"], route_class=SessionReleasingRoute)
 
 current_active_user = fastapi_users.current_user(active=True)
 current_active_superuser = fastapi_users.current_user(active=True, superuser=True)
 
 
+# Варианты сортировки каталога: (выражения сортировки без учета id, по убыванию ли)
+SORT_OPTIONS = {
+    "newest": ([], True),
+    "price_asc": ([Excursion.price_per_person], False),
+    "price_desc": ([Excursion.price_per_person], True),
+    "rating": ([Excursion.rating], True),
+}
+
+# Максимальный размер страницы каталога
+MAX_PAGE_SIZE = 100
+
+# Максимальное окно календаря доступности, дней
+MAX_CALENDAR_DAYS = 366
+
+
+def free_on_date_condition(day: date_cls, people: int):
+    """
+    Условие «на дату есть слот, где хватает мест на `people` человек».
+
+    Заполненные слоты дня считаются по таблице excursion_slots
+    (диапазонное чтение по starts_at), количество слотов в дне - по расписанию
+    экскурсии (src.schedule). Экскурсия подходит, если в этот день она проводится
+    и заполненных слотов меньше, чем слотов в дне.
+
+    Args:
+        day: Дата экскурсии
+        people: Размер группы
+
+    Returns:
+        (подзапрос с количеством заполненных слотов, SQL-условие для WHERE)
+    """
+    day_start = datetime.combine(day, time.min)
+    day_end = day_start + timedelta(days=1)
+
+    full_slots = (
+        select(ExcursionSlot.excursion_id, func.count().label("full_slots"))
+        .where(
+            ExcursionSlot.starts_at >= day_start,
+            ExcursionSlot.starts_at < day_end,
+            ExcursionSlot.capacity - ExcursionSlot.booked < people,
+        )
+        .group_by(ExcursionSlot.excursion_id)
+        .subquery()
+    )
+    slots_on_day = slots_on_day_expression(day, datetime.now().date())
+    condition = and_(
+        slots_on_day > 0,
+        or_(
+            Excursion.available_slots.is_(None),
+            func.coalesce(full_slots.c.full_slots, 0) < slots_on_day,
+        ),
+    )
+    return full_slots, condition
+
+
 @router.get("/excursions", response_model=List[ExcursionRead])
 async def search_excursions(
+    request: Request,
     country: Optional[str] = Query(default=None),
     city: Optional[str] = Query(default=None),
+    title: Optional[str] = Query(default=None),
+    q: Optional[str] = Query(default=None, min_length=2, max_length=200),
     date: Optional[str] = Query(default=None),
     people: int = Query(default=1, ge=1),
     has_children: bool = Query(default=False),
-    session: AsyncSession = Depends(get_session),
+    fuzzy: bool = Query(default=False),
+    sort: Optional[Literal["newest", "price_asc", "price_desc", "rating", "relevance"]] = Query(default=None),
+    limit: int = Query(default=50, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(default=None),
+    session: AsyncSession = Depends(get_read_session),
 ) -> List[ExcursionRead]:
     """
-    Поиск экскурсий по стране, городу и количеству людей.
+    Поиск экскурсий по стране, городу, названию и количеству людей.
     Возвращает только одобренные экскурсии.
+
+    С `fuzzy=true` поиск допускает опечатки (pg_trgm), а результаты
+    по умолчанию сортируются по степени сходства.
+
+    Параметр `q` - полнотекстовый поиск по названию, городу и описанию
+    с учетом русской морфологии. Результаты ранжируются в БД (ts_rank_cd),
+    в поле `snippet` возвращается фрагмент описания с подсвеченными словами.
+
+    Выдача постраничная: не более `limit` записей. Если есть следующая страница,
+    ее курсор возвращается в заголовке `X-Next-Cursor` и передается
+    обратно параметром `cursor`.
+
+    Если указана дата `date` (YYYY-MM-DD), возвращаются только экскурсии,
+    у которых в этот день есть слот с достаточным количеством свободных мест.
+
+    Готовые ответы без даты кэшируются в памяти по набору параметров запроса
+    и отдаются со слабым ETag; на If-None-Match с актуальным ETag - 304 Not Modified.
     """
-    query = select(Excursion).where(Excursion.status == "approved")
+    postgres = is_postgres(session)
+    query = select(*excursion_read_columns()).where(Excursion.status == "approved")
 
-    if country:
-        query = query.where(Excursion.country.ilike(f"%{country}%"))
-    if city:
-        query = query.where(Excursion.city.ilike(f"%{city}%"))
+    matches = [
+        (column, value)
+        for column, value in (
+            (Excursion.country, country),
+            (Excursion.city, city),
+            (Excursion.title, title),
+        )
+        if value
+    ]
+    for column, value in matches:
+        query = query.where(text_match(column, value, fuzzy, postgres))
+
+    if q:
+        query = query.where(
+            fulltext_match(
+                Excursion.search_vector, q, postgres,
+                fallback_columns=[Excursion.title, Excursion.description],
+            )
+        )
+        if postgres:
+            document = func.coalesce(Excursion.description, Excursion.title)
+            query = query.add_columns(fulltext_snippet(document, q).label("snippet"))
 
     # простая проверка доступных мест
     query = query.where(
@@ -51,94 +199,260 @@ async def search_excursions(
         | (Excursion.available_slots >= people)
     )
 
+    # проверка свободных мест на выбранную дату с учетом бронирований
+    if date:
+        try:
+            day = datetime.fromisoformat(date).date()
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Некорректная дата")
+        if day < datetime.now().date():
+            query = query.where(false())
+        else:
+            full_slots, condition = free_on_date_condition(day, people)
+            query = query.outerjoin(
+                full_slots, full_slots.c.excursion_id == Excursion.excursion_id
+            ).where(condition)
+
+    if sort is None:
+        sort = "relevance" if fuzzy or q else "newest"
+    if sort == "relevance":
+        score = similarity_score(matches, postgres)
+        if q:
+            rank = fulltext_rank(Excursion.search_vector, q, postgres)
+            score = score + rank if matches else rank
+        sort_keys, descending = [score], True
+    else:
+        sort_keys, descending = SORT_OPTIONS[sort]
+    order_by = [*sort_keys, Excursion.excursion_id]
+
+    if date:
+        # наличие мест на дату меняется с каждым бронированием, такие ответы не кэшируем
+        body, next_cursor = await _search_page(session, query, order_by, sort, descending, limit, cursor)
+        headers = {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    cache_key = ("search", country, city, title, q, people, has_children, fuzzy, sort, limit, cursor)
+    cached = catalog_cache.get(cache_key)
+    if cached is None:
+        # версию каталога читаем до выборки страницы: тело ответа не может оказаться старше ETag
+        etag = make_etag(*cache_key, *await _catalog_version(session))
+        if is_not_modified(request, etag, None):
+            return not_modified(etag, None)
+        body, next_cursor = await _search_page(session, query, order_by, sort, descending, limit, cursor)
+        cached = (body, next_cursor, etag)
+        catalog_cache.set(cache_key, cached)
+    body, next_cursor, etag = cached
+
+    if is_not_modified(request, etag, None):
+        return not_modified(etag, None)
+    headers = validator_headers(etag, None)
+    if next_cursor:
+        headers[NEXT_CURSOR_HEADER] = next_cursor
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+async def _catalog_version(session: AsyncSession) -> tuple:
+    """
+    Версия каталога для ETag списка: время последнего изменения и число экскурсий.
+
+    Количество учитывает удаления, которые не меняют max(updated_at).
+    Поэтому Last-Modified для списка не отдается - только ETag.
+    """
+    result = await session.execute(select(func.max(Excursion.updated_at), func.count()).select_from(Excursion))
+    last_modified, total = result.one()
+    return last_modified, total
+
+
+async def _search_page(
+    session: AsyncSession,
+    query,
+    order_by: list,
+    sort: str,
+    descending: bool,
+    limit: int,
+    cursor: Optional[str],
+) -> tuple[bytes, Optional[str]]:
+    """Выбрать страницу каталога и сериализовать ее в JSON вместе с курсором следующей страницы."""
+    if cursor:
+        values = decode_cursor(cursor, sort, order_by)
+        query = query.where(keyset_condition(order_by, values, descending))
+
+    query = (
+        query.add_columns(*order_by)
+        .order_by(*(expr.desc() if descending else expr for expr in order_by))
+        .limit(limit + 1)
+    )
+
     result = await session.execute(query)
-    excursions = result.scalars().all()
+    rows = result.all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(sort, list(rows[-1][-len(order_by):]))
 
-    return excursions
+    # строки сериализуются напрямую, без ORM-объектов и валидации ExcursionRead
+    if "snippet" in result.keys():
+        body = rows_json(rows, [*EXCURSION_READ_FIELDS, "snippet"])
+    else:
+        body = rows_json(rows, EXCURSION_READ_FIELDS, snippet=None)
+    return body, next_cursor
+
+
+@router.get("/excursions/facets", response_model=ExcursionFacets)
+async def get_excursion_facets(
+    session: AsyncSession = Depends(get_read_session),
+) -> ExcursionFacets:
+    """
+    Количество одобренных экскурсий по странам, городам, сложности и ценовым диапазонам.
+    Счетчики хранятся в памяти и обновляются инкрементально при модерации и редактировании.
+    """
+    counts = await facet_index.get(session)
+    return facets_response(counts)
+
+
+@router.post("/excursions/availability", response_model=AvailabilityResponse)
+async def get_excursions_availability(
+    data: AvailabilityRequest,
+    session: AsyncSession = Depends(get_seats_read_session),
+) -> AvailabilityResponse:
+    """
+    Доступность нескольких экскурсий за один запрос (для страницы результатов поиска).
+
+    Для каждой одобренной экскурсии из `excursion_ids` возвращает количество слотов
+    со свободными местами на `people` человек по каждому дню окна из `days` дней
+    начиная с `date_from`. Заполненные слоты всех экскурсий выбираются одним запросом
+    по excursion_slots, расписания - из кэша.
+    """
+    today = datetime.now().date()
+    start = max(data.date_from or today, today)
+    end = start + timedelta(days=data.days)
+
+    result = await session.scalars(
+        select(Excursion).where(
+            Excursion.excursion_id.in_(data.excursion_ids),
+            Excursion.status == "approved",
+        )
+    )
+    excursions = {excursion.excursion_id: excursion for excursion in result.all()}
+    schedules = await get_schedules(session, excursions.values())
+
+    full_result = await session.execute(
+        select(ExcursionSlot.excursion_id, ExcursionSlot.starts_at).where(
+            ExcursionSlot.excursion_id.in_(list(excursions)),
+            ExcursionSlot.starts_at >= datetime.combine(start, time.min),
+            ExcursionSlot.starts_at < datetime.combine(end, time.min),
+            ExcursionSlot.capacity - ExcursionSlot.booked < data.people,
+        )
+    )
+    full = set(full_result.all())
+
+    availability = []
+    for excursion_id in dict.fromkeys(data.excursion_ids):
+        excursion = excursions.get(excursion_id)
+        if excursion is None:
+            continue
+        fits = excursion.available_slots is None or excursion.available_slots >= data.people
+        free_slots = [0] * data.days
+        if fits:
+            for starts_at in schedules[excursion_id].occurrences(start, end, today):
+                if (excursion_id, slot_start(starts_at)) not in full:
+                    free_slots[(starts_at.date() - start).days] += 1
+        availability.append(ExcursionAvailability(excursion_id=excursion_id, free_slots=free_slots))
+
+    return AvailabilityResponse(date_from=start, days=data.days, excursions=availability)
 
 
 @router.get("/excursions/{excursion_id}", response_model=ExcursionRead)
 async def get_excursion_by_id(
     excursion_id: int,
-    session: AsyncSession = Depends(get_session),
+    request: Request,
+    session: AsyncSession = Depends(get_read_session),
 ) -> ExcursionRead:
     """
     Получить экскурсию по ID.
+
+    Ответ содержит ETag и Last-Modified по `updated_at`; если копия клиента
+    актуальна, возвращается 304 без загрузки и сериализации экскурсии.
     """
-    excursion = await session.get(Excursion, excursion_id)
-    if excursion is None:
-        raise HTTPException(status_code=404, detail="Экскурсия не найдена")
-    return excursion
+    cache_key = ("excursion", excursion_id)
+    cached = catalog_cache.get(cache_key)
+    if cached is None:
+        updated_at = await session.scalar(
+            select(Excursion.updated_at).where(Excursion.excursion_id == excursion_id)
+        )
+        if updated_at is None:
+            raise HTTPException(status_code=404, detail="Экскурсия не найдена")
+        etag = make_etag("excursion", excursion_id, updated_at.isoformat())
+        if is_not_modified(request, etag, updated_at):
+            return not_modified(etag, updated_at)
+
+        excursion = await session.get(Excursion, excursion_id)
+        if excursion is None:
+            raise HTTPException(status_code=404, detail="Экскурсия не найдена")
+        # ETag считаем по загруженной строке: она могла измениться после первого запроса
+        etag = make_etag("excursion", excursion_id, excursion.updated_at.isoformat())
+        cached = (ExcursionRead.model_validate(excursion).model_dump_json(), etag, excursion.updated_at)
+        catalog_cache.set(cache_key, cached)
+    body, etag, updated_at = cached
+
+    if is_not_modified(request, etag, updated_at):
+        return not_modified(etag, updated_at)
+    return Response(content=body, media_type="application/json", headers=validator_headers(etag, updated_at))
 
 
 @router.get("/excursions/{excursion_id}/available-dates", response_model=AvailableDatesResponse)
 async def get_available_dates(
     excursion_id: int,
     people: int = Query(default=1, ge=1),
-    session: AsyncSession = Depends(get_session),
+    date_from: Optional[date_cls] = Query(default=None),
+    days: int = Query(default=30, ge=1, le=MAX_CALENDAR_DAYS),
+    session: AsyncSession = Depends(get_read_session),
 ) -> AvailableDatesResponse:
     """
-    Получить доступные даты и время для экскурсии на ближайшие 30 дней.
+    Получить доступные даты и время для экскурсии.
+
+    Окно - `days` дней начиная с `date_from` (по умолчанию 30 дней с сегодняшнего),
+    обрезанное горизонтом записи экскурсии. Время берется из расписания экскурсии.
     """
     excursion = await session.get(Excursion, excursion_id)
     if excursion is None or excursion.status != "approved":
         raise HTTPException(status_code=404, detail="Экскурсия не найдена или недоступна")
 
-    # Стандартные временные слоты
-    time_slots_list = ["09:00", "12:00", "15:00", "18:00"]
-    
-    # Получаем существующие бронирования на ближайшие 30 дней
     today = datetime.now().date()
-    end_date = today + timedelta(days=30)
-    
-    bookings_query = select(Booking).where(
-        Booking.excursion_id == excursion_id,
-        func.date(Booking.date) >= today,
-        func.date(Booking.date) <= end_date,
-        Booking.status.in_(["confirmed", "pending"])
-    )
-    bookings_result = await session.execute(bookings_query)
-    bookings = bookings_result.scalars().all()
-    
-    # Группируем бронирования по дате и времени
-    booked_slots = {}
-    for booking in bookings:
-        booking_date = booking.date.date()
-        booking_time = booking.date.strftime("%H:%M")
-        key = f"{booking_date}_{booking_time}"
-        if key not in booked_slots:
-            booked_slots[key] = 0
-        booked_slots[key] += booking.number_of_people
+    start = max(date_from or today, today)
+    end = start + timedelta(days=days)
+    schedule = await get_schedule(session, excursion)
+
+    # Загрузка слотов окна - одно чтение по индексу excursion_slots
+    slots = await load_slots(
+        session, excursion_id, datetime.combine(start, time.min), datetime.combine(end, time.min)
+    )
     
-    # Генерируем список доступных дат и времени
+    # Разворачиваем расписание только в пределах окна
     available_time_slots = []
-    for day_offset in range(30):
-        current_date = today + timedelta(days=day_offset)
-        date_str = current_date.isoformat()
+    for starts_at in schedule.occurrences(start, end, today):
+        capacity, booked_count = slot_seats(slots, excursion, starts_at)
+        
+        # Проверяем доступность
+        if capacity is None:
+            # Если нет ограничения на количество мест, всегда доступно
+            available = True
+            available_count = None
+        else:
+            # Проверяем, есть ли свободные места
+            remaining = capacity - booked_count
+            available = remaining >= people
+            available_count = max(0, remaining)
         
-        for time_str in time_slots_list:
-            key = f"{current_date}_{time_str}"
-            booked_count = booked_slots.get(key, 0)
-            
-            # Проверяем доступность
-            if excursion.available_slots is None:
-                # Если нет ограничения на количество мест, всегда доступно
-                available = True
-                available_count = None
-            else:
-                # Проверяем, есть ли свободные места
-                remaining = excursion.available_slots - booked_count
-                available = remaining >= people
-                available_count = max(0, remaining)
-            
-            available_time_slots.append(
-                AvailableTimeSlot(
-                    date=date_str,
-                    time=time_str,
-                    available=available,
-                    available_slots=available_count,
-                )
+        available_time_slots.append(
+            AvailableTimeSlot(
+                date=starts_at.date().isoformat(),
+                time=starts_at.strftime("%H:%M"),
+                available=available,
+                available_slots=available_count,
             )
+        )
     
     return AvailableDatesResponse(
         excursion_id=excursion_id,
@@ -147,6 +461,69 @@ async def get_available_dates(
     )
 
 
+@router.get("/excursions/{excursion_id}/schedule", response_model=ExcursionSchedule)
+async def get_excursion_schedule(
+    excursion_id: int,
+    session: AsyncSession = Depends(get_read_session),
+) -> ExcursionSchedule:
+    """
+    Расписание экскурсии: еженедельные правила, исключения и горизонт записи.
+    Пустой список правил - экскурсия проводится ежедневно в стандартное время.
+    """
+    excursion = await session.get(Excursion, excursion_id)
+    if excursion is None:
+        raise HTTPException(status_code=404, detail="Экскурсия не найдена")
+
+    rules = await session.scalars(
+        select(ScheduleRule)
+        .where(ScheduleRule.excursion_id == excursion_id)
+        .order_by(ScheduleRule.weekday, ScheduleRule.start_time)
+    )
+    exceptions = await session.scalars(
+        select(ScheduleException)
+        .where(ScheduleException.excursion_id == excursion_id)
+        .order_by(ScheduleException.date, ScheduleException.start_time)
+    )
+    return ExcursionSchedule(
+        horizon_days=excursion.schedule_horizon_days,
+        rules=rules.all(),
+        exceptions=exceptions.all(),
+    )
+
+
+@router.get("/excursions/{excursion_id}/availability/stream")
+async def stream_availability(
+    excursion_id: int,
+    # сессия закрывается до начала потока (SessionReleasingRoute), соединение не держится все время подписки
+    session: AsyncSession = Depends(get_session),
+) -> StreamingResponse:
+    """
+    Поток изменений свободных мест экскурсии (Server-Sent Events).
+
+    События `seats` приходят после каждого бронирования, отмены, снятия
+    временной брони и продвижения листа ожидания; `resync` - когда календарь
+    нужно загрузить заново. Календарь загружается через available-dates
+    после подключения к потоку.
+    """
+    excursion = await session.get(Excursion, excursion_id)
+    if excursion is None or excursion.status != "approved":
+        raise HTTPException(status_code=404, detail="Экскурсия не найдена или недоступна")
+
+    async def events():
+        queue = availability_hub.subscribe(excursion_id)
+        try:
+            async for chunk in sse_events(queue):
+                yield chunk
+        finally:
+            availability_hub.unsubscribe(excursion_id, queue)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.post(
     "/guides/me/excursions",
     response_model=ExcursionRead,
@@ -184,6 +561,7 @@ async def create_excursion_for_guide(
         available_slots=data.available_slots,
         guide_id=guide.guide_id,
     )
+    resolve_excursion_photos(excursion)
     session.add(excursion)
     await session.commit()
     await session.refresh(excursion)
@@ -235,8 +613,10 @@ async def approve_excursion(
         session.add(moderator)
         await session.flush()
 
+    facets_before = facet_values(excursion)
     excursion.status = "approved"
     excursion.moderator_id = moderator.moderator_id
+    await invalidate_catalog(session, facet_delta(facets_before, facet_values(excursion)))
     await session.commit()
     await session.refresh(excursion)
     return excursion
@@ -251,11 +631,22 @@ async def create_booking(
     data: BookingCreate,
     user=Depends(current_active_user),
     session: AsyncSession = Depends(get_session),
+    idempotency_key: Optional[str] = Header(default=None, min_length=1, max_length=100),
 ) -> BookingResponse:
     """
     Бронирование экскурсии.
     При нехватке мест возвращает 400.
+
+    С заголовком Idempotency-Key повтор запроса возвращает сохраненный ответ
+    без повторного бронирования (src.idempotency).
     """
+    request_hash = None
+    if idempotency_key is not None:
+        request_hash = request_fingerprint(data)
+        replay = await claim_key(session, user.id, idempotency_key, request_hash)
+        if replay is not None:
+            return replay
+
     excursion = await session.get(Excursion, data.excursion_id)
     if excursion is None or excursion.status != "approved":
         raise HTTPException(
@@ -270,42 +661,20 @@ async def create_booking(
         booking_datetime = booking_datetime.astimezone(timezone.utc).replace(tzinfo=None)
     # Если datetime без timezone, предполагаем что это уже UTC и используем как есть
 
-    # Проверяем доступность мест с учетом существующих бронирований на эту дату и время
-    if excursion.available_slots is not None:
-        # Получаем все бронирования на эту дату и время (в пределах того же часа для упрощения)
-        booking_date = booking_datetime.date()
-        booking_hour = booking_datetime.hour
-        
-        # Находим все бронирования на эту дату и час
-        bookings_query = select(Booking).where(
-            Booking.excursion_id == excursion.excursion_id,
-            func.date(Booking.date) == booking_date,
-            func.extract('hour', Booking.date) == booking_hour,
-            Booking.status.in_(["confirmed", "pending"])
-        )
-        bookings_result = await session.execute(bookings_query)
-        existing_bookings = bookings_result.scalars().all()
-        
-        # Подсчитываем уже забронированные места
-        booked_slots = sum(b.number_of_people for b in existing_bookings)
-        
-        # Проверяем, есть ли достаточно свободных мест
-        available_slots = excursion.available_slots - booked_slots
-        if available_slots < data.number_of_people:
-            raise HTTPException(
-                status_code=400, 
-                detail="На выбранную дату и время нет свободных мест"
-            )
+    schedule = await get_schedule(session, excursion)
+    if not schedule.allows(booking_datetime, datetime.now().date()):
+        raise HTTPException(
+            status_code=400,
+            detail="Экскурсия не проводится в выбранное время"
+        )
 
-    # гарантируем профиль клиента
-    client_result = await session.execute(
-        select(Client).where(Client.user_id == user.id)
+    # гарантируем профиль клиента; ON CONFLICT - на случай одновременных первых бронирований
+    await session.execute(
+        dialect_insert(session)(Client)
+        .values(user_id=user.id)
+        .on_conflict_do_nothing(index_elements=["user_id"])
     )
-    client = client_result.scalar_one_or_none()
-    if client is None:
-        client = Client(user_id=user.id)
-        session.add(client)
-        await session.flush()
+    client = await session.scalar(select(Client).where(Client.user_id == user.id))
 
     # создаём оплату и бронирование
     total_amount = float(excursion.price_per_person) * data.number_of_people
@@ -316,26 +685,221 @@ async def create_booking(
     session.add(payment)
     await session.flush()
 
+    # Занимаем места в слоте одним условным UPDATE (src.inventory).
+    # UPDATE блокирует строку слота до commit, поэтому он идет последним перед вставкой:
+    # конкурирующие бронирования того же слота ждут как можно меньше,
+    # а после ожидания условие booked + n <= capacity проверяется заново
+    booked = await reserve_seats(
+        session, excursion, slot_start(booking_datetime), data.number_of_people
+    )
+    if booked is None:
+        raise HTTPException(
+            status_code=400, 
+            detail="На выбранную дату и время нет свободных мест"
+        )
+
     booking = Booking(
         date=booking_datetime,
         number_of_people=data.number_of_people,
-        status="confirmed",
+        status=HOLD_STATUS if data.hold else "confirmed",
         payment_status="pending",
         excursion_id=excursion.excursion_id,
         client_id=client.client_id,
         payment_id=payment.id,
+        hold_expires_at=hold_deadline() if data.hold else None,
     )
     session.add(booking)
+    await session.flush()
+    await session.refresh(booking)
+
+    response = BookingResponse(
+        booking=booking,
+        message="Места временно забронированы" if data.hold else "Экскурсия успешно забронирована",
+    )
+    if idempotency_key is None:
+        await session.commit()
+        return response
+
+    # ответ сохраняется в той же транзакции, что и бронирование
+    body = response.model_dump_json()
+    expires_at = await save_response(session, user.id, idempotency_key, status.HTTP_201_CREATED, body)
+    await session.commit()
+    remember_response(user.id, idempotency_key, request_hash, status.HTTP_201_CREATED, body, expires_at)
+    return response
+
+
+@router.post(
+    "/bookings/batch",
+    response_model=BookingBatchResponse,
+    status_code=status.HTTP_201_CREATED,
+)
+async def create_bookings_batch(
+    data: BookingBatchCreate,
+    user=Depends(current_active_user),
+    session: AsyncSession = Depends(get_session),
+    idempotency_key: Optional[str] = Header(default=None, min_length=1, max_length=100),
+) -> BookingBatchResponse:
+    """
+    Бронирование нескольких слотов и экскурсий одним запросом.
+
+    Все позиции проверяются заранее, места занимаются в слотах в порядке
+    (excursion_id, время начала), поэтому встречные пакеты не блокируют друг
+    друга по кругу. Оплаты и бронирования вставляются пакетными INSERT,
+    транзакция фиксируется один раз: если хотя бы одной позиции не хватает
+    мест, не создается ни одно бронирование.
+    """
+    request_hash = None
+    if idempotency_key is not None:
+        request_hash = request_fingerprint(data)
+        replay = await claim_key(session, user.id, idempotency_key, request_hash)
+        if replay is not None:
+            return replay
+
+    excursion_ids = {item.excursion_id for item in data.items}
+    result = await session.scalars(select(Excursion).where(Excursion.excursion_id.in_(excursion_ids)))
+    excursions = {excursion.excursion_id: excursion for excursion in result}
+    schedules = await get_schedules(
+        session,
+        [excursion for excursion in excursions.values() if excursion.status == "approved"],
+    )
+
+    today = datetime.now().date()
+    moments = []
+    demand: dict[tuple[int, datetime], int] = {}
+    for position, item in enumerate(data.items, start=1):
+        excursion = excursions.get(item.excursion_id)
+        if excursion is None or excursion.status != "approved":
+            raise HTTPException(
+                status_code=404,
+                detail=f"Позиция {position}: экскурсия недоступна для бронирования"
+            )
+        booking_datetime = item.date
+        if booking_datetime.tzinfo is not None:
+            booking_datetime = booking_datetime.astimezone(timezone.utc).replace(tzinfo=None)
+        if not schedules[excursion.excursion_id].allows(booking_datetime, today):
+            raise HTTPException(
+                status_code=400,
+                detail=f"Позиция {position}: экскурсия не проводится в выбранное время"
+            )
+        moments.append(booking_datetime)
+        slot = (excursion.excursion_id, slot_start(booking_datetime))
+        demand[slot] = demand.get(slot, 0) + item.number_of_people
+
+    await session.execute(
+        dialect_insert(session)(Client)
+        .values(user_id=user.id)
+        .on_conflict_do_nothing(index_elements=["user_id"])
+    )
+    client = await session.scalar(select(Client).where(Client.user_id == user.id))
+
+    payment_ids = (await session.scalars(
+        insert(Payment).returning(Payment.id, sort_by_parameter_order=True),
+        [
+            {
+                "amount": float(excursions[item.excursion_id].price_per_person) * item.number_of_people,
+                "payment_method": "online",
+            }
+            for item in data.items
+        ],
+    )).all()
 
-    # Не уменьшаем available_slots глобально, так как проверяем по дате/времени
-    # Это позволяет иметь разные доступные слоты для разных дат/времени
+    # Места занимаются последними перед вставкой бронирований (как в create_booking),
+    # по одному условному UPDATE на слот в детерминированном порядке
+    for excursion_id, starts_at in sorted(demand):
+        booked = await reserve_seats(
+            session, excursions[excursion_id], starts_at, demand[(excursion_id, starts_at)]
+        )
+        if booked is None:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Нет свободных мест: экскурсия {excursion_id}, {starts_at:%d.%m.%Y %H:%M}"
+            )
 
+    bookings = (await session.scalars(
+        insert(Booking).returning(Booking, sort_by_parameter_order=True),
+        [
+            {
+                "date": booking_datetime,
+                "number_of_people": item.number_of_people,
+                "status": HOLD_STATUS if item.hold else "confirmed",
+                "payment_status": "pending",
+                "excursion_id": item.excursion_id,
+                "client_id": client.client_id,
+                "payment_id": payment_id,
+                "hold_expires_at": hold_deadline() if item.hold else None,
+            }
+            for item, booking_datetime, payment_id in zip(data.items, moments, payment_ids)
+        ],
+    )).all()
+
+    response = BookingBatchResponse(
+        bookings=bookings,
+        message=f"Забронировано позиций: {len(bookings)}",
+    )
+    if idempotency_key is None:
+        await session.commit()
+        return response
+
+    body = response.model_dump_json()
+    expires_at = await save_response(session, user.id, idempotency_key, status.HTTP_201_CREATED, body)
+    await session.commit()
+    remember_response(user.id, idempotency_key, request_hash, status.HTTP_201_CREATED, body, expires_at)
+    return response
+
+
+@router.post(
+    "/bookings/{booking_id}/confirm",
+    response_model=BookingResponse,
+)
+async def confirm_booking(
+    booking_id: int,
+    user=Depends(current_active_user),
+    session: AsyncSession = Depends(get_session),
+) -> BookingResponse:
+    """
+    Подтвердить временную бронь до истечения ее срока.
+    Строка брони блокируется, поэтому фоновое снятие просроченных ее пропускает.
+    """
+    result = await session.execute(
+        select(Booking, Client)
+        .join(Client, Booking.client_id == Client.client_id)
+        .where(Booking.booking_id == booking_id)
+        .with_for_update(of=Booking)
+    )
+    row = result.first()
+    if row is None:
+        raise HTTPException(
+            status_code=404,
+            detail="Бронирование не найдено"
+        )
+    booking, client = row
+    
+    if client.user_id != user.id:
+        raise HTTPException(
+            status_code=403,
+            detail="Нет доступа к этому бронированию"
+        )
+    
+    if booking.status != HOLD_STATUS or booking.hold_expires_at is None:
+        raise HTTPException(
+            status_code=400,
+            detail="Бронирование не является временным"
+        )
+    
+    if booking.hold_expires_at < utcnow():
+        raise HTTPException(
+            status_code=409,
+            detail="Срок временной брони истек"
+        )
+    
+    booking.status = "confirmed"
+    booking.hold_expires_at = None
     await session.commit()
     await session.refresh(booking)
 
     return BookingResponse(
         booking=booking,
-        message="Экскурсия успешно забронирована",
+        message="Бронирование подтверждено",
     )
 
 
@@ -344,11 +908,17 @@ async def create_booking(
     response_model=List[BookingWithExcursion],
 )
 async def get_my_bookings(
+    date_from: Optional[date_cls] = Query(default=None),
+    date_to: Optional[date_cls] = Query(default=None),
     user=Depends(current_active_user),
     session: AsyncSession = Depends(get_session),
 ) -> List[BookingWithExcursion]:
     """
-    Получить все бронирования текущего пользователя.
+    Получить бронирования текущего пользователя.
+
+    `date_from` и `date_to` (включительно) ограничивают даты экскурсий:
+    тогда читаются только секции bookings нужных месяцев (src.partitions).
+    Без них возвращается вся история.
     """
     # Получаем профиль клиента
     client_result = await session.execute(
@@ -363,7 +933,7 @@ async def get_my_bookings(
     bookings_query = (
         select(Booking, Excursion)
         .join(Excursion, Booking.excursion_id == Excursion.excursion_id)
-        .where(Booking.client_id == client.client_id)
+        .where(Booking.client_id == client.client_id, *booking_date_range(date_from, date_to))
         .order_by(Booking.date.desc())
     )
     
@@ -381,10 +951,11 @@ async def get_my_bookings(
                 number_of_people=booking.number_of_people,
                 status=booking.status,
                 payment_status=booking.payment_status,
+                hold_expires_at=booking.hold_expires_at,
                 excursion_title=excursion.title,
                 excursion_city=excursion.city,
                 excursion_country=excursion.country,
-                excursion_photo=excursion.photos,
+                excursion_photo=excursion.resolved_photos,
                 price_per_person=float(excursion.price_per_person),
                 total_amount=total_amount,
             )
@@ -417,8 +988,9 @@ async def cancel_booking(
             detail="Профиль клиента не найден"
         )
     
-    # Получаем бронирование
-    booking = await session.get(Booking, booking_id)
+    # Получаем бронирование; блокировка строки не дает фоновому снятию
+    # просроченных броней вернуть те же места одновременно с отменой
+    booking = await session.get(Booking, booking_id, with_for_update=True)
     if booking is None:
         raise HTTPException(
             status_code=404,
@@ -438,9 +1010,22 @@ async def cancel_booking(
             status_code=400,
             detail="Бронирование уже отменено"
         )
+    if booking.status == EXPIRED_STATUS:
+        raise HTTPException(
+            status_code=400,
+            detail="Срок временной брони истек"
+        )
     
-    # Отменяем бронирование
+    # Отменяем бронирование, возвращаем места в слот и отдаем их листу ожидания
+    was_active = booking.status in ACTIVE_BOOKING_STATUSES
+    if was_active:
+        await release_seats(
+            session, booking.excursion_id, slot_start(booking.date), booking.number_of_people
+        )
     booking.status = "cancelled"
+    booking.hold_expires_at = None
+    if was_active:
+        await promote_waitlist(session, booking.excursion_id, slot_start(booking.date))
     await session.commit()
     await session.refresh(booking)
     
@@ -464,8 +1049,157 @@ async def cancel_booking(
         excursion_title=excursion.title,
         excursion_city=excursion.city,
         excursion_country=excursion.country,
-        excursion_photo=excursion.photos,
+        excursion_photo=excursion.resolved_photos,
         price_per_person=float(excursion.price_per_person),
         total_amount=total_amount,
     )
 
+
+@router.post(
+    "/waitlist",
+    response_model=WaitlistEntryRead,
+    status_code=status.HTTP_201_CREATED,
+)
+async def join_waitlist(
+    data: WaitlistCreate,
+    user=Depends(current_active_user),
+    session: AsyncSession = Depends(get_session),
+) -> WaitlistEntryRead:
+    """
+    Встать в лист ожидания слота, в котором не хватает мест.
+    Когда места освободятся, заявка получит временную бронь (src.waitlist).
+    """
+    excursion = await session.get(Excursion, data.excursion_id)
+    if excursion is None or excursion.status != "approved":
+        raise HTTPException(
+            status_code=404,
+            detail="Экскурсия недоступна для бронирования"
+        )
+
+    booking_datetime = data.date
+    if booking_datetime.tzinfo is not None:
+        booking_datetime = booking_datetime.astimezone(timezone.utc).replace(tzinfo=None)
+
+    schedule = await get_schedule(session, excursion)
+    if not schedule.allows(booking_datetime, datetime.now().date()):
+        raise HTTPException(
+            status_code=400,
+            detail="Экскурсия не проводится в выбранное время"
+        )
+    starts_at = slot_start(booking_datetime)
+
+    await session.execute(
+        dialect_insert(session)(Client)
+        .values(user_id=user.id)
+        .on_conflict_do_nothing(index_elements=["user_id"])
+    )
+    client = await session.scalar(select(Client).where(Client.user_id == user.id))
+
+    waiting = await session.scalar(
+        select(WaitlistEntry.entry_id).where(
+            WaitlistEntry.client_id == client.client_id,
+            WaitlistEntry.excursion_id == excursion.excursion_id,
+            WaitlistEntry.starts_at == starts_at,
+            WaitlistEntry.status == WAITING_STATUS,
+        )
+    )
+    if waiting is not None:
+        raise HTTPException(
+            status_code=400,
+            detail="Вы уже в листе ожидания на это время"
+        )
+
+    # блокировка слота упорядочивает постановку в очередь с продвижением очереди:
+    # заявка не может встать в очередь, пока места раздаются
+    await ensure_slot(session, excursion, starts_at)
+    capacity, booked = (await session.execute(
+        select(ExcursionSlot.capacity, ExcursionSlot.booked)
+        .where(
+            ExcursionSlot.excursion_id == excursion.excursion_id,
+            ExcursionSlot.starts_at == starts_at,
+        )
+        .with_for_update()
+    )).one()
+    if capacity is None or booked + data.number_of_people <= capacity:
+        raise HTTPException(
+            status_code=400,
+            detail="На выбранное время есть свободные места, оформите бронирование"
+        )
+
+    entry = WaitlistEntry(
+        excursion_id=excursion.excursion_id,
+        starts_at=starts_at,
+        client_id=client.client_id,
+        number_of_people=data.number_of_people,
+        status=WAITING_STATUS,
+    )
+    session.add(entry)
+    await session.flush()
+    position = await session.scalar(select(queue_position()).where(WaitlistEntry.entry_id == entry.entry_id))
+    await session.commit()
+
+    return WaitlistEntryRead.model_validate(entry).model_copy(update={"position": position})
+
+
+@router.get(
+    "/waitlist/me",
+    response_model=List[WaitlistEntryRead],
+)
+async def get_my_waitlist(
+    user=Depends(current_active_user),
+    session: AsyncSession = Depends(get_session),
+) -> List[WaitlistEntryRead]:
+    """
+    Заявки текущего пользователя в листах ожидания с местом в очереди.
+    """
+    result = await session.execute(
+        select(WaitlistEntry, queue_position())
+        .join(Client, Client.client_id == WaitlistEntry.client_id)
+        .where(Client.user_id == user.id)
+        .order_by(WaitlistEntry.starts_at.desc(), WaitlistEntry.entry_id)
+    )
+    return [
+        WaitlistEntryRead.model_validate(entry).model_copy(
+            update={"position": position if entry.status == WAITING_STATUS else None}
+        )
+        for entry, position in result.all()
+    ]
+
+
+@router.post(
+    "/waitlist/{entry_id}/cancel",
+    response_model=WaitlistEntryRead,
+)
+async def leave_waitlist(
+    entry_id: int,
+    user=Depends(current_active_user),
+    session: AsyncSession = Depends(get_session),
+) -> WaitlistEntryRead:
+    """
+    Выйти из листа ожидания.
+    """
+    # блокировка строки не дает одновременно продвинуть заявку и снять ее
+    entry = await session.get(WaitlistEntry, entry_id, with_for_update=True)
+    if entry is None:
+        raise HTTPException(
+            status_code=404,
+            detail="Заявка не найдена"
+        )
+
+    client = await session.scalar(select(Client).where(Client.user_id == user.id))
+    if client is None or entry.client_id != client.client_id:
+        raise HTTPException(
+            status_code=403,
+            detail="Нет доступа к этой заявке"
+        )
+
+    if entry.status != WAITING_STATUS:
+        raise HTTPException(
+            status_code=400,
+            detail="Заявка уже не в очереди"
+        )
+
+    entry.status = LEFT_STATUS
+    await session.commit()
+    await session.refresh(entry)
+    return WaitlistEntryRead.model_validate(entry)
@@ -2,19 +2,38 @@ from datetime import datetime
 from typing import List, Optional
 
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy import select
+from sqlalchemy import delete, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.auth.auth import fastapi_users
-from src.database import get_session
-from src.models import Booking, Client, Excursion, Guide, User
-from src.schemas.excursion import ExcursionCreate, ExcursionRead
+from src.cache import invalidate_catalog
+from src.database import get_session, SessionReleasingRoute
+from src.facets import facet_delta, facet_values
+from src.inventory import booking_is_active, sync_slot_capacity
+from src.models import Booking, Client, Excursion, Guide, ScheduleException, ScheduleRule, User
+from src.responses import FastJSONResponse, rows_json
+from src.schemas.excursion import ExcursionCreate, ExcursionRead, ExcursionSchedule
 from src.schemas.guide import GuideRead, GuideUpdate
+from src.utils import resolve_excursion_photos
 
-router = APIRouter(prefix="/api", tags=["guides"])
+router = APIRouter(prefix="/api", tags=["guides"], route_class=SessionReleasingRoute)
 
 current_active_user = fastapi_users.current_user(active=True)
 
+# Поля элемента календаря бронирований в порядке колонок запроса
+CALENDAR_FIELDS = [
+    "booking_id",
+    "excursion_id",
+    "excursion_title",
+    "date",
+    "number_of_people",
+    "status",
+    "payment_status",
+    "client_name",
+    "client_email",
+    "client_phone",
+]
+
 
 async def get_current_guide(
     user: User = Depends(current_active_user),
@@ -151,6 +170,8 @@ async def update_my_excursion(
             detail="Нет доступа к этой экскурсии"
         )
     
+    facets_before = facet_values(excursion)
+    
     # Обновляем поля экскурсии
     excursion.title = data.title
     excursion.country = data.country
@@ -161,17 +182,63 @@ async def update_my_excursion(
     excursion.price_per_person = data.price_per_person
     excursion.accepted_payment_methods = data.accepted_payment_methods
     excursion.available_slots = data.available_slots
+    resolve_excursion_photos(excursion)
+    await sync_slot_capacity(session, excursion)
     
     # Если экскурсия была одобрена, при редактировании она снова требует модерации
     if excursion.status == "approved":
         excursion.status = "pending_review"
     
+    await invalidate_catalog(session, facet_delta(facets_before, facet_values(excursion)))
     await session.commit()
     await session.refresh(excursion)
     return excursion
 
 
-@router.get("/guides/me/bookings")
+@router.put(
+    "/guides/me/excursions/{excursion_id}/schedule",
+    response_model=ExcursionSchedule,
+)
+async def replace_my_excursion_schedule(
+    excursion_id: int,
+    data: ExcursionSchedule,
+    guide: Guide = Depends(get_current_guide),
+    session: AsyncSession = Depends(get_session),
+) -> ExcursionSchedule:
+    """
+    Заменить расписание экскурсии гида целиком.
+    Пустой список правил возвращает стандартное ежедневное расписание.
+    """
+    excursion = await session.get(Excursion, excursion_id)
+    if excursion is None:
+        raise HTTPException(
+            status_code=404,
+            detail="Экскурсия не найдена"
+        )
+    
+    if excursion.guide_id != guide.guide_id:
+        raise HTTPException(
+            status_code=403,
+            detail="Нет доступа к этой экскурсии"
+        )
+    
+    await session.execute(delete(ScheduleRule).where(ScheduleRule.excursion_id == excursion_id))
+    await session.execute(delete(ScheduleException).where(ScheduleException.excursion_id == excursion_id))
+    session.add_all(
+        ScheduleRule(excursion_id=excursion_id, **rule.model_dump()) for rule in data.rules
+    )
+    session.add_all(
+        ScheduleException(excursion_id=excursion_id, **exception.model_dump()) for exception in data.exceptions
+    )
+    excursion.schedule_horizon_days = data.horizon_days
+    
+    # расписание влияет на поиск по дате; кэш расписаний сбрасывается вместе с кэшем каталога
+    await invalidate_catalog(session)
+    await session.commit()
+    return data
+
+
+@router.get("/guides/me/bookings", response_class=FastJSONResponse)
 async def get_my_bookings_calendar(
     guide: Guide = Depends(get_current_guide),
     session: AsyncSession = Depends(get_session),
@@ -181,33 +248,27 @@ async def get_my_bookings_calendar(
     Доступно только для гидов.
     """
     
-    # Получаем все бронирования экскурсий гида
+    # Получаем все бронирования экскурсий гида (только нужные колонки, без ORM-объектов)
     bookings_query = (
-        select(Booking, Excursion, Client, User)
+        select(
+            Booking.booking_id,
+            Excursion.excursion_id,
+            Excursion.title,
+            Booking.date,
+            Booking.number_of_people,
+            Booking.status,
+            Booking.payment_status,
+            User.name,
+            User.email,
+            User.phone,
+        )
         .join(Excursion, Booking.excursion_id == Excursion.excursion_id)
         .join(Client, Booking.client_id == Client.client_id)
         .join(User, Client.user_id == User.id)
         .where(Excursion.guide_id == guide.guide_id)
-        .where(Booking.status.in_(["confirmed", "pending"]))
+        .where(booking_is_active())
         .order_by(Booking.date.asc())
     )
     
     result = await session.execute(bookings_query)
-    bookings_data = result.all()
-    
-    bookings_list = []
-    for booking, excursion, client, client_user in bookings_data:
-        bookings_list.append({
-            "booking_id": booking.booking_id,
-            "excursion_id": excursion.excursion_id,
-            "excursion_title": excursion.title,
-            "date": booking.date.isoformat(),
-            "number_of_people": booking.number_of_people,
-            "status": booking.status,
-            "payment_status": booking.payment_status,
-            "client_name": client_user.name,
-            "client_email": client_user.email,
-            "client_phone": client_user.phone,
-        })
-    
-    return bookings_list
+    return FastJSONResponse(rows_json(result, CALENDAR_FIELDS))
@@ -5,6 +5,7 @@ from typing import List
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, status
 
 from src.auth.auth import fastapi_users
+from src.utils import asset_manifest
 
 router = APIRouter(prefix="/api", tags=["uploads"])
 
@@ -78,6 +79,8 @@ async def upload_excursion_photos(
                 detail=error_msg
             )
         
+        asset_manifest.add(unique_filename)
+        
         # Формируем URL (относительный путь, начинающийся с /static/excursions/)
         file_url = f"{STATIC_URL_PREFIX}/{unique_filename}"
         uploaded_urls.append(file_url)
@@ -111,4 +114,5 @@ async def delete_excursion_photo(
         )
     
     file_path.unlink()
+    asset_manifest.discard(filename)
     return {"message": "Файл успешно удален"}
@@ -0,0 +1,216 @@
+"""
+Расписания экскурсий: еженедельные правила, исключения и горизонт записи.
+
+Расписание не хранится развернутым: из правил собирается объект Schedule,
+который кэшируется на экскурсию и по запросу генерирует время начала только
+для нужного окна дат. Экскурсия без правил проводится каждый день в DEFAULT_TIMES.
+"""
+from datetime import date, datetime, time, timedelta
+from typing import Iterable, Iterator, Optional
+
+from sqlalchemy import and_, case, distinct, exists, func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
+from src.cache import CATALOG_CHANNEL, TTLCache
+from src.config import settings
+from src.models import Excursion, ScheduleException, ScheduleRule
+from src.pubsub import pg_listener
+
+# Время начала по умолчанию для экскурсий без своего расписания
+DEFAULT_TIMES = [time(9), time(12), time(15), time(18)]
+
+EXCEPTION_KINDS = ("blackout", "cancel", "extra")
+
+
+class Schedule:
+    """Скомпилированное расписание экскурсии."""
+
+    def __init__(
+        self,
+        rules: Iterable[ScheduleRule],
+        exceptions: Iterable[ScheduleException],
+        horizon_days: Optional[int],
+    ) -> None:
+        self.horizon_days = horizon_days
+        # день недели -> [(время, действует с, действует по)]
+        self.weekly: dict[int, list[tuple[time, Optional[date], Optional[date]]]] = {}
+        for rule in rules:
+            self.weekly.setdefault(rule.weekday, []).append((rule.start_time, rule.valid_from, rule.valid_until))
+        self.custom = bool(self.weekly)
+
+        self.blackout: set[date] = set()
+        self.cancelled: set[tuple[date, time]] = set()
+        self.extra: dict[date, list[time]] = {}
+        for exception in exceptions:
+            if exception.kind == "blackout":
+                self.blackout.add(exception.date)
+            elif exception.kind == "cancel":
+                self.cancelled.add((exception.date, exception.start_time))
+            else:
+                self.extra.setdefault(exception.date, []).append(exception.start_time)
+
+    def last_day(self, today: date) -> Optional[date]:
+        """Последний день, на который открыта запись (None - без ограничения)."""
+        if self.horizon_days is None:
+            return None
+        return today + timedelta(days=self.horizon_days - 1)
+
+    def times_on(self, day: date) -> list[time]:
+        """Время начала экскурсии в указанный день по возрастанию."""
+        if day in self.blackout:
+            return []
+        if self.custom:
+            times = [
+                start for start, valid_from, valid_until in self.weekly.get(day.weekday(), ())
+                if (valid_from is None or valid_from <= day) and (valid_until is None or day <= valid_until)
+            ]
+        else:
+            times = list(DEFAULT_TIMES)
+        times.extend(self.extra.get(day, ()))
+        return sorted({start for start in times if (day, start) not in self.cancelled})
+
+    def occurrences(self, start: date, end: date, today: date) -> Iterator[datetime]:
+        """
+        Начала экскурсии в полуинтервале дат [start, end), обрезанном горизонтом записи.
+
+        Генератор: разворачивается только запрошенное окно.
+        """
+        start = max(start, today)
+        last_day = self.last_day(today)
+        if last_day is not None:
+            end = min(end, last_day + timedelta(days=1))
+        day = start
+        while day < end:
+            for start_time in self.times_on(day):
+                yield datetime.combine(day, start_time)
+            day += timedelta(days=1)
+
+    def allows(self, moment: datetime, today: date) -> bool:
+        """Можно ли записаться на это время (для экскурсий без своего расписания - на любое будущее время)."""
+        day = moment.date()
+        last_day = self.last_day(today)
+        if day < today or (last_day is not None and day > last_day):
+            return False
+        if day in self.blackout:
+            return False
+        start_time = moment.time().replace(second=0, microsecond=0)
+        if not self.custom:
+            return (day, start_time) not in self.cancelled
+        return start_time in self.times_on(day)
+
+
+schedule_cache = TTLCache(
+    maxsize=settings.CATALOG_CACHE_MAX_ENTRIES,
+    ttl=settings.CATALOG_CACHE_TTL_SECONDS,
+)
+
+# изменения расписания публикуются как изменения каталога (invalidate_catalog)
+pg_listener.subscribe(CATALOG_CHANNEL, lambda payload: schedule_cache.clear())
+pg_listener.on_resync(schedule_cache.clear)
+
+
+async def get_schedule(session: AsyncSession, excursion: Excursion) -> Schedule:
+    """Расписание экскурсии из кэша или из БД (два запроса по индексу excursion_id)."""
+    schedules = await get_schedules(session, [excursion])
+    return schedules[excursion.excursion_id]
+
+
+async def get_schedules(session: AsyncSession, excursions: Iterable[Excursion]) -> dict[int, Schedule]:
+    """
+    Расписания нескольких экскурсий: из кэша, а недостающие - двумя запросами на всех.
+
+    Returns:
+        {excursion_id: Schedule}
+    """
+    schedules = {}
+    missing = {}
+    for excursion in excursions:
+        schedule = schedule_cache.get(excursion.excursion_id)
+        if schedule is None:
+            missing[excursion.excursion_id] = excursion
+        else:
+            schedules[excursion.excursion_id] = schedule
+    if not missing:
+        return schedules
+
+    rules: dict[int, list[ScheduleRule]] = {excursion_id: [] for excursion_id in missing}
+    for rule in await session.scalars(select(ScheduleRule).where(ScheduleRule.excursion_id.in_(list(missing)))):
+        rules[rule.excursion_id].append(rule)
+    exceptions: dict[int, list[ScheduleException]] = {excursion_id: [] for excursion_id in missing}
+    for exception in await session.scalars(
+        select(ScheduleException).where(ScheduleException.excursion_id.in_(list(missing)))
+    ):
+        exceptions[exception.excursion_id].append(exception)
+
+    for excursion_id, excursion in missing.items():
+        schedule = Schedule(rules[excursion_id], exceptions[excursion_id], excursion.schedule_horizon_days)
+        schedule_cache.set(excursion_id, schedule)
+        schedules[excursion_id] = schedule
+    return schedules
+
+
+def slots_on_day_expression(day: date, today: date):
+    """
+    SQL-выражение «сколько раз экскурсия проводится в день `day`» для поиска по дате.
+
+    Повторяет Schedule.times_on и горизонт записи на уровне SQL через
+    коррелированные подзапросы по правилам и исключениям экскурсии: считаются
+    различные времена начала (правила или DEFAULT_TIMES, плюс «extra»), кроме
+    отмененных «cancel». Повторы правил и исключений, «extra» на время правила
+    и «cancel» на время, которого нет в расписании, счет не меняют.
+    """
+    excursion_id = Excursion.excursion_id
+    rule = aliased(ScheduleRule)
+    extra = aliased(ScheduleException)
+    cancel = aliased(ScheduleException)
+
+    def exceptions_of(exception, kind: str):
+        return and_(
+            exception.excursion_id == excursion_id,
+            exception.date == day,
+            exception.kind == kind,
+        )
+
+    def rules_on_day(rule):
+        return and_(
+            rule.excursion_id == excursion_id,
+            rule.weekday == day.weekday(),
+            or_(rule.valid_from.is_(None), rule.valid_from <= day),
+            or_(rule.valid_until.is_(None), rule.valid_until >= day),
+        )
+
+    def cancelled(start_time):
+        return exists().where(exceptions_of(cancel, "cancel"), cancel.start_time == start_time)
+
+    def count_times(start_time, *conditions):
+        return select(func.count(distinct(start_time))).where(*conditions).scalar_subquery()
+
+    weekly = count_times(ScheduleRule.start_time, rules_on_day(ScheduleRule), ~cancelled(ScheduleRule.start_time))
+    weekly_extra = count_times(
+        extra.start_time,
+        exceptions_of(extra, "extra"),
+        ~cancelled(extra.start_time),
+        ~exists().where(rules_on_day(rule), rule.start_time == extra.start_time),
+    )
+    default = len(DEFAULT_TIMES) - count_times(
+        cancel.start_time, exceptions_of(cancel, "cancel"), cancel.start_time.in_(DEFAULT_TIMES)
+    )
+    default_extra = count_times(
+        extra.start_time,
+        exceptions_of(extra, "extra"),
+        ~cancelled(extra.start_time),
+        extra.start_time.not_in(DEFAULT_TIMES),
+    )
+    has_rules = exists().where(ScheduleRule.excursion_id == excursion_id)
+    beyond_horizon = and_(
+        Excursion.schedule_horizon_days.is_not(None),
+        Excursion.schedule_horizon_days <= (day - today).days,
+    )
+
+    return case(
+        (beyond_horizon, 0),
+        (exists().where(exceptions_of(ScheduleException, "blackout")), 0),
+        (has_rules, weekly + weekly_extra),
+        else_=default + default_extra,
+    )
@@ -1,7 +1,7 @@
-from datetime import datetime
-from typing import List, Optional
+from datetime import date, datetime, time
+from typing import List, Literal, Optional
 
-from pydantic import BaseModel, Field, model_validator
+from pydantic import AliasChoices, BaseModel, Field, model_validator
 
 
 class ExcursionBase(BaseModel):
@@ -23,17 +23,19 @@ class ExcursionCreate(ExcursionBase):
 class ExcursionRead(ExcursionBase):
     excursion_id: int
     status: str
-
-    @model_validator(mode='after')
-    def enrich_photos(self):
-        """Автоматически подставляет фотки для экскурсий с Москвой из assets/excursions"""
-        from src.utils import enrich_excursion_photos
-        
-        # Всегда проверяем возможность обогащения фоток
-        enriched_photos = enrich_excursion_photos(self.photos, self.title, self.city)
-        self.photos = enriched_photos
-        
-        return self
+    rating: float = 0.0
+    # фотки отдаются уже обогащенными: значение вычисляется при записи экскурсии
+    photos: Optional[str] = Field(
+        default=None,
+        validation_alias=AliasChoices("resolved_photos", "photos"),
+    )
+    snippet: Optional[str] = Field(
+        default=None,
+        description=(
+            "Фрагмент описания с подсвеченными совпадениями (только при полнотекстовом поиске). "
+            "HTML: текст экранирован, единственная разметка - теги <b>...</b> вокруг совпадений."
+        ),
+    )
 
     class Config:
         from_attributes = True
@@ -47,6 +49,24 @@ class ExcursionSearchFilters(BaseModel):
     has_children: bool = False
 
 
+class FacetCount(BaseModel):
+    value: str
+    count: int
+
+
+class PriceBucketCount(BaseModel):
+    min_price: float
+    max_price: Optional[float] = None
+    count: int
+
+
+class ExcursionFacets(BaseModel):
+    countries: List[FacetCount]
+    cities: List[FacetCount]
+    difficulties: List[FacetCount]
+    price_buckets: List[PriceBucketCount]
+
+
 class BookingBase(BaseModel):
     excursion_id: int
     date: datetime
@@ -55,12 +75,15 @@ class BookingBase(BaseModel):
 
 class BookingCreate(BookingBase):
     has_children: bool = False
+    # временная бронь: места держатся BOOKING_HOLD_TTL_SECONDS до подтверждения
+    hold: bool = False
 
 
 class BookingRead(BookingBase):
     booking_id: int
     status: str
     payment_status: str
+    hold_expires_at: Optional[datetime] = None
 
     class Config:
         from_attributes = True
@@ -74,23 +97,43 @@ class BookingWithExcursion(BookingRead):
     price_per_person: float
     total_amount: float
 
-    @model_validator(mode='after')
-    def enrich_excursion_photo(self):
-        """Автоматически подставляет фотки для экскурсий с Москвой из assets/excursions"""
-        from src.utils import enrich_excursion_photos
-        
-        # Всегда проверяем возможность обогащения фоток
-        enriched_photo = enrich_excursion_photos(self.excursion_photo, self.excursion_title, self.excursion_city)
-        self.excursion_photo = enriched_photo
-        
-        return self
-
 
 class BookingResponse(BaseModel):
     booking: BookingRead
     message: str
 
 
+class WaitlistCreate(BookingBase):
+    pass
+
+
+class WaitlistEntryRead(BaseModel):
+    entry_id: int
+    excursion_id: int
+    starts_at: datetime
+    number_of_people: int
+    # waiting, promoted или cancelled
+    status: str
+    created_at: datetime
+    # бронирование, полученное при продвижении
+    booking_id: Optional[int] = None
+    # место в очереди для ждущих заявок (1 - следующая)
+    position: Optional[int] = None
+
+    class Config:
+        from_attributes = True
+
+
+class BookingBatchCreate(BaseModel):
+    # позиции бронируются вместе: если хотя бы одна не проходит, не создается ни одна
+    items: List[BookingCreate] = Field(min_length=1, max_length=50)
+
+
+class BookingBatchResponse(BaseModel):
+    bookings: List[BookingRead]
+    message: str
+
+
 class AvailableTimeSlot(BaseModel):
     date: str
     time: str
@@ -103,3 +146,55 @@ class AvailableDatesResponse(BaseModel):
     available_slots: Optional[int]
     time_slots: List[AvailableTimeSlot]
 
+
+class ScheduleRuleSchema(BaseModel):
+    # 0 - понедельник, 6 - воскресенье
+    weekday: int = Field(ge=0, le=6)
+    start_time: time
+    valid_from: Optional[date] = None
+    valid_until: Optional[date] = None
+
+    class Config:
+        from_attributes = True
+
+
+class ScheduleExceptionSchema(BaseModel):
+    date: date
+    # blackout - день закрыт, cancel - отменено время start_time, extra - добавлено время start_time
+    kind: Literal["blackout", "cancel", "extra"]
+    start_time: Optional[time] = None
+
+    class Config:
+        from_attributes = True
+
+    @model_validator(mode="after")
+    def check_start_time(self):
+        if self.kind != "blackout" and self.start_time is None:
+            raise ValueError("Для исключений cancel и extra нужно указать start_time")
+        return self
+
+
+class ExcursionSchedule(BaseModel):
+    # на сколько дней вперед открыта запись; None - без ограничения
+    horizon_days: Optional[int] = Field(default=None, ge=1, le=730)
+    rules: List[ScheduleRuleSchema] = []
+    exceptions: List[ScheduleExceptionSchema] = []
+
+
+class AvailabilityRequest(BaseModel):
+    excursion_ids: List[int] = Field(min_length=1, max_length=100)
+    date_from: Optional[date] = None
+    days: int = Field(default=30, ge=1, le=92)
+    people: int = Field(default=1, ge=1)
+
+
+class ExcursionAvailability(BaseModel):
+    excursion_id: int
+    # количество слотов со свободными местами по дням окна: free_slots[i] - на date_from + i дней
+    free_slots: List[int]
+
+
+class AvailabilityResponse(BaseModel):
+    date_from: date
+    days: int
+    excursions: List[ExcursionAvailability]
@@ -0,0 +1,116 @@
+"""
+Утилиты для текстового поиска экскурсий.
+
+В PostgreSQL используется расширение pg_trgm (GIN-индексы по title/city/country)
+и полнотекстовый поиск по колонке search_vector (конфигурация russian),
+в остальных СУБД (SQLite в тестах) - обычный ILIKE с упрощенным ранжированием.
+"""
+from sqlalchemy import Float, case, func, literal, or_
+from sqlalchemy.sql.elements import ColumnElement
+
+
+def text_match(column, value: str, fuzzy: bool, postgres: bool) -> ColumnElement[bool]:
+    """
+    Условие совпадения колонки с поисковой строкой.
+
+    Подстрочный ILIKE в PostgreSQL обслуживается trgm-индексом.
+    В нечетком режиме дополнительно находим строки с опечатками через
+    оператор `%>` (word_similarity выше порога pg_trgm.word_similarity_threshold),
+    который тоже использует GIN-индекс.
+
+    Args:
+        column: Колонка модели Excursion
+        value: Поисковая строка
+        fuzzy: Включен ли нечеткий режим
+        postgres: Работаем ли с PostgreSQL
+
+    Returns:
+        SQL-условие для WHERE
+    """
+    condition = column.ilike(f"%{value}%")
+    if fuzzy and postgres:
+        condition = or_(condition, column.op("%>")(value))
+    return condition
+
+
+def similarity_score(matches: list[tuple], postgres: bool) -> ColumnElement[float]:
+    """
+    Выражение для ранжирования результатов по сходству.
+
+    Args:
+        matches: Список пар (колонка, поисковая строка)
+        postgres: Работаем ли с PostgreSQL
+
+    Returns:
+        SQL-выражение: чем больше значение, тем ближе совпадение
+    """
+    if not matches:
+        return literal(0.0, Float)
+
+    if postgres:
+        scores = [func.word_similarity(value, column, type_=Float) for column, value in matches]
+    else:
+        # Запасной вариант без pg_trgm: точное совпадение выше подстрочного
+        scores = [case((column == value, 1.0), else_=0.5) for column, value in matches]
+
+    score = scores[0]
+    for item in scores[1:]:
+        score = score + item
+    return score
+
+
+# Конфигурация полнотекстового поиска PostgreSQL (морфология русского языка)
+FTS_CONFIG = "russian"
+
+# Параметры ts_headline для подсветки найденных слов в описании
+HEADLINE_OPTIONS = "StartSel=<b>, StopSel=</b>, MaxWords=35, MinWords=15, MaxFragments=2"
+
+# Замены для экранирования HTML (& - первым, чтобы не экранировать сущности повторно)
+HTML_ESCAPES = [("&", "&amp;"), ("<", "&lt;"), (">", "&gt;"), ('"', "&quot;"), ("'", "&#x27;")]
+
+
+def fulltext_query(q: str):
+    """tsquery из пользовательской строки в синтаксисе веб-поиска («слово -исключение "фраза"»)."""
+    return func.websearch_to_tsquery(FTS_CONFIG, q)
+
+
+def fulltext_match(search_vector, q: str, postgres: bool, fallback_columns: list) -> ColumnElement[bool]:
+    """
+    Условие полнотекстового совпадения по колонке tsvector.
+
+    Args:
+        search_vector: Колонка tsvector (обслуживается GIN-индексом)
+        q: Поисковая строка
+        postgres: Работаем ли с PostgreSQL
+        fallback_columns: Текстовые колонки для поиска ILIKE без PostgreSQL
+
+    Returns:
+        SQL-условие для WHERE
+    """
+    if postgres:
+        return search_vector.op("@@")(fulltext_query(q))
+    return or_(*(column.ilike(f"%{q}%") for column in fallback_columns))
+
+
+def fulltext_rank(search_vector, q: str, postgres: bool) -> ColumnElement[float]:
+    """Ранг документа по запросу (ts_rank_cd), вычисляется в БД."""
+    if postgres:
+        return func.ts_rank_cd(search_vector, fulltext_query(q), type_=Float)
+    return literal(0.0, Float)
+
+
+def html_escape(text) -> ColumnElement[str]:
+    """Текст с экранированными символами HTML (как html.escape), вычисляется в БД."""
+    for char, entity in HTML_ESCAPES:
+        text = func.replace(text, char, entity)
+    return text
+
+
+def fulltext_snippet(document, q: str) -> ColumnElement[str]:
+    """
+    Фрагмент текста с подсвеченными совпадениями (ts_headline, только PostgreSQL).
+
+    Текст пишут гиды, поэтому он экранируется до ts_headline: в результате
+    HTML-разметка - только теги <b>...</b> вокруг совпадений.
+    """
+    return func.ts_headline(FTS_CONFIG, html_escape(document), fulltext_query(q), HEADLINE_OPTIONS)
@@ -1,13 +1,86 @@
 """
 Утилиты для работы с фотографиями экскурсий
 """
+import logging
+import os
 from pathlib import Path
+from typing import Awaitable, Callable
+
+log = logging.getLogger(__name__)
 
 # Путь к папке с фотографиями экскурсий
 ASSETS_DIR = Path(__file__).parent.parent / "assets" / "excursions"
 STATIC_URL_PREFIX = "/static/excursions"
 
 
+class AssetManifest:
+    """
+    Индекс имен файлов в папке assets/excursions.
+
+    Позволяет проверять наличие фотографии за O(1) в памяти вместо
+    обращения к файловой системе для каждой сериализуемой экскурсии.
+    Строится при первом обращении (или на старте приложения) и
+    обновляется при загрузке/удалении файлов и по событиям файлового наблюдателя.
+    """
+
+    def __init__(self, directory: Path) -> None:
+        self.directory = directory
+        self._names: set[str] | None = None
+
+    def refresh(self) -> None:
+        """Перечитать содержимое папки."""
+        try:
+            with os.scandir(self.directory) as entries:
+                self._names = {entry.name for entry in entries if entry.is_file()}
+        except FileNotFoundError:
+            self._names = set()
+
+    def add(self, filename: str) -> None:
+        if self._names is None:
+            self.refresh()
+        self._names.add(filename)
+
+    def discard(self, filename: str) -> None:
+        if self._names is None:
+            self.refresh()
+        self._names.discard(filename)
+
+    def __contains__(self, filename: str) -> bool:
+        if self._names is None:
+            self.refresh()
+        return filename in self._names
+
+    def __len__(self) -> int:
+        if self._names is None:
+            self.refresh()
+        return len(self._names)
+
+
+asset_manifest = AssetManifest(ASSETS_DIR)
+
+
+async def watch_assets(on_change: Callable[[set[str]], Awaitable[None]] | None = None) -> None:
+    """
+    Следить за папкой assets/excursions и обновлять индекс при изменениях.
+
+    Нужна для файлов, положенных в папку в обход API (деплой, ручное копирование).
+
+    Args:
+        on_change: Дополнительное действие после обновления индекса,
+            получает имена измененных файлов
+    """
+    from watchfiles import awatch
+
+    async for changes in awatch(ASSETS_DIR):
+        asset_manifest.refresh()
+        log.info("Индекс фотографий обновлен: %d файлов", len(asset_manifest))
+        if on_change is not None:
+            try:
+                await on_change({Path(path).name for _, path in changes})
+            except Exception:
+                log.exception("Ошибка обработки изменений в assets/excursions")
+
+
 def get_excursion_photo_path(title: str, city: str) -> str | None:
     """
     Получить путь к фотографии экскурсии из папки assets/excursions.
@@ -25,10 +98,9 @@ def get_excursion_photo_path(title: str, city: str) -> str | None:
     """
     # Формируем имя файла: title + ".jpg"
     filename = f"{title}.jpg"
-    file_path = ASSETS_DIR / filename
     
-    # Проверяем существование файла
-    if file_path.exists():
+    # Проверяем существование файла по индексу, без обращения к диску
+    if filename in asset_manifest:
         return f"{STATIC_URL_PREFIX}/{filename}"
     
     return None
@@ -116,3 +188,52 @@ def enrich_excursion_photos(photos: str | None, title: str, city: str) -> str |
     
     # Если ничего не нашли, возвращаем исходное значение (может быть None или пустая строка)
     return photos
+
+
+def resolve_excursion_photos(excursion) -> None:
+    """
+    Вычислить и сохранить в строке итоговые фотки экскурсии.
+
+    Вызывается при создании и изменении экскурсии, чтобы при чтении
+    не выполнять подстановку для каждой записи.
+
+    Args:
+        excursion: Объект модели Excursion
+    """
+    excursion.resolved_photos = enrich_excursion_photos(
+        excursion.photos, excursion.title, excursion.city
+    )
+
+
+async def refresh_resolved_photos(session, titles: set[str] | None = None) -> int:
+    """
+    Пересчитать resolved_photos у сохраненных экскурсий.
+
+    Нужна после изменения содержимого assets/excursions и для заполнения
+    существующих строк. Изменения не фиксируются, commit делает вызывающий код.
+
+    Args:
+        session: AsyncSession
+        titles: Пересчитать только экскурсии с этими названиями (None - все)
+
+    Returns:
+        Количество экскурсий, у которых изменилось значение
+    """
+    from sqlalchemy import select
+
+    from src.models import Excursion
+
+    query = select(Excursion)
+    if titles is not None:
+        if not titles:
+            return 0
+        query = query.where(Excursion.title.in_(titles))
+
+    changed = 0
+    result = await session.stream_scalars(query.execution_options(yield_per=500))
+    async for excursion in result:
+        resolved = enrich_excursion_photos(excursion.photos, excursion.title, excursion.city)
+        if resolved != excursion.resolved_photos:
+            excursion.resolved_photos = resolved
+            changed += 1
+    return changed
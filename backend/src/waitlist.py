@@ -0,0 +1,169 @@
+"""
+Лист ожидания слотов экскурсий.
+
+Когда в слоте нет мест, клиент встает в очередь (таблица waitlist_entries).
+Освободившиеся при отмене или снятии временной брони места в той же транзакции
+отдаются заявкам из головы очереди строго по порядку: первая заявка, которой
+мест не хватает, останавливает продвижение. Продвинутый клиент получает
+временную бронь на WAITLIST_OFFER_TTL_SECONDS и уведомление; неподтвержденная
+бронь снимается фоновой задачей (src.holds), и места уходят следующим в очереди.
+
+Из очереди читается не больше заявок, чем освободилось мест, по частичному
+индексу ix_waitlist_entries_slot_queue, поэтому длина очереди на стоимость
+продвижения не влияет.
+"""
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.availability_stream import publish_seats
+from src.config import settings
+from src.models import (
+    Booking,
+    Client,
+    Excursion,
+    ExcursionSlot,
+    Notification,
+    Payment,
+    User,
+    WaitlistEntry,
+    utcnow,
+)
+
+WAITING_STATUS = "waiting"
+PROMOTED_STATUS = "promoted"
+LEFT_STATUS = "cancelled"
+
+# продвинутый клиент получает временную бронь (см. src.holds)
+OFFER_BOOKING_STATUS = "pending"
+NOTIFICATION_TYPE = "waitlist_promoted"
+
+
+def queue_position():
+    """SQL-выражение «место заявки в очереди» (1 - следующая на продвижение)."""
+    ahead = WaitlistEntry.__table__.alias("ahead")
+    return (
+        select(func.count() + 1)
+        .where(
+            ahead.c.excursion_id == WaitlistEntry.excursion_id,
+            ahead.c.starts_at == WaitlistEntry.starts_at,
+            ahead.c.status == WAITING_STATUS,
+            ahead.c.entry_id < WaitlistEntry.entry_id,
+        )
+        .scalar_subquery()
+    )
+
+
+async def promote_waitlist(session: AsyncSession, excursion_id: int, starts_at: datetime) -> int:
+    """
+    Отдать свободные места слота заявкам из головы очереди.
+
+    Вызывается в транзакции, которая вернула места в слот. Строка слота
+    блокируется, поэтому одновременные отмены продвигают очередь по очереди,
+    а новые бронирования не могут занять места раньше ждущих.
+    Бронирования, оплаты и уведомления создаются пакетными INSERT.
+
+    Returns:
+        Количество продвинутых заявок
+    """
+    slot = (await session.execute(
+        select(ExcursionSlot.capacity, ExcursionSlot.booked)
+        .where(
+            ExcursionSlot.excursion_id == excursion_id,
+            ExcursionSlot.starts_at == starts_at,
+        )
+        .with_for_update()
+    )).one_or_none()
+    if slot is None:
+        return 0
+    capacity, booked = slot
+    free = None if capacity is None else capacity - booked
+    if free is not None and free <= 0:
+        return 0
+
+    # каждой заявке нужно хотя бы одно место, поэтому больше `free` заявок не пройдет
+    head = (await session.execute(
+        select(WaitlistEntry.entry_id, WaitlistEntry.client_id, WaitlistEntry.number_of_people, User.email)
+        .join(Client, Client.client_id == WaitlistEntry.client_id)
+        .join(User, User.id == Client.user_id)
+        .where(
+            WaitlistEntry.excursion_id == excursion_id,
+            WaitlistEntry.starts_at == starts_at,
+            WaitlistEntry.status == WAITING_STATUS,
+        )
+        .order_by(WaitlistEntry.entry_id)
+        .limit(free if free is not None else settings.WAITLIST_PROMOTE_BATCH_SIZE)
+        .with_for_update(of=WaitlistEntry)
+    )).all()
+
+    promoted = []
+    for entry in head:
+        if free is not None:
+            if entry.number_of_people > free:
+                break
+            free -= entry.number_of_people
+        promoted.append(entry)
+    if not promoted:
+        return 0
+
+    title, price = (await session.execute(
+        select(Excursion.title, Excursion.price_per_person).where(Excursion.excursion_id == excursion_id)
+    )).one()
+    now = utcnow()
+    deadline = now + timedelta(seconds=settings.WAITLIST_OFFER_TTL_SECONDS)
+
+    payment_ids = (await session.scalars(
+        insert(Payment).returning(Payment.id, sort_by_parameter_order=True),
+        [{"amount": price * entry.number_of_people, "payment_method": "online"} for entry in promoted],
+    )).all()
+    booking_ids = (await session.scalars(
+        insert(Booking).returning(Booking.booking_id, sort_by_parameter_order=True),
+        [
+            {
+                "date": starts_at,
+                "number_of_people": entry.number_of_people,
+                "status": OFFER_BOOKING_STATUS,
+                "payment_status": "pending",
+                "excursion_id": excursion_id,
+                "client_id": entry.client_id,
+                "payment_id": payment_id,
+                "hold_expires_at": deadline,
+            }
+            for entry, payment_id in zip(promoted, payment_ids)
+        ],
+    )).all()
+    seats = sum(entry.number_of_people for entry in promoted)
+    booked = await session.scalar(
+        update(ExcursionSlot)
+        .where(
+            ExcursionSlot.excursion_id == excursion_id,
+            ExcursionSlot.starts_at == starts_at,
+        )
+        .values(booked=ExcursionSlot.booked + seats)
+        .returning(ExcursionSlot.booked)
+    )
+    await publish_seats(session, excursion_id, starts_at, seats, booked, capacity)
+    await session.execute(
+        update(WaitlistEntry),
+        [
+            {"entry_id": entry.entry_id, "status": PROMOTED_STATUS, "booking_id": booking_id}
+            for entry, booking_id in zip(promoted, booking_ids)
+        ],
+    )
+    message = (
+        f"Освободились места на экскурсию «{title}» {starts_at:%d.%m.%Y %H:%M}. "
+        f"Бронь ждет подтверждения до {deadline:%d.%m.%Y %H:%M} UTC."
+    )
+    await session.execute(insert(Notification), [
+        {
+            "booking_id": booking_id,
+            "client_id": entry.client_id,
+            "receiver": entry.email,
+            "message": message,
+            "date": now,
+            "type": NOTIFICATION_TYPE,
+        }
+        for entry, booking_id in zip(promoted, booking_ids)
+    ])
+    return len(promoted)
@@ -4,15 +4,32 @@ from httpx import AsyncClient, ASGITransport
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.pool import StaticPool
 
+from src.cache import catalog_cache
+from src.facets import facet_index
+from src.idempotency import idempotency_cache
 from src.main import app
 from src.database import get_session
 from src.models import Base
+from src.schedule import schedule_cache
 
 # Настраиваем anyio бэкенд
 @pytest.fixture
 def anyio_backend():
     return 'asyncio'
 
+@pytest.fixture(autouse=True)
+def clear_catalog_cache():
+    """Сбрасываем кэши каталога, фасетов, расписаний и ключей идемпотентности между тестами."""
+    catalog_cache.clear()
+    facet_index.reset()
+    schedule_cache.clear()
+    idempotency_cache.clear()
+    yield
+    catalog_cache.clear()
+    facet_index.reset()
+    schedule_cache.clear()
+    idempotency_cache.clear()
+
 # Тестовая база данных (SQLite в памяти)
 TEST_DATABASE_URL = "sqlite+aiosqlite:///:memory:"
 
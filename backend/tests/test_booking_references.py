@@ -0,0 +1,62 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import delete, select
+
+from src.models import Booking, Client, Excursion, Guide, Notification, Payment, WaitlistEntry
+from src.partitions import clear_orphan_booking_references
+
+
+@pytest.mark.anyio
+async def test_orphan_booking_references_are_cleared(session, test_user):
+    """Тест: ссылки уведомлений и листа ожидания на удаленное бронирование обнуляются, живые остаются."""
+    guide = Guide(user_id=test_user.id)
+    client = Client(user_id=test_user.id)
+    payment = Payment(amount=1000, payment_method="online")
+    session.add_all([guide, client, payment])
+    await session.flush()
+    excursion = Excursion(
+        title="Набережные",
+        country="Россия",
+        city="Казань",
+        difficulty="easy",
+        price_per_person=1000,
+        status="approved",
+        guide_id=guide.guide_id,
+    )
+    session.add(excursion)
+    await session.flush()
+    starts_at = datetime(2030, 1, 7, 10)
+    bookings = [
+        Booking(
+            date=starts_at,
+            number_of_people=1,
+            status="pending",
+            excursion_id=excursion.excursion_id,
+            client_id=client.client_id,
+            payment_id=payment.id,
+        )
+        for _ in range(2)
+    ]
+    session.add_all(bookings)
+    await session.flush()
+    kept, deleted = (booking.booking_id for booking in bookings)
+    for booking_id in (kept, deleted):
+        session.add(Notification(
+            booking_id=booking_id, receiver="test@example.com", message="Места освободились",
+            date=starts_at, type="waitlist_offer", client_id=client.client_id,
+        ))
+        session.add(WaitlistEntry(
+            excursion_id=excursion.excursion_id, starts_at=starts_at, client_id=client.client_id,
+            number_of_people=1, status="promoted", booking_id=booking_id,
+        ))
+    await session.commit()
+
+    await session.execute(delete(Booking).where(Booking.booking_id == deleted))
+    await session.commit()
+
+    assert await clear_orphan_booking_references(session) == 2
+    await session.commit()
+    assert (await session.scalars(select(Notification.booking_id).order_by(Notification.notification_id))).all() == [kept, None]
+    assert (await session.scalars(select(WaitlistEntry.booking_id).order_by(WaitlistEntry.entry_id))).all() == [kept, None]
+    assert await clear_orphan_booking_references(session) == 0
@@ -0,0 +1,578 @@
+import json
+from datetime import datetime, time, timedelta
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import event, func, insert, select
+
+from src import idempotency
+from src.availability_stream import AvailabilityHub, availability_hub, sse_events
+from src.config import settings
+from src.holds import expire_holds
+from src.idempotency import idempotency_cache
+from src.models import (
+    Booking,
+    Client,
+    Excursion,
+    ExcursionSlot,
+    Guide,
+    IdempotencyKey,
+    Notification,
+    ScheduleRule,
+    User,
+    WaitlistEntry,
+    utcnow,
+)
+
+
+@pytest.fixture(scope="function")
+async def excursion(session, test_user):
+    guide = Guide(user_id=test_user.id)
+    session.add(guide)
+    await session.flush()
+
+    excursion = Excursion(
+        title="Крыши Петербурга",
+        country="Россия",
+        city="Санкт-Петербург",
+        difficulty="medium",
+        price_per_person=2500,
+        status="approved",
+        available_slots=3,
+        guide_id=guide.guide_id,
+    )
+    session.add(excursion)
+    await session.commit()
+    return excursion
+
+
+def slot_time(days: int = 5, hour: int = 12) -> datetime:
+    day = datetime.now().date() + timedelta(days=days)
+    return datetime.combine(day, datetime.min.time()).replace(hour=hour)
+
+
+async def book(client, auth_headers, excursion, people, when=None, key=None):
+    headers = dict(auth_headers)
+    if key is not None:
+        headers["Idempotency-Key"] = key
+    return await client.post(
+        "/api/bookings",
+        json={
+            "excursion_id": excursion.excursion_id,
+            "date": (when or slot_time()).isoformat(),
+            "number_of_people": people,
+        },
+        headers=headers,
+    )
+
+
+@pytest.mark.anyio
+async def test_booking_updates_slot_counter(client: AsyncClient, session, auth_headers, excursion):
+    """Тест: бронирование увеличивает счетчик слота, лишние места не продаются."""
+    response = await book(client, auth_headers, excursion, 2)
+    assert response.status_code == 201
+
+    # время начала сравнивается с точностью до минуты: секунды не создают новый слот
+    response = await book(client, auth_headers, excursion, 2, when=slot_time().replace(second=30))
+    assert response.status_code == 400
+
+    slot = await session.scalar(select(ExcursionSlot))
+    assert (slot.starts_at, slot.capacity, slot.booked) == (slot_time(), 3, 2)
+
+
+@pytest.mark.anyio
+async def test_half_hour_slot_sold_out_in_calendar(client: AsyncClient, session, auth_headers, excursion):
+    """Тест: слот расписания не в ровный час (09:30) после продажи всех мест показан занятым."""
+    starts_at = slot_time(hour=9).replace(minute=30)
+    session.add(ScheduleRule(excursion_id=excursion.excursion_id, weekday=starts_at.weekday(), start_time=time(9, 30)))
+    await session.commit()
+
+    assert (await book(client, auth_headers, excursion, 3, when=starts_at)).status_code == 201
+    assert (await book(client, auth_headers, excursion, 1, when=starts_at)).status_code == 400
+
+    response = await client.get(
+        f"/api/excursions/{excursion.excursion_id}/available-dates",
+        params={"date_from": starts_at.date().isoformat(), "days": 1},
+    )
+    assert response.json()["time_slots"] == [
+        {"date": starts_at.date().isoformat(), "time": "09:30", "available": False, "available_slots": 0},
+    ]
+
+
+@pytest.mark.anyio
+async def test_cancel_releases_seats(client: AsyncClient, session, auth_headers, excursion):
+    """Тест: отмена возвращает места, доступные даты читаются из слотов."""
+    response = await book(client, auth_headers, excursion, 3)
+    booking_id = response.json()["booking"]["booking_id"]
+
+    response = await client.get(f"/api/excursions/{excursion.excursion_id}/available-dates")
+    slot = next(
+        item for item in response.json()["time_slots"]
+        if item["date"] == slot_time().date().isoformat() and item["time"] == "12:00"
+    )
+    assert slot == {"date": slot_time().date().isoformat(), "time": "12:00", "available": False, "available_slots": 0}
+
+    response = await client.post(f"/api/bookings/{booking_id}/cancel", headers=auth_headers)
+    assert response.status_code == 200
+
+    response = await book(client, auth_headers, excursion, 3)
+    assert response.status_code == 201
+
+
+@pytest.mark.anyio
+async def test_batch_availability(client: AsyncClient, auth_headers, excursion):
+    """Тест: доступность нескольких экскурсий одним запросом, заполненный слот не считается."""
+    await book(client, auth_headers, excursion, 3)
+
+    response = await client.post(
+        "/api/excursions/availability",
+        json={
+            "excursion_ids": [excursion.excursion_id, 999],
+            "date_from": slot_time().date().isoformat(),
+            "days": 2,
+        },
+    )
+
+    assert response.status_code == 200
+    assert response.json() == {
+        "date_from": slot_time().date().isoformat(),
+        "days": 2,
+        "excursions": [{"excursion_id": excursion.excursion_id, "free_slots": [3, 4]}],
+    }
+
+
+@pytest.mark.anyio
+async def test_batch_availability_half_hour_slot(client: AsyncClient, session, auth_headers, excursion):
+    """Тест: распроданный слот не в ровный час (09:30) не считается свободным в пакетной доступности."""
+    starts_at = slot_time(hour=9).replace(minute=30)
+    session.add_all([
+        ScheduleRule(excursion_id=excursion.excursion_id, weekday=starts_at.weekday(), start_time=time(9, 30)),
+        ScheduleRule(excursion_id=excursion.excursion_id, weekday=starts_at.weekday(), start_time=time(14)),
+    ])
+    await session.commit()
+    assert (await book(client, auth_headers, excursion, 3, when=starts_at)).status_code == 201
+
+    response = await client.post(
+        "/api/excursions/availability",
+        json={"excursion_ids": [excursion.excursion_id], "date_from": starts_at.date().isoformat(), "days": 1},
+    )
+    assert response.json()["excursions"] == [{"excursion_id": excursion.excursion_id, "free_slots": [1]}]
+
+
+@pytest.mark.anyio
+async def test_expired_hold_releases_seats(client: AsyncClient, session, auth_headers, excursion):
+    """Тест: просроченная временная бронь снимается и возвращает места, подтвердить ее нельзя."""
+    response = await client.post(
+        "/api/bookings",
+        json={
+            "excursion_id": excursion.excursion_id,
+            "date": slot_time().isoformat(),
+            "number_of_people": 3,
+            "hold": True,
+        },
+        headers=auth_headers,
+    )
+    booking = response.json()["booking"]
+    assert booking["status"] == "pending"
+    assert booking["hold_expires_at"] is not None
+
+    # места заняты, пока бронь действует
+    assert (await book(client, auth_headers, excursion, 1)).status_code == 400
+
+    held = await session.get(Booking, booking["booking_id"])
+    held.hold_expires_at = utcnow() - timedelta(hours=1)
+    await session.commit()
+
+    assert await expire_holds(session, batch_size=100) == 1
+    assert held.status == "expired"
+
+    response = await client.post(f"/api/bookings/{booking['booking_id']}/confirm", headers=auth_headers)
+    assert response.status_code == 400
+    assert (await book(client, auth_headers, excursion, 3)).status_code == 201
+
+
+@pytest.mark.anyio
+async def test_expired_holds_released_per_slot(client: AsyncClient, engine, session, auth_headers, excursion):
+    """Тест: пачка просроченных броней одного слота снимается одним UPDATE броней и одним UPDATE слота."""
+    for people in (1, 2):
+        response = await client.post(
+            "/api/bookings",
+            json={
+                "excursion_id": excursion.excursion_id,
+                "date": slot_time().isoformat(),
+                "number_of_people": people,
+                "hold": True,
+            },
+            headers=auth_headers,
+        )
+        assert response.status_code == 201
+    for held in (await session.scalars(select(Booking))).all():
+        held.hold_expires_at = utcnow() - timedelta(hours=1)
+    await session.commit()
+
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("UPDATE"):
+            statements.append(statement.split()[1])
+
+    event.listen(engine.sync_engine, "before_cursor_execute", capture)
+    try:
+        assert await expire_holds(session, batch_size=100) == 2
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", capture)
+
+    assert sorted(statements) == ["bookings", "excursion_slots"]
+    slot = await session.scalar(select(ExcursionSlot))
+    assert slot.booked == 0
+    statuses = (await session.scalars(select(Booking.status))).all()
+    assert statuses == ["expired", "expired"]
+
+
+@pytest.mark.anyio
+async def test_confirm_hold(client: AsyncClient, auth_headers, excursion):
+    """Тест: временная бронь подтверждается до истечения срока."""
+    response = await client.post(
+        "/api/bookings",
+        json={
+            "excursion_id": excursion.excursion_id,
+            "date": slot_time().isoformat(),
+            "number_of_people": 1,
+            "hold": True,
+        },
+        headers=auth_headers,
+    )
+    booking_id = response.json()["booking"]["booking_id"]
+
+    response = await client.post(f"/api/bookings/{booking_id}/confirm", headers=auth_headers)
+
+    assert response.status_code == 200
+    assert response.json()["booking"]["status"] == "confirmed"
+    assert response.json()["booking"]["hold_expires_at"] is None
+
+
+@pytest.mark.anyio
+async def test_idempotent_booking_replay(client: AsyncClient, session, auth_headers, excursion):
+    """Тест: повтор с тем же Idempotency-Key возвращает сохраненный ответ без второго бронирования."""
+    first = await book(client, auth_headers, excursion, 1, key="order-1")
+    assert first.status_code == 201
+
+    repeat = await book(client, auth_headers, excursion, 1, key="order-1")
+    assert repeat.status_code == 201
+    assert repeat.headers["Idempotent-Replayed"] == "true"
+    assert repeat.json() == first.json()
+
+    # без кэша процесса ответ читается из таблицы
+    idempotency_cache.clear()
+    repeat = await book(client, auth_headers, excursion, 1, key="order-1")
+    assert repeat.json() == first.json()
+
+    response = await book(client, auth_headers, excursion, 2, key="order-1")
+    assert response.status_code == 422
+
+    assert await session.scalar(select(func.count()).select_from(Booking)) == 1
+    slot = await session.scalar(select(ExcursionSlot))
+    assert slot.booked == 1
+
+
+@pytest.mark.anyio
+async def test_failed_request_does_not_consume_key(client: AsyncClient, session, auth_headers, excursion):
+    """Тест: ключ запроса, завершившегося ошибкой, можно использовать повторно."""
+    response = await book(client, auth_headers, excursion, 3)
+    booking_id = response.json()["booking"]["booking_id"]
+
+    response = await book(client, auth_headers, excursion, 1, key="retry-me")
+    assert response.status_code == 400
+    # в приложении сессия запроса закрывается с откатом, в тестах сессия общая
+    await session.rollback()
+    await session.refresh(excursion)
+
+    await client.post(f"/api/bookings/{booking_id}/cancel", headers=auth_headers)
+    response = await book(client, auth_headers, excursion, 1, key="retry-me")
+    assert response.status_code == 201
+    assert "Idempotent-Replayed" not in response.headers
+
+
+@pytest.mark.anyio
+async def test_expired_key_is_not_replayed(
+    client: AsyncClient, session, test_user, auth_headers, excursion, monkeypatch
+):
+    """Тест: просроченный, но еще не удаленный ключ не повторяет ответ, запрос выполняется заново."""
+    first = await book(client, auth_headers, excursion, 1, key="order-1")
+    assert first.status_code == 201
+
+    later = utcnow() + timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL_SECONDS + 60)
+    monkeypatch.setattr(idempotency, "utcnow", lambda: later)
+
+    repeat = await book(client, auth_headers, excursion, 2, key="order-1")
+    assert repeat.status_code == 201
+    assert "Idempotent-Replayed" not in repeat.headers
+    assert repeat.json()["booking"]["booking_id"] != first.json()["booking"]["booking_id"]
+
+    # ключ закреплен за новым запросом на следующий срок
+    replay = await book(client, auth_headers, excursion, 2, key="order-1")
+    assert replay.headers["Idempotent-Replayed"] == "true"
+    assert replay.json() == repeat.json()
+    stored = await session.get(IdempotencyKey, (test_user.id, "order-1"), populate_existing=True)
+    assert stored.expires_at > later
+    assert await session.scalar(select(func.count()).select_from(Booking)) == 2
+
+
+async def add_waiters(session, excursion, groups):
+    """Другие клиенты в очереди слота slot_time() с указанным количеством мест."""
+    await session.execute(insert(User), [
+        {"id": 500 + i, "email": f"waiter{i}@example.com", "name": f"Waiter {i}", "hashed_password": "x"}
+        for i in range(len(groups))
+    ])
+    await session.execute(insert(Client), [
+        {"client_id": 500 + i, "user_id": 500 + i} for i in range(len(groups))
+    ])
+    await session.execute(insert(WaitlistEntry), [
+        {
+            "excursion_id": excursion.excursion_id,
+            "starts_at": slot_time(),
+            "client_id": 500 + i,
+            "number_of_people": people,
+            "status": "waiting",
+        }
+        for i, people in enumerate(groups)
+    ])
+    await session.commit()
+
+
+@pytest.mark.anyio
+async def test_waitlist_join(client: AsyncClient, session, auth_headers, excursion):
+    """Тест: в очередь встают только на заполненный слот, место в очереди считается по порядку."""
+    response = await client.post(
+        "/api/waitlist",
+        json={"excursion_id": excursion.excursion_id, "date": slot_time().isoformat(), "number_of_people": 1},
+        headers=auth_headers,
+    )
+    assert response.status_code == 400
+
+    await book(client, auth_headers, excursion, 2)
+    await add_waiters(session, excursion, [1, 1])
+    response = await client.post(
+        "/api/waitlist",
+        json={"excursion_id": excursion.excursion_id, "date": slot_time().isoformat(), "number_of_people": 2},
+        headers=auth_headers,
+    )
+    assert response.status_code == 201
+    assert response.json()["status"] == "waiting"
+    assert response.json()["position"] == 3
+
+    response = await client.get("/api/waitlist/me", headers=auth_headers)
+    entry_id = response.json()[0]["entry_id"]
+    assert [entry["position"] for entry in response.json()] == [3]
+
+    response = await client.post(f"/api/waitlist/{entry_id}/cancel", headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json()["status"] == "cancelled"
+
+
+@pytest.mark.anyio
+async def test_waitlist_promoted_in_order(client: AsyncClient, session, auth_headers, excursion):
+    """Тест: освободившиеся места отдаются очереди строго по порядку с уведомлением."""
+    first = (await book(client, auth_headers, excursion, 1)).json()["booking"]["booking_id"]
+    second = (await book(client, auth_headers, excursion, 2)).json()["booking"]["booking_id"]
+    await add_waiters(session, excursion, [2, 1, 1])
+
+    # голове очереди нужно 2 места, одного освободившегося не хватает - следующие ждут
+    await client.post(f"/api/bookings/{first}/cancel", headers=auth_headers)
+    entries = (await session.scalars(select(WaitlistEntry).order_by(WaitlistEntry.entry_id))).all()
+    assert [entry.status for entry in entries] == ["waiting", "waiting", "waiting"]
+
+    await client.post(f"/api/bookings/{second}/cancel", headers=auth_headers)
+    for entry in entries:
+        await session.refresh(entry)
+    assert [entry.status for entry in entries] == ["promoted", "promoted", "waiting"]
+
+    promoted = await session.get(Booking, entries[0].booking_id)
+    assert (promoted.client_id, promoted.number_of_people, promoted.status) == (500, 2, "pending")
+    assert promoted.hold_expires_at is not None
+    slot = await session.scalar(select(ExcursionSlot))
+    assert slot.booked == 3
+
+    notifications = (await session.scalars(select(Notification).order_by(Notification.notification_id))).all()
+    assert [(n.receiver, n.booking_id) for n in notifications] == [
+        ("waiter0@example.com", entries[0].booking_id),
+        ("waiter1@example.com", entries[1].booking_id),
+    ]
+
+
+@pytest.mark.anyio
+async def test_expired_offer_moves_queue(client: AsyncClient, session, auth_headers, excursion):
+    """Тест: неподтвержденная бронь из очереди снимается, и места получает следующий."""
+    booking_id = (await book(client, auth_headers, excursion, 3)).json()["booking"]["booking_id"]
+    await add_waiters(session, excursion, [3, 3])
+    await client.post(f"/api/bookings/{booking_id}/cancel", headers=auth_headers)
+
+    head, nxt = (await session.scalars(select(WaitlistEntry).order_by(WaitlistEntry.entry_id))).all()
+    await session.refresh(head)
+    offer = await session.get(Booking, head.booking_id)
+    offer.hold_expires_at = utcnow() - timedelta(minutes=1)
+    await session.commit()
+
+    assert await expire_holds(session, batch_size=100) == 1
+    await session.refresh(nxt)
+    assert nxt.status == "promoted"
+    assert (await session.get(Booking, nxt.booking_id)).client_id == 501
+
+
+@pytest.mark.anyio
+async def test_long_waitlist_reads_only_queue_head(client: AsyncClient, session, engine, auth_headers, excursion):
+    """Тест: при тысячах ждущих продвижение читает голову очереди по частичному индексу."""
+    booking_id = (await book(client, auth_headers, excursion, 3)).json()["booking"]["booking_id"]
+    await add_waiters(session, excursion, [1] * 5000)
+
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("SELECT") and "FROM waitlist_entries" in statement:
+            statements.append((statement, parameters))
+
+    event.listen(engine.sync_engine, "before_cursor_execute", capture)
+    try:
+        await client.post(f"/api/bookings/{booking_id}/cancel", headers=auth_headers)
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", capture)
+
+    promoted = await session.scalar(
+        select(func.count()).select_from(WaitlistEntry).where(WaitlistEntry.status == "promoted")
+    )
+    assert promoted == 3
+
+    [(statement, parameters)] = statements
+    connection = await session.connection()
+    plan = await connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)
+    plan = "\n".join(row[-1] for row in plan.all())
+    assert "ix_waitlist_entries_slot_queue" in plan
+    assert "TEMP B-TREE" not in plan
+
+
+@pytest.mark.anyio
+async def test_booking_and_cancel_publish_seat_changes(client: AsyncClient, auth_headers, excursion):
+    """Тест: бронирование и отмена рассылают подписчикам экскурсии изменение мест после commit."""
+    queue = availability_hub.subscribe(excursion.excursion_id)
+    other = availability_hub.subscribe(excursion.excursion_id + 1)
+    try:
+        response = await book(client, auth_headers, excursion, 2)
+        booking_id = response.json()["booking"]["booking_id"]
+        await client.post(f"/api/bookings/{booking_id}/cancel", headers=auth_headers)
+
+        # отказ без мест ничего не публикует
+        await book(client, auth_headers, excursion, 4)
+
+        events = [queue.get_nowait() for _ in range(queue.qsize())]
+        assert [(event, json.loads(payload)) for event, payload in events] == [
+            ("seats", {
+                "excursion_id": excursion.excursion_id,
+                "starts_at": slot_time().isoformat(),
+                "delta": delta,
+                "booked": booked,
+                "capacity": 3,
+            })
+            for delta, booked in [(2, 2), (-2, 0)]
+        ]
+        assert other.empty()
+    finally:
+        availability_hub.unsubscribe(excursion.excursion_id, queue)
+        availability_hub.unsubscribe(excursion.excursion_id + 1, other)
+    assert availability_hub.subscribers(excursion.excursion_id) == 0
+
+
+@pytest.mark.anyio
+async def test_slow_subscriber_gets_resync():
+    """Тест: переполненная очередь подписчика заменяется событием resync."""
+    hub = AvailabilityHub(queue_size=2)
+    queue = hub.subscribe(1)
+    for booked in range(3):
+        hub.dispatch(json.dumps({"excursion_id": 1, "booked": booked}))
+
+    stream = sse_events(queue)
+    assert (await anext(stream)).startswith("retry: ")
+    assert await anext(stream) == 'event: resync\ndata: {"excursion_id": 1}\n\n'
+    assert queue.empty()
+
+
+@pytest.mark.anyio
+async def test_stream_unknown_excursion(client: AsyncClient):
+    """Тест: подписка на несуществующую экскурсию - 404."""
+    response = await client.get("/api/excursions/999/availability/stream")
+    assert response.status_code == 404
+
+
+def batch_item(excursion, people, when=None):
+    return {
+        "excursion_id": excursion.excursion_id,
+        "date": (when or slot_time()).isoformat(),
+        "number_of_people": people,
+    }
+
+
+@pytest.mark.anyio
+async def test_batch_booking(client: AsyncClient, session, auth_headers, excursion):
+    """Тест: пакет бронирует несколько слотов, места одного слота суммируются."""
+    response = await client.post(
+        "/api/bookings/batch",
+        json={"items": [
+            batch_item(excursion, 1, slot_time(days=6)),
+            batch_item(excursion, 1),
+            batch_item(excursion, 2),
+        ]},
+        headers=auth_headers,
+    )
+
+    assert response.status_code == 201
+    bookings = response.json()["bookings"]
+    assert [(b["date"], b["number_of_people"], b["status"]) for b in bookings] == [
+        (slot_time(days=6).isoformat(), 1, "confirmed"),
+        (slot_time().isoformat(), 1, "confirmed"),
+        (slot_time().isoformat(), 2, "confirmed"),
+    ]
+    slots = (await session.scalars(select(ExcursionSlot).order_by(ExcursionSlot.starts_at))).all()
+    assert [slot.booked for slot in slots] == [3, 1]
+
+
+@pytest.mark.anyio
+async def test_batch_booking_all_or_nothing(client: AsyncClient, session, auth_headers, excursion):
+    """Тест: если одной позиции не хватает мест, пакет не создает ни одного бронирования."""
+    response = await client.post(
+        "/api/bookings/batch",
+        json={"items": [batch_item(excursion, 1, slot_time(days=6)), batch_item(excursion, 2), batch_item(excursion, 2)]},
+        headers=auth_headers,
+    )
+    assert response.status_code == 400
+    # в приложении сессия запроса закрывается с откатом, в тестах сессия общая
+    await session.rollback()
+    await session.refresh(excursion)
+
+    assert await session.scalar(select(func.count()).select_from(Booking)) == 0
+    assert await session.scalar(select(func.coalesce(func.sum(ExcursionSlot.booked), 0))) == 0
+
+    response = await client.post(
+        "/api/bookings/batch",
+        json={"items": [batch_item(excursion, 1), {**batch_item(excursion, 1), "excursion_id": 999}]},
+        headers=auth_headers,
+    )
+    assert response.status_code == 404
+    assert response.json()["detail"].startswith("Позиция 2")
+
+
+@pytest.mark.anyio
+async def test_my_bookings_date_range(client: AsyncClient, auth_headers, excursion):
+    """Тест: date_from/date_to ограничивают «мои бронирования» днями экскурсий включительно."""
+    for days in (2, 5, 9):
+        assert (await book(client, auth_headers, excursion, 1, when=slot_time(days=days, hour=23))).status_code == 201
+
+    response = await client.get(
+        "/api/bookings/me",
+        params={"date_from": slot_time(days=5).date().isoformat(), "date_to": slot_time(days=9).date().isoformat()},
+        headers=auth_headers,
+    )
+    assert [booking["date"] for booking in response.json()] == [
+        slot_time(days=9, hour=23).isoformat(),
+        slot_time(days=5, hour=23).isoformat(),
+    ]
+    response = await client.get("/api/bookings/me", headers=auth_headers)
+    assert len(response.json()) == 3
@@ -0,0 +1,60 @@
+import pytest
+from httpx import AsyncClient
+
+from src.cache import TTLCache, catalog_cache, invalidate_catalog
+from src.models import Excursion, Guide
+
+
+def test_ttl_cache_evicts_least_recently_used():
+    """Тест LRU: при переполнении вытесняется давно не использованная запись."""
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_ttl_cache_expires_entries():
+    """Тест TTL: устаревшая запись считается промахом."""
+    cache = TTLCache(maxsize=10, ttl=-1)
+    cache.set("a", 1)
+
+    assert cache.get("a") is None
+    assert cache.stats()["misses"] == 1
+
+
+@pytest.mark.anyio
+async def test_catalog_invalidated_after_commit(client: AsyncClient, session, test_user):
+    """Тест: ответ каталога кэшируется и сбрасывается после изменения экскурсии."""
+    guide = Guide(user_id=test_user.id)
+    session.add(guide)
+    await session.flush()
+    excursion = Excursion(
+        title="Прогулка по Арбату",
+        country="Россия",
+        city="Москва",
+        difficulty="easy",
+        price_per_person=1500,
+        status="approved",
+        guide_id=guide.guide_id,
+    )
+    session.add(excursion)
+    await session.commit()
+
+    response = await client.get(f"/api/excursions/{excursion.excursion_id}")
+    assert response.json()["title"] == "Прогулка по Арбату"
+
+    excursion.title = "Вечерний Арбат"
+    await invalidate_catalog(session)
+    # до commit в кэше остается прежний ответ
+    assert catalog_cache.stats()["size"] == 1
+    await session.commit()
+
+    response = await client.get(f"/api/excursions/{excursion.excursion_id}")
+    assert response.json()["title"] == "Вечерний Арбат"
@@ -0,0 +1,86 @@
+import pytest
+from httpx import AsyncClient
+
+from src.cache import catalog_cache
+from src.models import Excursion, Guide
+
+
+@pytest.fixture(scope="function")
+async def excursion(session, test_user):
+    guide = Guide(user_id=test_user.id)
+    session.add(guide)
+    await session.flush()
+
+    excursion = Excursion(
+        title="Прогулка по Арбату",
+        country="Россия",
+        city="Москва",
+        difficulty="easy",
+        price_per_person=1500,
+        status="approved",
+        guide_id=guide.guide_id,
+    )
+    session.add(excursion)
+    await session.commit()
+    return excursion
+
+
+@pytest.mark.anyio
+async def test_excursion_not_modified(client: AsyncClient, session, excursion):
+    """Тест: повторный запрос экскурсии с актуальным ETag получает 304, после изменения - 200."""
+    url = f"/api/excursions/{excursion.excursion_id}"
+    response = await client.get(url)
+    etag = response.headers["etag"]
+    assert etag.startswith('W/"')
+    assert "last-modified" in response.headers
+
+    response = await client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+
+    # без записи в кэше 304 отдается по одному запросу updated_at
+    catalog_cache.clear()
+    response = await client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+
+    excursion.price_per_person = 2000
+    await session.commit()
+    catalog_cache.clear()
+
+    response = await client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+
+
+@pytest.mark.anyio
+async def test_excursion_if_modified_since(client: AsyncClient, excursion):
+    """Тест: If-Modified-Since не раньше updated_at дает 304."""
+    url = f"/api/excursions/{excursion.excursion_id}"
+    response = await client.get(url)
+
+    response = await client.get(url, headers={"If-Modified-Since": response.headers["last-modified"]})
+    assert response.status_code == 304
+
+    response = await client.get(url, headers={"If-Modified-Since": "Mon, 01 Jan 2001 00:00:00 GMT"})
+    assert response.status_code == 200
+
+
+@pytest.mark.anyio
+async def test_excursion_list_not_modified(client: AsyncClient, session, excursion):
+    """Тест: ETag списка зависит от параметров и меняется при изменении каталога."""
+    response = await client.get("/api/excursions")
+    etag = response.headers["etag"]
+
+    response = await client.get("/api/excursions", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+
+    response = await client.get("/api/excursions", params={"city": "Москва"}, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+
+    await session.delete(excursion)
+    await session.commit()
+    catalog_cache.clear()
+
+    response = await client.get("/api/excursions", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json() == []
@@ -0,0 +1,95 @@
+import asyncio
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import exc, insert, text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from src import database
+from src.database import MeteredQueuePool, PoolMetrics, pool_stats
+from src.main import app
+from src.models import Base, Excursion, Guide, User
+
+
+def test_pool_metrics_histogram():
+    """Тест: гистограмма ожидания накопительная, последняя корзина - все замеры."""
+    metrics = PoolMetrics()
+    for seconds in (0.0005, 0.003, 0.003, 0.2, 10):
+        metrics.observe(seconds)
+
+    stats = metrics.stats()
+    assert stats["count"] == 5
+    assert stats["max_ms"] == 10000
+    assert stats["buckets_le_ms"]["1"] == 1
+    assert stats["buckets_le_ms"]["5"] == 3
+    assert stats["buckets_le_ms"]["250"] == 4
+    assert stats["buckets_le_ms"]["5000"] == 4
+    assert stats["buckets_le_ms"]["+Inf"] == 5
+
+
+@pytest.mark.anyio
+async def test_metered_pool_counts_checkouts_and_timeouts():
+    """Тест: пул считает выдачи соединений и таймауты при исчерпании."""
+    engine = create_async_engine(
+        "sqlite+aiosqlite://",
+        poolclass=MeteredQueuePool,
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=0.05,
+    )
+    try:
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+            assert pool_stats(engine)["checked_out"] == 1
+
+            with pytest.raises(exc.TimeoutError):
+                async with engine.connect():
+                    pass
+
+        await asyncio.sleep(0)
+        stats = pool_stats(engine)
+        assert stats["checked_out"] == 0
+        assert stats["wait"]["count"] == 2
+        assert stats["wait"]["timeouts"] == 1
+    finally:
+        await engine.dispose()
+
+
+@pytest.mark.anyio
+async def test_connection_released_before_response_is_sent(tmp_path, monkeypatch):
+    """Тест: сессия запроса возвращает соединение в пул до отправки ответа."""
+    engine = create_async_engine(
+        f"sqlite+aiosqlite:///{tmp_path / 'release.db'}",
+        poolclass=MeteredQueuePool,
+        pool_size=1,
+        max_overflow=0,
+    )
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(insert(User).values(id=1, email="guide@example.com", name="Гид", hashed_password="x"))
+        await conn.execute(insert(Guide).values(guide_id=1, user_id=1))
+        await conn.execute(insert(Excursion).values(
+            excursion_id=1, title="Экскурсия", country="Россия", city="Москва",
+            difficulty="easy", price_per_person=1000, status="approved", guide_id=1,
+        ))
+    monkeypatch.setattr(database, "async_session_factory", async_sessionmaker(engine))
+
+    checked_out = []
+
+    async def observed_app(scope, receive, send):
+        async def observed_send(message):
+            if message["type"] == "http.response.start":
+                checked_out.append(engine.pool.checkedout())
+            await send(message)
+        await app(scope, receive, observed_send)
+
+    checkouts_before = engine.pool.metrics.stats()["count"]
+    try:
+        async with AsyncClient(transport=ASGITransport(app=observed_app), base_url="http://test") as client:
+            response = await client.get("/api/excursions/1/available-dates?days=2")
+        assert response.status_code == 200
+        assert checked_out == [0]
+        # все зависимости запроса делят одну сессию и одно соединение
+        assert engine.pool.metrics.stats()["count"] - checkouts_before == 1
+    finally:
+        await engine.dispose()
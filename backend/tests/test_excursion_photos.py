@@ -0,0 +1,56 @@
+import pytest
+from httpx import AsyncClient
+
+from src.models import Excursion, Guide
+from src.utils import refresh_resolved_photos, resolve_excursion_photos
+
+ASSET_TITLE = "Музеи_Москвы_за_один_день"
+
+
+@pytest.fixture(scope="function")
+async def guide(session, test_user):
+    guide = Guide(user_id=test_user.id)
+    session.add(guide)
+    await session.flush()
+    return guide
+
+
+def make_excursion(guide, photos):
+    return Excursion(
+        title=ASSET_TITLE,
+        country="Россия",
+        city="Москва",
+        difficulty="easy",
+        photos=photos,
+        price_per_person=1000,
+        status="approved",
+        guide_id=guide.guide_id,
+    )
+
+
+@pytest.mark.anyio
+async def test_dummy_photo_resolved_on_write(client: AsyncClient, session, guide):
+    """Тест: заглушка заменяется фоткой из assets при записи, чтение отдает колонку."""
+    excursion = make_excursion(guide, "https://dummyimage.com/600x400")
+    resolve_excursion_photos(excursion)
+    session.add(excursion)
+    await session.commit()
+
+    assert excursion.resolved_photos == f"/static/excursions/{ASSET_TITLE}.jpg"
+
+    response = await client.get(f"/api/excursions/{excursion.excursion_id}")
+    assert response.json()["photos"] == f"/static/excursions/{ASSET_TITLE}.jpg"
+
+
+@pytest.mark.anyio
+async def test_guide_photo_kept_on_backfill(session, guide):
+    """Тест пересчета: фотки, загруженные гидом, не заменяются."""
+    guide_photo = "/static/excursions/0b7c8f4e-2a51-4c1e-9d0a-6f1f2b3c4d5e.jpg"
+    excursion = make_excursion(guide, guide_photo)
+    session.add(excursion)
+    await session.commit()
+
+    changed = await refresh_resolved_photos(session)
+
+    assert changed == 1
+    assert excursion.resolved_photos == guide_photo
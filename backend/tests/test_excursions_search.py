@@ -0,0 +1,270 @@
+import html
+from datetime import datetime, timedelta
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import literal, select
+
+from src.facets import FacetIndex, facet_delta, facet_values
+from src.inventory import reserve_seats
+from src.models import Booking, Client, Excursion, Guide, Payment
+from src.search import html_escape
+
+
+@pytest.fixture(scope="function")
+async def catalog(session, test_user):
+    """Создаем гида и несколько экскурсий."""
+    guide = Guide(user_id=test_user.id)
+    session.add(guide)
+    await session.flush()
+
+    excursions = [
+        Excursion(
+            title="Прогулка по Арбату",
+            country="Россия",
+            city="Москва",
+            difficulty="easy",
+            price_per_person=1500,
+            status="approved",
+            available_slots=10,
+            guide_id=guide.guide_id,
+        ),
+        Excursion(
+            title="Крыши Петербурга",
+            country="Россия",
+            city="Санкт-Петербург",
+            difficulty="medium",
+            price_per_person=2500,
+            status="approved",
+            available_slots=2,
+            guide_id=guide.guide_id,
+        ),
+        Excursion(
+            title="Черновик экскурсии",
+            country="Россия",
+            city="Москва",
+            difficulty="easy",
+            price_per_person=1000,
+            status="pending_review",
+            available_slots=None,
+            guide_id=guide.guide_id,
+        ),
+    ]
+    session.add_all(excursions)
+    await session.commit()
+    return excursions
+
+
+@pytest.mark.anyio
+async def test_search_returns_only_approved(client: AsyncClient, catalog):
+    """Тест поиска: в выдачу попадают только одобренные экскурсии."""
+    response = await client.get("/api/excursions")
+
+    assert response.status_code == 200
+    titles = {item["title"] for item in response.json()}
+    assert titles == {"Прогулка по Арбату", "Крыши Петербурга"}
+
+
+@pytest.mark.anyio
+async def test_search_by_city_and_title(client: AsyncClient, catalog):
+    """Тест поиска по подстроке города и названия."""
+    response = await client.get("/api/excursions", params={"city": "Москва"})
+    assert [item["title"] for item in response.json()] == ["Прогулка по Арбату"]
+
+    response = await client.get("/api/excursions", params={"title": "Крыши"})
+    assert [item["title"] for item in response.json()] == ["Крыши Петербурга"]
+
+
+@pytest.mark.anyio
+async def test_search_filters_by_people(client: AsyncClient, catalog):
+    """Тест поиска: экскурсии без нужного количества мест отсекаются."""
+    response = await client.get("/api/excursions", params={"people": 5})
+
+    assert [item["title"] for item in response.json()] == ["Прогулка по Арбату"]
+
+
+@pytest.mark.anyio
+async def test_fuzzy_search_sqlite_fallback(client: AsyncClient, catalog):
+    """Тест нечеткого режима: на SQLite работает запасной вариант с ILIKE."""
+    response = await client.get(
+        "/api/excursions", params={"country": "Россия", "fuzzy": True}
+    )
+
+    assert response.status_code == 200
+    assert len(response.json()) == 2
+
+
+@pytest.mark.anyio
+async def test_search_keyset_pagination(client: AsyncClient, catalog):
+    """Тест постраничной выдачи: курсор ведет на следующую страницу без повторов."""
+    response = await client.get(
+        "/api/excursions", params={"sort": "price_asc", "limit": 1}
+    )
+    assert response.status_code == 200
+    assert [item["title"] for item in response.json()] == ["Прогулка по Арбату"]
+    cursor = response.headers["X-Next-Cursor"]
+
+    response = await client.get(
+        "/api/excursions", params={"sort": "price_asc", "limit": 1, "cursor": cursor}
+    )
+    assert [item["title"] for item in response.json()] == ["Крыши Петербурга"]
+    assert "X-Next-Cursor" not in response.headers
+
+
+@pytest.mark.anyio
+async def test_search_rejects_foreign_cursor(client: AsyncClient, catalog):
+    """Тест: курсор другой сортировки или поврежденный курсор дают 400."""
+    response = await client.get(
+        "/api/excursions", params={"sort": "price_desc", "limit": 1}
+    )
+    cursor = response.headers["X-Next-Cursor"]
+
+    response = await client.get(
+        "/api/excursions", params={"sort": "newest", "cursor": cursor}
+    )
+    assert response.status_code == 400
+
+    response = await client.get("/api/excursions", params={"cursor": "не-курсор"})
+    assert response.status_code == 400
+
+
+async def book_slots(session, excursion, user, day, hours, people):
+    """Создаем бронирования на указанные часы дня."""
+    client = Client(user_id=user.id)
+    session.add(client)
+    await session.flush()
+    for hour in hours:
+        payment = Payment(amount=0, payment_method="online")
+        session.add(payment)
+        await session.flush()
+        starts_at = datetime.combine(day, datetime.min.time()).replace(hour=hour)
+        assert await reserve_seats(session, excursion, starts_at, people) is not None
+        session.add(Booking(
+            date=starts_at,
+            number_of_people=people,
+            status="confirmed",
+            payment_status="pending",
+            excursion_id=excursion.excursion_id,
+            client_id=client.client_id,
+            payment_id=payment.id,
+        ))
+    await session.commit()
+
+
+@pytest.mark.anyio
+async def test_search_by_date_excludes_fully_booked(client: AsyncClient, session, catalog, test_user):
+    """Тест поиска по дате: экскурсия, у которой все слоты дня заняты, не возвращается."""
+    day = datetime.now().date() + timedelta(days=3)
+    spb = catalog[1]
+    await book_slots(session, spb, test_user, day, [9, 12, 15, 18], people=2)
+
+    response = await client.get("/api/excursions", params={"date": day.isoformat()})
+
+    assert response.status_code == 200
+    assert [item["title"] for item in response.json()] == ["Прогулка по Арбату"]
+
+    other_day = day + timedelta(days=1)
+    response = await client.get("/api/excursions", params={"date": other_day.isoformat()})
+    assert len(response.json()) == 2
+
+
+@pytest.mark.anyio
+async def test_search_by_date_counts_party_size(client: AsyncClient, session, catalog, test_user):
+    """Тест поиска по дате: слот с частично занятыми местами подходит только небольшой группе."""
+    day = datetime.now().date() + timedelta(days=3)
+    arbat = catalog[0]
+    await book_slots(session, arbat, test_user, day, [9, 12, 15, 18], people=7)
+
+    response = await client.get("/api/excursions", params={"date": day.isoformat(), "people": 3})
+    assert [item["title"] for item in response.json()] == ["Прогулка по Арбату"]
+
+    response = await client.get("/api/excursions", params={"date": day.isoformat(), "people": 4})
+    assert response.json() == []
+
+
+@pytest.mark.anyio
+async def test_facets_counts(client: AsyncClient, catalog):
+    """Тест фасетов: считаются только одобренные экскурсии."""
+    response = await client.get("/api/excursions/facets")
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["countries"] == [{"value": "Россия", "count": 2}]
+    assert {item["value"] for item in data["cities"]} == {"Москва", "Санкт-Петербург"}
+    assert [bucket["count"] for bucket in data["price_buckets"]] == [0, 1, 1, 0, 0]
+
+
+@pytest.mark.anyio
+async def test_facets_updated_incrementally(client: AsyncClient, catalog, auth_headers):
+    """Тест фасетов: после редактирования гидом экскурсия уходит на модерацию и из счетчиков."""
+    response = await client.get("/api/excursions/facets")
+    assert response.json()["countries"] == [{"value": "Россия", "count": 2}]
+
+    spb = catalog[1]
+    update = {
+        "title": spb.title,
+        "country": spb.country,
+        "city": spb.city,
+        "difficulty": spb.difficulty,
+        "price_per_person": 2500,
+        "available_slots": 2,
+    }
+    response = await client.patch(
+        f"/api/guides/me/excursions/{spb.excursion_id}", json=update, headers=auth_headers
+    )
+    assert response.status_code == 200
+    assert response.json()["status"] == "pending_review"
+
+    response = await client.get("/api/excursions/facets")
+    data = response.json()
+    assert data["countries"] == [{"value": "Россия", "count": 1}]
+    assert data["cities"] == [{"value": "Москва", "count": 1}]
+
+
+@pytest.mark.anyio
+async def test_fulltext_search_in_description(client: AsyncClient, session, catalog):
+    """Тест параметра q: поиск находит слова из описания (на SQLite - через ILIKE)."""
+    catalog[1].description = "Поднимемся на крыши и увидим город сверху"
+    await session.commit()
+
+    response = await client.get("/api/excursions", params={"q": "увидим город"})
+
+    assert response.status_code == 200
+    assert [item["title"] for item in response.json()] == ["Крыши Петербурга"]
+
+
+@pytest.mark.anyio
+async def test_snippet_document_is_html_escaped(session):
+    """Тест: текст гида экранируется до подсветки, в фрагменте не остается чужой разметки."""
+    text = """<img src=x onerror="alert('x')"> Tom & Jerry"""
+    assert await session.scalar(select(html_escape(literal(text)))) == html.escape(text)
+
+
+@pytest.mark.anyio
+async def test_facets_delta_during_rebuild_is_not_lost(session, catalog):
+    """Тест фасетов: изменение, пришедшее во время пересчета, не теряется при замене счетчиков."""
+    index = FacetIndex(max_age=3600)
+    moscow = catalog[2]
+
+    class NotifyingSession:
+        """Сессия, во время первого запроса которой гид публикует экскурсию и приходит дельта."""
+
+        def __init__(self) -> None:
+            self.queries = 0
+
+        async def execute(self, query):
+            self.queries += 1
+            result = await session.execute(query)
+            if self.queries == 1:
+                before = facet_values(moscow)
+                moscow.status = "approved"
+                await session.commit()
+                index.apply(facet_delta(before, facet_values(moscow)))
+            return result
+
+    notifying = NotifyingSession()
+    counts = await index.get(notifying)
+
+    assert notifying.queries == 2
+    assert counts["city"]["Москва"] == 2
+    assert not index.stale
@@ -0,0 +1,98 @@
+"""
+Проверка индексов по метаданным моделей (Base.metadata).
+
+Каждый внешний ключ должен быть ведущими колонками полного (не частичного)
+btree-индекса, первичного ключа или ограничения уникальности: иначе удаление
+строки родительской таблицы и выборки по связи читают всю дочернюю таблицу.
+Колонки горячих фильтров (HOT_FILTERS) должны быть ведущими колонками
+какого-нибудь индекса, частичного в том числе.
+
+Новый внешний ключ или фильтр без индекса роняет тест; индекс добавляется
+в модель и миграцией.
+"""
+from sqlalchemy import Column, ForeignKey, Index, Integer, MetaData, String, Table, UniqueConstraint, text
+
+from src.models import Base
+
+# Таблица и колонки фильтров частых запросов (в порядке ведущих колонок индекса)
+HOT_FILTERS = [
+    ("excursions", ("status",)),
+    ("excursions", ("city",)),
+    ("excursions", ("country",)),
+    ("excursions", ("updated_at",)),
+    ("bookings", ("excursion_id", "date")),
+    ("bookings", ("client_id", "date")),
+    ("bookings", ("hold_expires_at",)),
+    ("excursion_slots", ("excursion_id", "starts_at")),
+    ("excursion_slots", ("starts_at",)),
+    ("excursion_schedule_exceptions", ("excursion_id", "date")),
+    ("waitlist_entries", ("excursion_id", "starts_at")),
+    ("idempotency_keys", ("expires_at",)),
+    # ссылки на секционированную bookings без FOREIGN KEY (см. Booking)
+    ("notifications", ("booking_id",)),
+    ("waitlist_entries", ("booking_id",)),
+]
+
+
+def index_keys(table: Table, partial: bool) -> list[tuple[str, ...]]:
+    """Колонки индексов таблицы, которые годятся для поиска по равенству."""
+    keys = [tuple(column.name for column in table.primary_key.columns)]
+    keys += [
+        tuple(column.name for column in constraint.columns)
+        for constraint in table.constraints
+        if isinstance(constraint, UniqueConstraint)
+    ]
+    for index in table.indexes:
+        options = index.dialect_options["postgresql"]
+        # GIN (trgm, tsvector) не обслуживает поиск по равенству
+        if options["using"] not in (None, False, "btree"):
+            continue
+        if options["where"] is not None and not partial:
+            continue
+        keys.append(tuple(column.name for column in index.columns))
+    return keys
+
+
+def is_covered(columns: tuple[str, ...], keys: list[tuple[str, ...]]) -> bool:
+    return any(set(key[:len(columns)]) == set(columns) for key in keys)
+
+
+def missing_indexes(metadata: MetaData, hot_filters: list[tuple[str, tuple[str, ...]]]) -> list[str]:
+    """Внешние ключи и горячие фильтры без подходящего индекса."""
+    missing = []
+    for table in metadata.sorted_tables:
+        keys = index_keys(table, partial=False)
+        for foreign_key in table.foreign_key_constraints:
+            columns = tuple(column.name for column in foreign_key.columns)
+            if not is_covered(columns, keys):
+                missing.append(f"{table.name}({', '.join(columns)}) -> {foreign_key.referred_table.name}")
+    for table_name, columns in hot_filters:
+        if not is_covered(columns, index_keys(metadata.tables[table_name], partial=True)):
+            missing.append(f"{table_name}({', '.join(columns)}): фильтр без индекса")
+    return missing
+
+
+def test_foreign_keys_and_hot_filters_are_indexed():
+    """Тест: у всех внешних ключей и горячих фильтров моделей есть индексы."""
+    assert missing_indexes(Base.metadata, HOT_FILTERS) == []
+
+
+def test_checker_reports_missing_indexes():
+    """Тест: проверка находит FK без индекса, FK только с частичным индексом и фильтр без индекса."""
+    metadata = MetaData()
+    Table("parents", metadata, Column("id", Integer, primary_key=True))
+    Table(
+        "children",
+        metadata,
+        Column("id", Integer, primary_key=True),
+        Column("parent_id", Integer, ForeignKey("parents.id")),
+        Column("other_parent_id", Integer, ForeignKey("parents.id")),
+        Column("status", String(20)),
+        Index("ix_children_active_parent", "parent_id", postgresql_where=text("status = 'active'")),
+        Index("ix_children_other_parent_status", "other_parent_id", "status"),
+    )
+
+    assert missing_indexes(metadata, [("children", ("status",)), ("children", ("parent_id",))]) == [
+        "children(parent_id) -> parents",
+        "children(status): фильтр без индекса",
+    ]
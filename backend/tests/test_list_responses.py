@@ -0,0 +1,94 @@
+from datetime import datetime
+
+import pytest
+from httpx import AsyncClient
+
+from src.models import Booking, Client, Excursion, Guide, Payment
+
+
+@pytest.fixture(scope="function")
+async def booked_excursions(session, test_user):
+    """Гид (он же клиент и администратор) с экскурсиями и одним бронированием."""
+    test_user.is_superuser = True
+    guide = Guide(user_id=test_user.id)
+    client = Client(user_id=test_user.id)
+    session.add_all([guide, client])
+    await session.flush()
+
+    excursions = [
+        Excursion(
+            title=f"Экскурсия {i}",
+            country="Россия",
+            city="Москва",
+            difficulty="easy",
+            description="Описание " * 20,
+            price_per_person=1500,
+            status="approved",
+            guide_id=guide.guide_id,
+        )
+        for i in range(20)
+    ]
+    session.add_all(excursions)
+    payment = Payment(amount=3000, payment_method="online")
+    session.add(payment)
+    await session.flush()
+
+    session.add(Booking(
+        date=datetime(2030, 5, 1, 12, 0),
+        number_of_people=2,
+        status="confirmed",
+        payment_status="pending",
+        excursion_id=excursions[0].excursion_id,
+        client_id=client.client_id,
+        payment_id=payment.id,
+    ))
+    await session.commit()
+    return excursions
+
+
+@pytest.mark.anyio
+async def test_admin_lists_serialized_from_rows(client: AsyncClient, auth_headers, booked_excursions):
+    """Тест: списки админки отдаются в формате схем, числа - числами."""
+    response = await client.get("/api/admin/excursions", headers=auth_headers)
+    assert response.status_code == 200
+    items = response.json()
+    assert len(items) == 20
+    assert items[0]["title"] == "Экскурсия 19"
+    assert items[0]["price_per_person"] == 1500.0
+    assert items[0]["rating"] == 0.0
+
+    response = await client.get("/api/admin/bookings", headers=auth_headers)
+    assert response.json() == [{
+        "booking_id": 1,
+        "date": "2030-05-01T12:00:00",
+        "number_of_people": 2,
+        "status": "confirmed",
+        "payment_status": "pending",
+        "excursion_id": booked_excursions[0].excursion_id,
+        "excursion_title": "Экскурсия 0",
+        "client_id": 1,
+        "client_name": "Test User",
+        "client_email": "test@example.com",
+        "total_amount": 3000.0,
+    }]
+
+
+@pytest.mark.anyio
+async def test_guide_calendar(client: AsyncClient, auth_headers, booked_excursions):
+    """Тест календаря гида: контакты клиента и дата в ISO-формате."""
+    response = await client.get("/api/guides/me/bookings", headers=auth_headers)
+
+    assert response.status_code == 200
+    [item] = response.json()
+    assert item["date"] == "2030-05-01T12:00:00"
+    assert item["excursion_title"] == "Экскурсия 0"
+    assert item["client_phone"] == "+1234567890"
+
+
+@pytest.mark.anyio
+async def test_large_list_gzipped(client: AsyncClient, booked_excursions):
+    """Тест: большой ответ сжимается, если клиент принимает gzip."""
+    response = await client.get("/api/excursions", headers={"Accept-Encoding": "gzip"})
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert len(response.json()) == 20
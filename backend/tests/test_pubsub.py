@@ -0,0 +1,90 @@
+import asyncio
+
+import pytest
+
+from src import pubsub
+from src.cache import catalog_cache
+from src.pubsub import PgListener, pg_listener
+
+
+class FakeConnection:
+    """Соединение asyncpg: запоминает подписки, обрыв вызывает termination listeners."""
+
+    def __init__(self) -> None:
+        self.channels = []
+        self.closed = False
+        self._termination_listeners = []
+
+    def add_termination_listener(self, callback) -> None:
+        self._termination_listeners.append(callback)
+
+    async def add_listener(self, channel, callback) -> None:
+        self.channels.append(channel)
+
+    async def fetchval(self, query):
+        return 1
+
+    def is_closed(self) -> bool:
+        return self.closed
+
+    async def close(self) -> None:
+        self.closed = True
+
+    def drop(self) -> None:
+        self.closed = True
+        for callback in self._termination_listeners:
+            callback(self)
+
+
+async def wait_until(condition) -> None:
+    for _ in range(100):
+        if condition():
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("условие не выполнилось")
+
+
+@pytest.mark.anyio
+async def test_listener_reconnects_and_resyncs(monkeypatch):
+    """Тест: после обрыва LISTEN переподключается, подписывается заново и сбрасывает локальное состояние."""
+    connections = []
+
+    async def connect(dsn):
+        if len(connections) == 1 and connections[0].closed and not failed:
+            failed.append(dsn)
+            raise OSError("connection refused")
+        connections.append(FakeConnection())
+        return connections[-1]
+
+    failed = []
+    monkeypatch.setattr(pubsub.asyncpg, "connect", connect)
+    monkeypatch.setattr(pubsub, "RECONNECT_MIN_SECONDS", 0)
+
+    listener = PgListener()
+    listener.subscribe("catalog_changed", lambda payload: None)
+    resyncs = []
+    listener.on_resync(lambda: resyncs.append(len(connections)))
+
+    await listener.start("postgresql://test")
+    try:
+        await wait_until(lambda: listener.active)
+        assert connections[0].channels == ["catalog_changed"]
+        assert resyncs == []
+
+        connections[0].drop()
+        await wait_until(lambda: len(connections) == 2 and listener.active)
+
+        # первая попытка переподключения не удалась, вторая подписалась заново
+        assert failed
+        assert connections[1].channels == ["catalog_changed"]
+        await wait_until(lambda: resyncs == [2])
+    finally:
+        await listener.stop()
+    assert connections[1].closed
+
+
+def test_resync_clears_catalog_cache():
+    """Тест: пересинхронизация после переподключения сбрасывает кэш каталога процесса."""
+    catalog_cache.set(("excursion", 1), "cached")
+    pg_listener.resync()
+    assert catalog_cache.get(("excursion", 1)) is None
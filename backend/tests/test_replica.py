@@ -0,0 +1,129 @@
+from datetime import datetime, timedelta
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from src import replica
+from src.models import Excursion, Guide
+from src.replica import CATALOG_KEY, ReplicaRouter, excursion_key, replica_router
+
+
+@pytest.fixture(scope="function")
+def fake_replica(engine, monkeypatch):
+    """Реплика без отставания - тот же тестовый движок."""
+    monkeypatch.setattr(replica, "replica_session_factory", async_sessionmaker(engine, expire_on_commit=False))
+    monkeypatch.setattr(replica_router, "lag", 0.0)
+    monkeypatch.setattr(replica_router, "_writes", {})
+    monkeypatch.setattr(replica_router, "replica_reads", 0)
+    monkeypatch.setattr(replica_router, "primary_reads", 0)
+    return replica_router
+
+
+def test_router_falls_back_to_primary():
+    """Тест: без известного отставания, при большом отставании и сразу после изменений - основная БД."""
+    router = ReplicaRouter()
+    assert not router.allows([CATALOG_KEY])
+
+    router.lag = 3600
+    assert not router.allows([CATALOG_KEY])
+
+    router.lag = 0.0
+    assert router.allows([CATALOG_KEY, excursion_key(1)])
+    router.mark_write(excursion_key(1))
+    assert not router.allows([CATALOG_KEY, excursion_key(1)])
+    assert router.allows([CATALOG_KEY, excursion_key(2)])
+
+
+@pytest.mark.anyio
+async def test_reads_after_own_booking_go_to_primary(
+    client: AsyncClient, session, test_user, auth_headers, fake_replica
+):
+    """Тест: каталог читается с реплики, а календарь экскурсии сразу после бронирования - из основной БД."""
+    guide = Guide(user_id=test_user.id)
+    session.add(guide)
+    await session.flush()
+    excursion = Excursion(
+        title="Соборы Кремля",
+        country="Россия",
+        city="Москва",
+        difficulty="easy",
+        price_per_person=1500,
+        status="approved",
+        available_slots=5,
+        guide_id=guide.guide_id,
+    )
+    session.add(excursion)
+    await session.commit()
+    excursion_id = excursion.excursion_id
+
+    assert (await client.get(f"/api/excursions/{excursion_id}/available-dates")).status_code == 200
+    assert (fake_replica.replica_reads, fake_replica.primary_reads) == (1, 0)
+
+    day = datetime.now().date() + timedelta(days=3)
+    response = await client.post(
+        "/api/bookings",
+        json={
+            "excursion_id": excursion_id,
+            "date": datetime.combine(day, datetime.min.time()).replace(hour=12).isoformat(),
+            "number_of_people": 2,
+        },
+        headers=auth_headers,
+    )
+    assert response.status_code == 201
+
+    await client.get(f"/api/excursions/{excursion_id}/available-dates")
+    assert (fake_replica.replica_reads, fake_replica.primary_reads) == (1, 1)
+
+    # другие экскурсии по-прежнему читаются с реплики
+    await client.get("/api/excursions/999")
+    assert (fake_replica.replica_reads, fake_replica.primary_reads) == (2, 1)
+
+
+@pytest.mark.anyio
+async def test_seat_dependent_reads_after_booking_go_to_primary(
+    client: AsyncClient, session, test_user, auth_headers, fake_replica
+):
+    """Тест: поиск по дате и пакетная доступность сразу после изменения мест читаются из основной БД."""
+    guide = Guide(user_id=test_user.id)
+    session.add(guide)
+    await session.flush()
+    excursion = Excursion(
+        title="Крыши Москвы",
+        country="Россия",
+        city="Москва",
+        difficulty="easy",
+        price_per_person=1500,
+        status="approved",
+        available_slots=2,
+        guide_id=guide.guide_id,
+    )
+    session.add(excursion)
+    await session.commit()
+    excursion_id = excursion.excursion_id
+    day = datetime.now().date() + timedelta(days=3)
+
+    async def seat_reads():
+        await client.get("/api/excursions", params={"date": day.isoformat()})
+        await client.post("/api/excursions/availability", json={"excursion_ids": [excursion_id]})
+
+    await seat_reads()
+    assert (fake_replica.replica_reads, fake_replica.primary_reads) == (2, 0)
+
+    response = await client.post(
+        "/api/bookings",
+        json={
+            "excursion_id": excursion_id,
+            "date": datetime.combine(day, datetime.min.time()).replace(hour=12).isoformat(),
+            "number_of_people": 2,
+        },
+        headers=auth_headers,
+    )
+    assert response.status_code == 201
+
+    await seat_reads()
+    assert (fake_replica.replica_reads, fake_replica.primary_reads) == (2, 2)
+
+    # поиск без даты мест не читает и остается на реплике
+    await client.get("/api/excursions")
+    assert (fake_replica.replica_reads, fake_replica.primary_reads) == (3, 2)
@@ -0,0 +1,162 @@
+from datetime import date, datetime, time, timedelta
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import select
+
+from src.models import Excursion, Guide, ScheduleException, ScheduleRule
+from src.schedule import DEFAULT_TIMES, Schedule, get_schedule, slots_on_day_expression
+
+MONDAY = date(2030, 1, 7)
+
+
+def test_schedule_expands_only_window():
+    """Тест: правила, исключения и горизонт разворачиваются в пределах окна."""
+    schedule = Schedule(
+        rules=[
+            ScheduleRule(weekday=0, start_time=time(10)),
+            ScheduleRule(weekday=2, start_time=time(11), valid_until=MONDAY + timedelta(days=7)),
+        ],
+        exceptions=[
+            ScheduleException(date=MONDAY, kind="extra", start_time=time(16)),
+            ScheduleException(date=MONDAY + timedelta(days=7), kind="blackout"),
+        ],
+        horizon_days=21,
+    )
+
+    occurrences = list(schedule.occurrences(MONDAY, MONDAY + timedelta(days=365), today=MONDAY))
+
+    assert occurrences == [
+        datetime(2030, 1, 7, 10),
+        datetime(2030, 1, 7, 16),
+        datetime(2030, 1, 9, 11),
+        datetime(2030, 1, 21, 10),
+    ]
+    assert schedule.allows(datetime(2030, 1, 9, 11), today=MONDAY)
+    assert not schedule.allows(datetime(2030, 1, 9, 12), today=MONDAY)
+    assert not schedule.allows(datetime(2030, 1, 28, 10), today=MONDAY)
+
+
+def test_default_schedule():
+    """Тест: без правил экскурсия проводится ежедневно в стандартное время, кроме отмененного."""
+    schedule = Schedule(
+        rules=[],
+        exceptions=[ScheduleException(date=MONDAY, kind="cancel", start_time=time(9))],
+        horizon_days=None,
+    )
+
+    assert schedule.times_on(MONDAY) == DEFAULT_TIMES[1:]
+    assert schedule.times_on(MONDAY + timedelta(days=1)) == DEFAULT_TIMES
+    assert schedule.allows(datetime(2030, 1, 8, 10, 30), today=MONDAY)
+    assert not schedule.allows(datetime(2030, 1, 7, 9), today=MONDAY)
+
+
+@pytest.fixture(scope="function")
+async def excursion(session, test_user):
+    guide = Guide(user_id=test_user.id)
+    session.add(guide)
+    await session.flush()
+
+    excursion = Excursion(
+        title="Прогулка по Арбату",
+        country="Россия",
+        city="Москва",
+        difficulty="easy",
+        price_per_person=1500,
+        status="approved",
+        available_slots=10,
+        guide_id=guide.guide_id,
+    )
+    session.add(excursion)
+    await session.commit()
+    return excursion
+
+
+@pytest.mark.anyio
+async def test_schedule_api(client: AsyncClient, auth_headers, excursion):
+    """Тест: расписание гида задает календарь, бронирование и поиск по дате."""
+    today = datetime.now().date()
+    next_monday = today + timedelta(days=7 - today.weekday())
+    blackout = next_monday + timedelta(days=7)
+
+    response = await client.put(
+        f"/api/guides/me/excursions/{excursion.excursion_id}/schedule",
+        json={
+            "horizon_days": 30,
+            "rules": [{"weekday": 0, "start_time": "10:00"}],
+            "exceptions": [{"date": blackout.isoformat(), "kind": "blackout"}],
+        },
+        headers=auth_headers,
+    )
+    assert response.status_code == 200
+
+    response = await client.get(f"/api/excursions/{excursion.excursion_id}/schedule")
+    assert response.json()["rules"] == [
+        {"weekday": 0, "start_time": "10:00:00", "valid_from": None, "valid_until": None}
+    ]
+
+    response = await client.get(
+        f"/api/excursions/{excursion.excursion_id}/available-dates",
+        params={"date_from": next_monday.isoformat(), "days": 14},
+    )
+    slots = response.json()["time_slots"]
+    assert [(slot["date"], slot["time"]) for slot in slots] == [(next_monday.isoformat(), "10:00")]
+
+    response = await client.post(
+        "/api/bookings",
+        json={
+            "excursion_id": excursion.excursion_id,
+            "date": datetime.combine(next_monday, time(12)).isoformat(),
+            "number_of_people": 1,
+        },
+        headers=auth_headers,
+    )
+    assert response.status_code == 400
+
+    for day, expected in ((next_monday, 1), (blackout, 0), (next_monday + timedelta(days=1), 0)):
+        response = await client.get("/api/excursions", params={"date": day.isoformat()})
+        assert len(response.json()) == expected
+
+
+@pytest.mark.anyio
+async def test_sql_slot_count_matches_schedule(session, excursion):
+    """Тест: SQL-счетчик времен дня совпадает с Schedule.times_on при повторах и лишних отменах."""
+    default_excursion = Excursion(
+        title="Старый город",
+        country="Россия",
+        city="Москва",
+        difficulty="easy",
+        price_per_person=1000,
+        status="approved",
+        guide_id=excursion.guide_id,
+    )
+    session.add(default_excursion)
+    await session.flush()
+    tuesday = MONDAY + timedelta(days=1)
+    session.add_all([
+        # повтор правила и «extra» на время правила
+        ScheduleRule(excursion_id=excursion.excursion_id, weekday=0, start_time=time(10)),
+        ScheduleRule(excursion_id=excursion.excursion_id, weekday=0, start_time=time(10)),
+        ScheduleRule(excursion_id=excursion.excursion_id, weekday=0, start_time=time(14)),
+        ScheduleException(excursion_id=excursion.excursion_id, date=MONDAY, kind="extra", start_time=time(10)),
+        ScheduleException(excursion_id=excursion.excursion_id, date=MONDAY, kind="extra", start_time=time(17)),
+        ScheduleException(excursion_id=excursion.excursion_id, date=MONDAY, kind="extra", start_time=time(17)),
+        # отмена времени, которого нет в расписании, и отмена «extra»
+        ScheduleException(excursion_id=excursion.excursion_id, date=MONDAY, kind="cancel", start_time=time(11)),
+        ScheduleException(excursion_id=excursion.excursion_id, date=tuesday, kind="extra", start_time=time(8)),
+        ScheduleException(excursion_id=excursion.excursion_id, date=tuesday, kind="cancel", start_time=time(8)),
+        # без правил: «extra» на стандартное время и лишние отмены
+        ScheduleException(excursion_id=default_excursion.excursion_id, date=MONDAY, kind="extra", start_time=time(9)),
+        ScheduleException(excursion_id=default_excursion.excursion_id, date=MONDAY, kind="cancel", start_time=time(12)),
+        ScheduleException(excursion_id=default_excursion.excursion_id, date=MONDAY, kind="cancel", start_time=time(12)),
+        ScheduleException(excursion_id=default_excursion.excursion_id, date=MONDAY, kind="cancel", start_time=time(13)),
+    ])
+    await session.commit()
+
+    for item in (excursion, default_excursion):
+        schedule = await get_schedule(session, item)
+        for day in (MONDAY, tuesday):
+            count = await session.scalar(
+                select(slots_on_day_expression(day, today=MONDAY)).where(Excursion.excursion_id == item.excursion_id)
+            )
+            assert count == len(schedule.times_on(day)), (item.title, day)
@@ -252,6 +252,16 @@ export async function getAvailableDates(excursionId, people = 1) {
   }
 }
 
+// Подписка на изменения свободных мест экскурсии (Server-Sent Events).
+// onSeats получает {starts_at, delta, booked, capacity}, onResync вызывается,
+// когда календарь нужно загрузить заново. Возвращает функцию отписки.
+export function subscribeAvailability(excursionId, { onSeats, onResync }) {
+  const source = new EventSource(`${API_BASE_URL}/api/excursions/${excursionId}/availability/stream`);
+  source.addEventListener("seats", (event) => onSeats(JSON.parse(event.data)));
+  source.addEventListener("resync", () => onResync());
+  return () => source.close();
+}
+
 export async function createBooking({ token, excursionId, dateTimeISO, people }) {
   try {
     console.log("Creating booking:", { API_BASE_URL, excursionId, dateTimeISO, people });
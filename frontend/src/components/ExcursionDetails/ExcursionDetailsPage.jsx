@@ -1,7 +1,7 @@
 import React, { useEffect, useState } from "react";
 import { useParams } from "react-router-dom";
 import "./ExcursionDetailsPage.css";
-import { getExcursionById, getAvailableDates, createBooking } from "../../api";
+import { getExcursionById, getAvailableDates, createBooking, subscribeAvailability } from "../../api";
 import { useAuth } from "../../AuthContext.jsx";
 
 const ExcursionDetailsPage = () => {
@@ -42,6 +42,33 @@ const ExcursionDetailsPage = () => {
     }
   }, [excursion, people]);
 
+  // Свободные места обновляются событиями сервера вместо повторных запросов календаря
+  useEffect(() => {
+    if (!excursion) return;
+
+    const applySeats = ({ starts_at, booked, capacity }) => {
+      // слоты различаются точным временем начала (HH:MM): событие слота 09:30
+      // не должно менять места слота 09:00 того же часа
+      const date = starts_at.slice(0, 10);
+      const time = starts_at.slice(11, 16);
+      setAvailableDates((current) => {
+        if (!current) return current;
+        return {
+          ...current,
+          time_slots: current.time_slots.map((slot) => {
+            if (slot.date !== date || slot.time !== time || capacity === null) {
+              return slot;
+            }
+            const remaining = Math.max(0, capacity - booked);
+            return { ...slot, available: remaining >= people, available_slots: remaining };
+          }),
+        };
+      });
+    };
+
+    return subscribeAvailability(id, { onSeats: applySeats, onResync: loadAvailableDates });
+  }, [excursion, id, people]);
+
   const loadAvailableDates = async () => {
     if (!excursion) return;
     